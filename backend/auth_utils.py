@@ -1,8 +1,38 @@
 # auth.py
+import os
+import time
+import asyncio
+import logging
+import secrets
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from telemetry import telemetry, password_seconds
+
+logger = logging.getLogger(__name__)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Access token settings. Set JWT_SECRET_KEY so tokens survive restarts and are
+# accepted by every backend process; without it each process signs with its own
+# random key.
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+if not JWT_SECRET_KEY:
+    logger.warning("JWT_SECRET_KEY is not set, using a random key for this process")
+    JWT_SECRET_KEY = secrets.token_urlsafe(32)
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+
+# Password worker pool settings
+# kind: "thread", "process" or "inline" (run on the event loop, no pool)
+PASSWORD_POOL_KIND = os.getenv("PASSWORD_POOL_KIND", "thread")
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", os.cpu_count() or 4))
+# Requests waiting beyond this are rejected instead of queued
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", 1000))
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -10,3 +40,124 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordPoolFull(Exception):
+    pass
+
+
+# Bounded executor for bcrypt work so hashing never runs on the event loop
+class PasswordPool:
+    def __init__(
+        self,
+        kind: str = PASSWORD_POOL_KIND,
+        workers: int = PASSWORD_POOL_WORKERS,
+        max_queue: int = PASSWORD_POOL_MAX_QUEUE,
+    ):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password"
+                )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.kind == "inline":
+            self.completed += 1
+            with telemetry.span(password_seconds, operation=fn.__name__):
+                return fn(*args)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolFull("Too many pending password operations")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with telemetry.span(password_seconds, operation=fn.__name__):
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool()
+telemetry.stats("password_pool", "Password worker pool queue depth", password_pool.stats)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def create_access_token(
+    user_id: str, email: str, name: str, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES
+) -> str:
+    now = int(time.time())
+    claims = {
+        "sub": user_id,
+        "email": email,
+        "name": name,
+        "iat": now,
+        "exp": now + expires_minutes * 60,
+    }
+    return jwt.encode(claims, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+# Verified from the signature and expiry alone, without a database lookup
+def decode_access_token(token: str) -> dict:
+    try:
+        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError as e:
+        raise InvalidToken(str(e))
+    if not claims.get("sub"):
+        raise InvalidToken("Token has no subject")
+    return claims
@@ -0,0 +1,115 @@
+# cache.py
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+# Storage interface for ReadThroughCache. Implement this over a shared cache
+# (e.g. Redis or memcached) to share entries between backend processes.
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]: ...
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any): ...
+
+    @abstractmethod
+    def delete(self, key: Hashable): ...
+
+    @abstractmethod
+    def clear(self): ...
+
+
+# In-process LRU with a per-entry time-to-live (seconds)
+class LRUCache(CacheBackend):
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Read-through cache with explicit invalidation and hit/miss counters
+class ReadThroughCache:
+    def __init__(self, backend: CacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        # Loads in flight per key, and the invalidations of those keys since
+        # the loads began, so a load that raced a write is not cached. Both
+        # only hold keys being loaded right now.
+        self._loading: Dict[Hashable, int] = {}
+        self._generations: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if not self.enabled:
+            return await loader()
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        generation = self._generations.get(key, 0)
+        self._loading[key] = self._loading.get(key, 0) + 1
+        try:
+            value = await loader()
+            if self._generations.get(key, 0) == generation:
+                self.backend.set(key, value)
+        finally:
+            self._loading[key] -= 1
+            if not self._loading[key]:
+                del self._loading[key]
+                self._generations.pop(key, None)
+        return value
+
+    def invalidate(self, key: Hashable):
+        if key in self._loading:
+            self._generations[key] = self._generations.get(key, 0) + 1
+        self.backend.delete(key)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,154 @@
+# chat_buffer.py
+import os
+import asyncio
+import logging
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from database import DUPLICATE_KEY, get_store
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Chat write buffer settings
+CHAT_BUFFER_ENABLED = os.getenv("CHAT_BUFFER_ENABLED", "1") == "1"
+# Flush once this many messages are pending
+CHAT_BUFFER_MAX_BATCH = int(os.getenv("CHAT_BUFFER_MAX_BATCH", 500))
+# Flush at least this often (seconds)
+CHAT_BUFFER_FLUSH_INTERVAL = float(os.getenv("CHAT_BUFFER_FLUSH_INTERVAL", 0.5))
+# Writers wait for a flush (and are rejected if it does not help) past this
+CHAT_BUFFER_MAX_PENDING = int(os.getenv("CHAT_BUFFER_MAX_PENDING", 10000))
+
+
+class ChatBufferFull(Exception):
+    pass
+
+
+# Collects chat messages and writes them with insert_many on size/time thresholds
+class ChatWriteBuffer:
+    def __init__(
+        self,
+        enabled: bool = CHAT_BUFFER_ENABLED,
+        max_batch: int = CHAT_BUFFER_MAX_BATCH,
+        flush_interval: float = CHAT_BUFFER_FLUSH_INTERVAL,
+        max_pending: int = CHAT_BUFFER_MAX_PENDING,
+    ):
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _start(self):
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def add(self, chats: List[dict]):
+        if not chats:
+            # insert_many refuses an empty list
+            return
+        if not self.enabled:
+            await get_store().insert_chats(chats)
+            return
+
+        if self._task is None:
+            self._start()
+
+        # Back-pressure: make the caller wait for a flush when the buffer is full
+        if self.pending + len(chats) > self.max_pending:
+            try:
+                await self.flush()
+            except Exception as e:
+                raise ChatBufferFull("Chat write buffer is full and could not be flushed") from e
+            if self.pending + len(chats) > self.max_pending:
+                raise ChatBufferFull("Chat write buffer is full")
+
+        # Ids are set before the first attempt, so a retry of a write the
+        # server did apply fails as a duplicate instead of storing it twice
+        for chat in chats:
+            chat.setdefault("_id", ObjectId())
+        self._pending.extend(chats)
+        if self.pending >= self.max_batch and (
+            self._size_flush is None or self._size_flush.done()
+        ):
+            self._size_flush = asyncio.create_task(self._flush_logged())
+
+    async def flush(self):
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+                try:
+                    self.written += await get_store().insert_chats(batch)
+                    self.batches += 1
+                except BulkWriteError as e:
+                    # Unordered insert: only the documents with a write error
+                    # failed, and a duplicate key means an earlier attempt
+                    # already stored the message
+                    failed = [
+                        batch[error["index"]]
+                        for error in e.details.get("writeErrors", [])
+                        if error.get("code") != DUPLICATE_KEY
+                    ]
+                    self.written += len(batch) - len(failed)
+                    self.batches += 1
+                    if failed:
+                        self._pending[:0] = failed
+                        self.failed_batches += 1
+                        raise
+                except BaseException:
+                    # Keep the messages for the next flush attempt (this also
+                    # covers cancellation of the timer task mid-write, and
+                    # network errors after the server wrote some of them)
+                    self._pending[:0] = batch
+                    self.failed_batches += 1
+                    raise
+
+    async def _flush_logged(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to flush chat messages")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_logged()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._size_flush = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self.pending,
+            "written": self.written,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+        }
+
+
+chat_buffer = ChatWriteBuffer()
+telemetry.stats("chat_buffer", "Pending and written chat messages", chat_buffer.stats)
@@ -1,49 +1,288 @@
 # database.py
-from pymongo import MongoClient
-from neo4j import GraphDatabase
+import os
+import asyncio
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from neo4j import AsyncGraphDatabase
+
+from cache import LRUCache, ReadThroughCache
+from telemetry import telemetry, db_operation_seconds
 
 # MongoDB connection
-MONGO_URI = "mongodb://localhost:27017"
-mongo_client = MongoClient(MONGO_URI)
-mongo_db = mongo_client["tour_planner_db"]
-users_collection = mongo_db["users"]
-chats_collection = mongo_db["chats"]
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB_NAME = "tour_planner_db"
+
+# "mongo" for the real database, "memory" for the in-process stand-in
+DATA_BACKEND = os.getenv("DATA_BACKEND", "mongo")
 
 # Neo4j connection
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "your_password"
-neo4j_driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+neo4j_driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
+# User preferences cache in front of Neo4j
+PREFERENCES_CACHE_ENABLED = os.getenv("PREFERENCES_CACHE_ENABLED", "1") == "1"
+PREFERENCES_CACHE_SIZE = int(os.getenv("PREFERENCES_CACHE_SIZE", 10000))
+PREFERENCES_CACHE_TTL = float(os.getenv("PREFERENCES_CACHE_TTL", 300))
+preferences_cache = ReadThroughCache(
+    LRUCache(max_size=PREFERENCES_CACHE_SIZE, ttl=PREFERENCES_CACHE_TTL),
+    enabled=PREFERENCES_CACHE_ENABLED,
+)
+telemetry.stats("preferences_cache", "Preferences cache hits and misses", preferences_cache.stats)
 
-# Helper functions for Neo4j
-def store_user_preference(user_id: str, preference_type: str, preference_value: str):
-    with neo4j_driver.session() as session:
-        session.run(
-            """
-            MERGE (u:User {id: $user_id})
-            MERGE (p:Preference {type: $preference_type, value: $preference_value})
-            MERGE (u)-[:PREFERS]->(p)
-        """,
-            user_id=user_id,
-            preference_type=preference_type,
-            preference_value=preference_value,
+# Mongo error code for a duplicate key
+DUPLICATE_KEY = 11000
+
+# Fields returned when reading chat history back
+CHAT_HISTORY_FIELDS = {"_id": 1, "message": 1, "timestamp": 1, "role": 1}
+
+
+def chat_history_filter(
+    user_id: str, after: Optional[Tuple[str, ObjectId]], descending: bool
+) -> dict:
+    """Keyset filter for chats strictly after (timestamp, _id) in sort order."""
+    query = {"user_id": user_id}
+    if after:
+        timestamp, chat_id = after
+        op = "$lt" if descending else "$gt"
+        query["$or"] = [
+            {"timestamp": {op: timestamp}},
+            {"timestamp": timestamp, "_id": {op: chat_id}},
+        ]
+    return query
+
+
+# Async data access for users and chats (MongoDB via motor)
+class MongoStore:
+    def __init__(self, uri: str = MONGO_URI, db_name: str = MONGO_DB_NAME):
+        self.client = AsyncIOMotorClient(uri)
+        self.db = self.client[db_name]
+        self.users = self.db["users"]
+        self.chats = self.db["chats"]
+
+    @telemetry.timed(db_operation_seconds, store="mongo", operation="get_user_by_email")
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        return await self.users.find_one({"email": email})
+
+    @telemetry.timed(db_operation_seconds, store="mongo", operation="get_user_by_id")
+    async def get_user_by_id(self, user_id) -> Optional[dict]:
+        return await self.users.find_one({"_id": ObjectId(user_id)})
+
+    @telemetry.timed(db_operation_seconds, store="mongo", operation="insert_user")
+    async def insert_user(self, user_data: dict) -> ObjectId:
+        result = await self.users.insert_one(user_data)
+        return result.inserted_id
+
+    @telemetry.timed(db_operation_seconds, store="mongo", operation="insert_chat")
+    async def insert_chat(self, chat_data: dict) -> bool:
+        result = await self.chats.insert_one(chat_data)
+        return result.acknowledged
+
+    @telemetry.timed(db_operation_seconds, store="mongo", operation="insert_chats")
+    async def insert_chats(self, chats: List[dict]) -> int:
+        result = await self.chats.insert_many(chats, ordered=False)
+        return len(result.inserted_ids)
+
+    def iter_chats(
+        self,
+        user_id: str,
+        after: Optional[Tuple[str, ObjectId]] = None,
+        descending: bool = False,
+        limit: int = 0,
+        batch_size: int = 500,
+    ):
+        """Async iterator over a user's chats ordered by (timestamp, _id)."""
+        direction = DESCENDING if descending else ASCENDING
+        return (
+            self.chats.find(
+                chat_history_filter(user_id, after, descending), CHAT_HISTORY_FIELDS
+            )
+            .sort([("timestamp", direction), ("_id", direction)])
+            .limit(limit)
+            .batch_size(batch_size)
         )
 
+    def close(self):
+        self.client.close()
+
+
+# In-memory stand-in with the same interface as MongoStore.
+# `latency` (seconds) simulates a database round-trip for load benchmarks.
+class InMemoryStore:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.users = {}
+        self.chats = []
+        self.chat_ids = set()
+        # Mirrors the unique email index of the Mongo users collection
+        self.users_by_email = {}
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @telemetry.timed(db_operation_seconds, store="memory", operation="get_user_by_email")
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        await self._round_trip()
+        user_id = self.users_by_email.get(email)
+        return dict(self.users[user_id]) if user_id else None
+
+    @telemetry.timed(db_operation_seconds, store="memory", operation="get_user_by_id")
+    async def get_user_by_id(self, user_id) -> Optional[dict]:
+        await self._round_trip()
+        user = self.users.get(ObjectId(user_id))
+        return dict(user) if user else None
+
+    @telemetry.timed(db_operation_seconds, store="memory", operation="insert_user")
+    async def insert_user(self, user_data: dict) -> ObjectId:
+        await self._round_trip()
+        if user_data["email"] in self.users_by_email:
+            raise DuplicateKeyError("E11000 duplicate key error: email")
+        user_id = ObjectId()
+        self.users[user_id] = {"_id": user_id, **user_data}
+        self.users_by_email[user_data["email"]] = user_id
+        return user_id
+
+    @telemetry.timed(db_operation_seconds, store="memory", operation="insert_chat")
+    async def insert_chat(self, chat_data: dict) -> bool:
+        await self._round_trip()
+        chat = {"_id": ObjectId(), **chat_data}
+        self.chat_ids.add(chat["_id"])
+        self.chats.append(chat)
+        return True
+
+    @telemetry.timed(db_operation_seconds, store="memory", operation="insert_chats")
+    async def insert_chats(self, chats: List[dict]) -> int:
+        await self._round_trip()
+        # Like insert_many(ordered=False): each document gets its _id set, and
+        # a duplicate _id fails only that document
+        errors = []
+        for index, chat in enumerate(chats):
+            chat.setdefault("_id", ObjectId())
+            if chat["_id"] in self.chat_ids:
+                errors.append(
+                    {"index": index, "code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key error: _id"}
+                )
+                continue
+            self.chat_ids.add(chat["_id"])
+            self.chats.append(dict(chat))
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(chats) - len(errors)})
+        return len(chats)
 
-def get_user_preferences(user_id: str):
-    with neo4j_driver.session() as session:
-        result = session.run(
-            """
-            MATCH (u:User {id: $user_id})-[:PREFERS]->(p:Preference)
-            RETURN p.type AS type, p.value AS value
-        """,
-            user_id=user_id,
+    async def iter_chats(
+        self,
+        user_id: str,
+        after: Optional[Tuple[str, ObjectId]] = None,
+        descending: bool = False,
+        limit: int = 0,
+        batch_size: int = 500,
+    ):
+        await self._round_trip()
+
+        def sort_key(chat):
+            return (chat["timestamp"], chat["_id"])
+
+        def is_after(chat):
+            if after is None:
+                return True
+            return sort_key(chat) < after if descending else sort_key(chat) > after
+
+        chats = sorted(
+            (c for c in self.chats if c["user_id"] == user_id and is_after(c)),
+            key=sort_key,
+            reverse=descending,
         )
-        return [{"type": record["type"], "value": record["value"]} for record in result]
+        for count, chat in enumerate(chats[:limit] if limit else chats, start=1):
+            yield {field: chat[field] for field in CHAT_HISTORY_FIELDS}
+            if count % batch_size == 0:
+                await self._round_trip()
+
+    def close(self):
+        pass
+
+
+_store = None
+
+
+def get_store():
+    """Return the active data store, creating it from DATA_BACKEND on first use."""
+    global _store
+    if _store is None:
+        _store = InMemoryStore() if DATA_BACKEND == "memory" else MongoStore()
+    return _store
+
+
+def set_store(store):
+    """Swap the active data store (e.g. an InMemoryStore for benchmarks)."""
+    global _store
+    _store = store
+
+
+# Helper functions for Neo4j
+async def _merge_preferences(tx, user_id: str, preferences: List[dict]):
+    await tx.run(
+        """
+        MERGE (u:User {id: $user_id})
+        WITH u
+        UNWIND $preferences AS preference
+        MERGE (p:Preference {type: preference.type, value: preference.value})
+        MERGE (u)-[:PREFERS]->(p)
+    """,
+        user_id=user_id,
+        preferences=preferences,
+    )
+
+
+@telemetry.timed(db_operation_seconds, store="neo4j", operation="store_user_preferences")
+async def store_user_preferences(user_id: str, preferences: List[dict]):
+    """Store a list of {"type", "value"} preferences in one transaction."""
+    async with neo4j_driver.session() as session:
+        await session.execute_write(_merge_preferences, user_id, preferences)
+    preferences_cache.invalidate(user_id)
+
+
+async def store_user_preference(
+    user_id: str, preference_type: str, preference_value: str
+):
+    await store_user_preferences(
+        user_id, [{"type": preference_type, "value": preference_value}]
+    )
+
+
+async def _read_preferences(tx, user_id: str):
+    result = await tx.run(
+        """
+        MATCH (u:User {id: $user_id})-[:PREFERS]->(p:Preference)
+        RETURN p.type AS type, p.value AS value
+    """,
+        user_id=user_id,
+    )
+    return [
+        {"type": record["type"], "value": record["value"]} async for record in result
+    ]
+
+
+@telemetry.timed(db_operation_seconds, store="neo4j", operation="load_user_preferences")
+async def load_user_preferences(user_id: str):
+    async with neo4j_driver.session() as session:
+        return await session.execute_read(_read_preferences, user_id)
+
+
+async def get_user_preferences(user_id: str):
+    preferences = await preferences_cache.get_or_load(
+        user_id, lambda: load_user_preferences(user_id)
+    )
+    return [dict(preference) for preference in preferences]
 
 
 # Close connections on shutdown
-def close_db():
-    mongo_client.close()
-    neo4j_driver.close()
+async def close_db():
+    if _store is not None:
+        _store.close()
+    await neo4j_driver.close()
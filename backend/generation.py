@@ -0,0 +1,385 @@
+# generation.py
+# Runs the Tour Planning Agent for the /agent endpoints. The agent stack
+# (phi, Ollama, pgvector) lives in the frontend directory and is imported on
+# first use, so the rest of the API starts without it. Each chat run keeps
+# its agent and trip intake in an idle-evicted session table; phi storage
+# holds the conversation, so an evicted run is rebuilt from its run_id.
+# Replies that need the LLM wait for a slot from the GenerationScheduler.
+import os
+import sys
+import copy
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from scheduler import (
+    GenerationScheduler,
+    PRIORITY_ITINERARY,
+    PRIORITY_SHORT,
+    QueueFull,
+    RateLimited,
+    TokenBucket,
+    rejected,
+)
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+reply_ttft_seconds = telemetry.histogram(
+    "agent_reply_ttft_seconds", "Time from a chat message to the first reply text"
+)
+reply_seconds = telemetry.histogram(
+    "agent_reply_duration_seconds", "Time to the complete reply", ["outcome"]
+)
+
+# Directory holding agent.py and the modules it imports
+AGENT_DIR = os.getenv("AGENT_DIR", str(Path(__file__).resolve().parent.parent / "frontend"))
+AGENT_LLM_ID = os.getenv("AGENT_LLM_ID", "llama3")
+# Threads for agent runs and session loading; how many runs generate at
+# once is set by GENERATION_SLOTS (scheduler.py)
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", 8))
+# Chat runs kept in memory, and how long an idle one is kept (seconds)
+AGENT_SESSIONS_MAX = int(os.getenv("AGENT_SESSIONS_MAX", 1000))
+AGENT_SESSION_IDLE_TIMEOUT = float(os.getenv("AGENT_SESSION_IDLE_TIMEOUT", 1800))
+# Import the agent stack in the background at startup, so the first chat
+# doesn't pay for it (about a second of imports)
+AGENT_PRELOAD = os.getenv("AGENT_PRELOAD", "1") == "1"
+
+
+class AgentUnavailable(Exception):
+    pass
+
+
+class SessionForbidden(Exception):
+    pass
+
+
+@dataclass
+class Turn:
+    message: str
+    # The intake's question when trip details are missing; no LLM needed
+    reply: Optional[str] = None
+    agent_message: Optional[str] = None
+    # Set when the message carries the collected trip details
+    slots: object = None
+    # The trip intake after this message; becomes the run's intake once the
+    # reply has been produced
+    intake: object = None
+
+    @property
+    def needs_llm(self) -> bool:
+        return self.reply is None
+
+    @property
+    def priority(self) -> int:
+        # The message with all the trip details starts a full itinerary build
+        return PRIORITY_ITINERARY if self.slots is not None else PRIORITY_SHORT
+
+
+class AgentSession:
+    def __init__(self, user_id: str, agent, intake):
+        self.user_id = user_id
+        self.agent = agent
+        self.intake = intake
+        self.run_id: Optional[str] = None
+        self.last_used = time.monotonic()
+        # One reply at a time per chat run
+        self.lock = threading.Lock()
+
+    def prepare(self, message: str, intake_enabled: bool) -> Turn:
+        """Runs the message through a copy of the trip intake; same flow the Streamlit app used.
+
+        The run keeps its intake until respond() has produced the reply, so a
+        reply that is cancelled while queued or fails leaves the trip state
+        as it was and the details are sent with the next message instead.
+        """
+        intake = copy.deepcopy(self.intake)
+        question = intake.update(message) if intake_enabled else None
+        if question is not None:
+            # Trip details still missing: ask without an LLM round-trip
+            return Turn(message, reply=question, intake=intake)
+        agent_message = intake.agent_message(message) if intake_enabled else message
+        # The message carrying the collected details is cached on them
+        slots = intake.slots if agent_message != message else None
+        return Turn(message, agent_message=agent_message, slots=slots, intake=intake)
+
+    def respond(self, turn: Turn, cached_run, remember_exchange):
+        """Reply deltas for a prepared turn."""
+        if turn.reply is not None:
+            remember_exchange(self.agent, turn.message, turn.reply)
+            yield turn.reply
+        else:
+            yield from cached_run(self.agent, turn.agent_message, slots=turn.slots)
+        # Not reached when the reply is stopped or raises
+        self.intake = turn.intake
+
+
+class GenerationService:
+    def __init__(
+        self,
+        workers: int = GENERATION_WORKERS,
+        max_sessions: int = AGENT_SESSIONS_MAX,
+        idle_timeout: float = AGENT_SESSION_IDLE_TIMEOUT,
+        scheduler: Optional[GenerationScheduler] = None,
+        limiter: Optional[TokenBucket] = None,
+    ):
+        self.workers = workers
+        self.scheduler = scheduler or GenerationScheduler()
+        self.limiter = limiter or TokenBucket()
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sessions: "OrderedDict[str, AgentSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._modules: Optional[dict] = None
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._ttfts: deque = deque(maxlen=1000)
+        self._durations: deque = deque(maxlen=1000)
+        self.rate_limited = 0
+        self.queue_full = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="generation"
+            )
+        return self._executor
+
+    def _agent_modules(self) -> dict:
+        if self._modules is None:
+            # Appended, so backend modules with the same name keep precedence
+            if AGENT_DIR not in sys.path:
+                sys.path.append(AGENT_DIR)
+            try:
+                import agent
+                import intake
+                import response_cache
+            except ImportError as e:
+                raise AgentUnavailable(f"Agent stack not available: {e}")
+            self._modules = {
+                "get_agent": agent.get_agent,
+                "TripIntake": intake.TripIntake,
+                "intake_enabled": intake.SLOT_INTAKE_ENABLED,
+                "cached_run": response_cache.cached_run,
+                "remember_exchange": response_cache.remember_exchange,
+            }
+        return self._modules
+
+    def _preload(self):
+        start = time.perf_counter()
+        try:
+            self._agent_modules()
+        except AgentUnavailable as e:
+            logger.warning(str(e))
+            return
+        logger.info(f"Agent stack imported in {time.perf_counter() - start:.2f}s")
+
+    def preload(self):
+        """Import the agent modules on a worker thread without waiting for them."""
+        self.executor.submit(self._preload)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for run_id in [
+            run_id
+            for run_id, session in self._sessions.items()
+            if now - session.last_used > self.idle_timeout
+        ]:
+            del self._sessions[run_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _open_session(self, user_id: str, run_id: Optional[str]) -> AgentSession:
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(run_id) if run_id else None
+        if session is not None:
+            if session.user_id != user_id:
+                raise SessionForbidden(run_id)
+            session.last_used = time.monotonic()
+            return session
+
+        modules = self._agent_modules()
+        agent = modules["get_agent"](llm_id=AGENT_LLM_ID, user_id=user_id, run_id=run_id)
+        session = AgentSession(user_id, agent, modules["TripIntake"]())
+        # Loads the run from storage, or creates it
+        session.run_id = agent.create_run()
+        if agent.db_row is not None and agent.db_row.user_id not in (None, user_id):
+            raise SessionForbidden(run_id)
+        with self._lock:
+            self._sessions[session.run_id] = session
+            self._sessions.move_to_end(session.run_id)
+        return session
+
+    def _count(self, name: str, delta: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    async def open_session(self, user_id: str, run_id: Optional[str] = None) -> AgentSession:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._open_session, user_id, run_id)
+
+    def admit(self, user_id: str):
+        """Checks a new chat message against the user's rate limit and the queue."""
+        retry_after = self.limiter.take(user_id)
+        if retry_after:
+            self._count("rate_limited")
+            telemetry.inc(rejected, reason="rate_limited")
+            raise RateLimited(retry_after)
+        try:
+            self.scheduler.check_capacity()
+        except QueueFull:
+            self.limiter.refund(user_id)
+            self._count("queue_full")
+            telemetry.inc(rejected, reason="queue_full")
+            raise
+
+    @staticmethod
+    def history(session: AgentSession) -> List[dict]:
+        return [
+            {"role": message["role"], "content": message.get("content") or ""}
+            for message in session.agent.memory.get_chat_history()
+            if message["role"] in ("user", "assistant")
+        ]
+
+    def _produce(self, session, turn, loop, queue: asyncio.Queue, cancelled: threading.Event):
+        modules = self._agent_modules()
+        with session.lock:
+            session.last_used = time.monotonic()
+            replies = session.respond(
+                turn, modules["cached_run"], modules["remember_exchange"]
+            )
+            try:
+                for delta in replies:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, ("delta", delta))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+            finally:
+                replies.close()
+                session.last_used = time.monotonic()
+        loop.call_soon_threadsafe(queue.put_nowait, ("end", None))
+
+    async def stream_reply(self, session: AgentSession, message: str) -> AsyncIterator[dict]:
+        """Events for one reply: run, queued (while waiting for a slot), delta...,
+        then done or error."""
+        yield {"event": "run", "run_id": session.run_id}
+
+        turn = session.prepare(message, self._agent_modules()["intake_enabled"])
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        start = time.perf_counter()
+        first_delta = None
+        queued = 0.0
+        ticket = None
+        future = None
+        failed = False
+        try:
+            if turn.needs_llm:
+                ticket = self.scheduler.enqueue(turn.priority)
+                if ticket.position:
+                    yield {"event": "queued", "position": ticket.position}
+                await self.scheduler.wait(ticket)
+                queued = time.perf_counter() - start
+            else:
+                # Answered by the intake, so it doesn't count against the rate limit
+                self.limiter.refund(session.user_id)
+            self._count("waiting")
+            future = loop.run_in_executor(
+                self.executor, self._started, session, turn, loop, queue, cancelled
+            )
+            while True:
+                kind, value = await queue.get()
+                if kind == "end":
+                    break
+                if kind == "error":
+                    failed = True
+                    logger.error(f"Agent run {session.run_id} failed: {value}")
+                    yield {"event": "error", "detail": "The agent failed to respond"}
+                    continue
+                if first_delta is None:
+                    first_delta = time.perf_counter() - start
+                    self._ttfts.append(first_delta)
+                    telemetry.observe(reply_ttft_seconds, first_delta)
+                yield {"event": "delta", "delta": value}
+            await future
+        except BaseException:
+            # Client went away: stop generating at the next delta
+            cancelled.set()
+            self._count("cancelled")
+            telemetry.observe(reply_seconds, time.perf_counter() - start, outcome="cancelled")
+            raise
+        finally:
+            if ticket is not None:
+                if future is not None and not future.done():
+                    # The slot is free once the run has stopped
+                    future.add_done_callback(lambda _: self.scheduler.release(ticket))
+                else:
+                    self.scheduler.release(ticket)
+        seconds = time.perf_counter() - start
+        self._durations.append(seconds)
+        telemetry.observe(reply_seconds, seconds, outcome="failed" if failed else "completed")
+        self._count("failed" if failed else "completed")
+        yield {
+            "event": "done",
+            "run_id": session.run_id,
+            "ttft": first_delta,
+            "queued": queued,
+            "seconds": seconds,
+        }
+
+    def _started(self, *args):
+        self._count("waiting", -1)
+        self._count("active")
+        try:
+            self._produce(*args)
+        finally:
+            self._count("active", -1)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        def percentile(values: List[float], q: float) -> Optional[float]:
+            ordered = sorted(values)
+            return ordered[int(q * (len(ordered) - 1))] if ordered else None
+
+        with self._lock:
+            sessions = len(self._sessions)
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "sessions": sessions,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rate_limited": self.rate_limited,
+            "queue_full": self.queue_full,
+            **self.scheduler.stats(),
+            "ttft_p50": percentile(list(self._ttfts), 0.5),
+            "ttft_p95": percentile(list(self._ttfts), 0.95),
+            "duration_p50": percentile(list(self._durations), 0.5),
+            "duration_p95": percentile(list(self._durations), 0.95),
+        }
+
+
+generation_service = GenerationService()
+telemetry.stats(
+    "generation", "Agent workers and LLM slots in use, queued replies", generation_service.stats
+)
@@ -0,0 +1,126 @@
+# indexes.py
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from database import MongoStore, chat_history_filter
+
+logger = logging.getLogger(__name__)
+
+# Uniqueness constraints so MERGE on User/Preference uses an index lookup
+NEO4J_CONSTRAINTS = [
+    "CREATE CONSTRAINT user_id_unique IF NOT EXISTS "
+    "FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT preference_type_value_unique IF NOT EXISTS "
+    "FOR (p:Preference) REQUIRE (p.type, p.value) IS UNIQUE",
+]
+
+# Index definitions for the MongoDB collections
+USER_INDEXES = [
+    IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+]
+# Chat history is read in (timestamp, _id) order per user (iter_chats), so the
+# index covers the whole sort and no in-memory SORT stage is needed
+CHAT_INDEXES = [
+    IndexModel(
+        [("user_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+        name="user_id_timestamp_id",
+    ),
+]
+
+
+async def ensure_indexes(store) -> List[str]:
+    """Create the user and chat indexes if missing; returns the index names.
+
+    A failure is logged and the API starts without them.
+    """
+    if not isinstance(store, MongoStore):
+        return []
+    try:
+        names = await store.users.create_indexes(USER_INDEXES)
+        names += await store.chats.create_indexes(CHAT_INDEXES)
+    except Exception:
+        # e.g. duplicate emails block the unique index, or MongoDB is unreachable
+        logger.exception(
+            "Could not create MongoDB indexes; logins and chat history scan their "
+            "collections until they exist (check for duplicate user emails and restart)"
+        )
+        return []
+    return names
+
+
+async def ensure_neo4j_constraints(driver):
+    """Create the User and Preference uniqueness constraints if missing."""
+    try:
+        async with driver.session() as session:
+            for constraint in NEO4J_CONSTRAINTS:
+                result = await session.run(constraint)
+                await result.consume()
+    except Exception:
+        logger.exception("Could not create Neo4j constraints")
+
+
+def _winning_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _winning_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _winning_stages(child)
+    return stages
+
+
+async def explain_query(collection, filter: dict, sort: Optional[list] = None) -> dict:
+    """Summarize the winning plan and execution stats of a find query."""
+    cursor = collection.find(filter)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = await cursor.limit(1).explain()
+    planner = explain["queryPlanner"]["winningPlan"]
+    # Newer servers nest the classic plan under "queryPlan"
+    plan = planner.get("queryPlan", planner)
+    stats = explain.get("executionStats", {})
+    stages = _winning_stages(plan)
+    return {
+        "stages": stages,
+        "uses_index": "IXSCAN" in stages,
+        "collection_scan": "COLLSCAN" in stages,
+        # Results sorted in memory instead of read in index order
+        "blocking_sort": "SORT" in stages,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+    }
+
+
+async def check_query_plans(store) -> dict:
+    """Explain the login and chat history lookups; warn on collection scans and in-memory sorts.
+
+    The chat history plans use the same filter and sort as iter_chats: the
+    first page, and a later page in each direction after a keyset cursor.
+    """
+    if not isinstance(store, MongoStore):
+        return {}
+    after = (datetime.utcnow().isoformat(), ObjectId())
+    try:
+        plans = {"login": await explain_query(store.users, {"email": "plan-check@example.com"})}
+        for name, cursor, direction in [
+            ("chat_history", None, ASCENDING),
+            ("chat_history_next_page", after, ASCENDING),
+            ("chat_history_previous_page", after, DESCENDING),
+        ]:
+            plans[name] = await explain_query(
+                store.chats,
+                chat_history_filter("plan-check", cursor, direction == DESCENDING),
+                [("timestamp", direction), ("_id", direction)],
+            )
+    except Exception:
+        logger.exception("Could not check the MongoDB query plans")
+        return {}
+    for name, plan in plans.items():
+        if plan["collection_scan"]:
+            logger.warning(f"{name} query is not using an index: {plan['stages']}")
+        elif plan["blocking_sort"]:
+            logger.warning(f"{name} query sorts in memory: {plan['stages']}")
+    return plans
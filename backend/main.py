@@ -1,6 +1,13 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import re
+import math
+import time
+import json
+import logging
+import base64
 from fastapi.middleware.cors import CORSMiddleware
 
 # from .database import (
@@ -11,16 +18,51 @@ from fastapi.middleware.cors import CORSMiddleware
 #     close_db,
 # )
 from database import (
-    users_collection,
-    chats_collection,
+    get_store,
+    neo4j_driver,
     store_user_preference,
+    store_user_preferences,
     get_user_preferences,
     close_db,
 )
-from auth_utils import hash_password, verify_password
-from schemas import UserCreate, UserLogin, UserOut, ChatMessage
+from auth_utils import (
+    hash_password_async,
+    verify_password_async,
+    password_pool,
+    PasswordPoolFull,
+    create_access_token,
+    decode_access_token,
+    InvalidToken,
+)
+from chat_buffer import chat_buffer, ChatBufferFull
+from telemetry import telemetry, http_request_seconds
+from indexes import ensure_indexes, ensure_neo4j_constraints, check_query_plans
+from generation import (
+    generation_service,
+    AgentUnavailable,
+    SessionForbidden,
+    AGENT_PRELOAD,
+)
+from scheduler import RateLimited, QueueFull
+from schemas import (
+    UserCreate,
+    UserLogin,
+    UserOut,
+    CurrentUser,
+    ChatMessage,
+    ChatHistoryItem,
+    ChatHistoryPage,
+    UserPreferences,
+    AgentSessionRequest,
+    AgentSessionOut,
+    AgentChatRequest,
+)
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -32,13 +74,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Time every request to its response headers, labelled by route template
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    if not telemetry.enabled:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+
 # Email validation regex pattern
 EMAIL_REGEX = re.compile(r"[^@]+@[^@]+\.[^@]+")
 
 
 # Dependency: Get User by Username
-def get_user(email: str):
-    return users_collection.find_one({"email": email})
+async def get_user(email: str):
+    return await get_store().get_user_by_email(email)
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+# Dependency: claims of the request's bearer token. Verified statelessly, so
+# authenticated requests cost no database lookup. Every endpoint that stores
+# or returns a user's data takes it and checks the token is that user's.
+async def current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> dict:
+    if credentials is None:
+        raise unauthorized("Not authenticated")
+    try:
+        return decode_access_token(credentials.credentials)
+    except InvalidToken:
+        raise unauthorized("Invalid or expired token")
+
+
+# A token may only act for its own user
+def authorize(claims: dict, *user_ids: str):
+    if any(user_id != claims["sub"] for user_id in user_ids):
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
 
 
 # User Registration Endpoint
@@ -59,17 +152,24 @@ async def register_user(user: UserCreate):
             status_code=400, detail="Contact number must be 10 digits long"
         )
 
-    if get_user(user.email):
+    if await get_user(user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = hash_password(user.password)
+    try:
+        hashed_password = await hash_password_async(user.password)
+    except PasswordPoolFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     user_data = {
         "name": user.name,
         "email": user.email,
         "password": hashed_password,
     }
-    result = users_collection.insert_one(user_data)
-    new_user = users_collection.find_one({"_id": result.inserted_id})
+    store = get_store()
+    try:
+        inserted_id = await store.insert_user(user_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    new_user = await store.get_user_by_id(inserted_id)
     return UserOut(
         id=str(new_user["_id"]),
         msg="You have successfully registered",
@@ -86,52 +186,272 @@ async def login_user(user: UserLogin):
     if not EMAIL_REGEX.match(user.email):
         raise HTTPException(status_code=400, detail="Invalid email address")
 
-    user_db = get_user(user.email)
-    if not user_db or not verify_password(user.password, user_db["password"]):
+    user_db = await get_user(user.email)
+    try:
+        valid = user_db is not None and await verify_password_async(
+            user.password, user_db["password"]
+        )
+    except PasswordPoolFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+    if not valid:
         raise HTTPException(
             status_code=401, detail="User does not exist or password is incorrect"
         )
 
+    user_id = str(user_db["_id"])
     return UserOut(
-        id=str(user_db["_id"]),
+        id=user_id,
         msg="You have successfully logged in",
         name=user_db["name"],
         email=user_db["email"],
+        access_token=create_access_token(user_id, user_db["email"], user_db["name"]),
+        token_type="bearer",
     )
 
 
-# Store Chat Message
-@app.post("/chat/")
-async def store_chat_message(chat: ChatMessage):
-    chat_data = {
+# Current User Endpoint
+# Answered from the token alone
+@app.get("/me", response_model=CurrentUser)
+async def read_current_user(claims: dict = Depends(current_user)):
+    return CurrentUser(id=claims["sub"], name=claims["name"], email=claims["email"])
+
+
+# Maximum number of messages accepted by one batch request
+MAX_CHAT_BATCH = 1000
+
+
+def chat_document(chat: ChatMessage) -> dict:
+    return {
         "user_id": chat.user_id,
         "message": chat.message,
         "timestamp": chat.timestamp or datetime.utcnow().isoformat(),
+        "role": chat.role,
     }
-    result = chats_collection.insert_one(chat_data)
-    if result.acknowledged:
-        return {"status": "Message stored successfully"}
-    else:
-        raise HTTPException(status_code=500, detail="Failed to store message")
+
+
+# Store Chat Message (202: accepted into the write buffer, which stores it
+# in MongoDB within CHAT_BUFFER_FLUSH_INTERVAL)
+@app.post("/chat/", status_code=202)
+async def store_chat_message(
+    chat: ChatMessage, claims: dict = Depends(current_user)
+):
+    authorize(claims, chat.user_id)
+    try:
+        await chat_buffer.add([chat_document(chat)])
+    except ChatBufferFull:
+        raise HTTPException(status_code=503, detail="Failed to store message")
+    return {"status": "Message accepted"}
+
+
+# Store a batch of Chat Messages
+@app.post("/chat/batch", status_code=202)
+async def store_chat_messages(
+    chats: List[ChatMessage], claims: dict = Depends(current_user)
+):
+    if len(chats) > MAX_CHAT_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {MAX_CHAT_BATCH} messages",
+        )
+    authorize(claims, *{chat.user_id for chat in chats})
+    try:
+        await chat_buffer.add([chat_document(chat) for chat in chats])
+    except ChatBufferFull:
+        raise HTTPException(status_code=503, detail="Failed to store messages")
+    return {"status": "Messages accepted", "count": len(chats)}
+
+
+def encode_chat_cursor(chat: dict) -> str:
+    raw = json.dumps([chat["timestamp"], str(chat["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_chat_cursor(cursor: str):
+    try:
+        timestamp, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return timestamp, ObjectId(chat_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def chat_history_item(chat: dict) -> ChatHistoryItem:
+    return ChatHistoryItem(
+        id=str(chat["_id"]),
+        message=chat["message"],
+        timestamp=chat["timestamp"],
+        role=chat.get("role", "user"),
+    )
+
+
+# Get Chat History
+# Pages are keyset-paginated on (timestamp, _id); pass `next_cursor` back as
+# `cursor` for the following page. With `stream=true` every message after the
+# cursor is streamed as NDJSON without buffering the history in memory.
+@app.get("/chat/{user_id}", response_model=ChatHistoryPage)
+async def get_chat_history(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    stream: bool = False,
+    claims: dict = Depends(current_user),
+):
+    authorize(claims, user_id)
+    after = decode_chat_cursor(cursor) if cursor else None
+    descending = order == "desc"
+    store = get_store()
+
+    if stream:
+
+        async def ndjson_lines():
+            async for chat in store.iter_chats(user_id, after, descending):
+                yield chat_history_item(chat).model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    # Fetch one extra message to know whether another page exists
+    chats = [
+        chat
+        async for chat in store.iter_chats(
+            user_id, after, descending, limit=limit + 1, batch_size=limit + 1
+        )
+    ]
+    next_cursor = encode_chat_cursor(chats[limit - 1]) if len(chats) > limit else None
+    return ChatHistoryPage(
+        messages=[chat_history_item(chat) for chat in chats[:limit]],
+        next_cursor=next_cursor,
+    )
 
 
 # Add User Preference
 @app.post("/preferences/")
 async def add_user_preference(
-    user_id: str, preference_type: str, preference_value: str
+    user_id: str,
+    preference_type: str,
+    preference_value: str,
+    claims: dict = Depends(current_user),
 ):
-    store_user_preference(user_id, preference_type, preference_value)
+    authorize(claims, user_id)
+    await store_user_preference(user_id, preference_type, preference_value)
     return {"status": "Preference stored successfully"}
 
 
+# Maximum number of preferences accepted by one bulk request
+MAX_PREFERENCES_BATCH = 500
+
+
+# Add User Preferences in bulk (single transaction)
+@app.post("/preferences/bulk")
+async def add_user_preferences(
+    body: UserPreferences, claims: dict = Depends(current_user)
+):
+    if len(body.preferences) > MAX_PREFERENCES_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PREFERENCES_BATCH} preferences can be stored at once",
+        )
+    authorize(claims, body.user_id)
+    await store_user_preferences(
+        body.user_id, [preference.model_dump() for preference in body.preferences]
+    )
+    return {
+        "status": "Preferences stored successfully",
+        "count": len(body.preferences),
+    }
+
+
 # Get User Preferences
 @app.get("/preferences/{user_id}")
-async def get_preferences(user_id: str):
-    preferences = get_user_preferences(user_id)
+async def get_preferences(user_id: str, claims: dict = Depends(current_user)):
+    authorize(claims, user_id)
+    preferences = await get_user_preferences(user_id)
     return {"preferences": preferences}
 
 
-# Shutdown event to close DB connections
+async def open_agent_session(user_id: str, run_id: Optional[str]):
+    try:
+        return await generation_service.open_session(user_id, run_id)
+    except SessionForbidden:
+        raise HTTPException(status_code=403, detail="Chat run belongs to another user")
+    except AgentUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.exception("Could not open agent session")
+        raise HTTPException(status_code=503, detail=f"Could not start the agent: {e}")
+
+
+# Agent Session Endpoint
+# Creates the chat run (or loads it when `run_id` is given) and returns its history
+@app.post("/agent/session", response_model=AgentSessionOut)
+async def create_agent_session(body: AgentSessionRequest, claims: dict = Depends(current_user)):
+    authorize(claims, body.user_id)
+    session = await open_agent_session(body.user_id, body.run_id)
+    return AgentSessionOut(
+        run_id=session.run_id, messages=generation_service.history(session)
+    )
+
+
+# Agent Chat Endpoint
+# Streams the reply as server-sent events: `run` (run id), `queued` (replies
+# ahead while waiting for an LLM slot), `delta` (reply text), `error`, and
+# `done` (timings). Messages over the user's rate limit get a 429.
+@app.post("/agent/chat")
+async def agent_chat(body: AgentChatRequest, claims: dict = Depends(current_user)):
+    authorize(claims, body.user_id)
+    # Admitted before the session is opened, so a refused message doesn't
+    # build an agent or create a run
+    try:
+        generation_service.admit(body.user_id)
+    except RateLimited as e:
+        retry_after = math.ceil(e.retry_after)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many messages, please wait {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+    try:
+        session = await open_agent_session(body.user_id, body.run_id)
+    except HTTPException:
+        # Nothing was generated, so the message doesn't count against the limit
+        generation_service.limiter.refund(body.user_id)
+        raise
+
+    async def events():
+        async for event in generation_service.stream_reply(session, body.message):
+            yield f"event: {event.pop('event')}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Latency histograms, counters and component stats in the Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        telemetry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Startup event to create indexes/constraints and check the login/history query plans
+@app.on_event("startup")
+async def startup_event():
+    store = get_store()
+    await ensure_indexes(store)
+    await check_query_plans(store)
+    await ensure_neo4j_constraints(neo4j_driver)
+    if AGENT_PRELOAD:
+        generation_service.preload()
+
+
+# Shutdown event to flush pending chats and close DB connections
 @app.on_event("shutdown")
-def shutdown_event():
-    close_db()
+async def shutdown_event():
+    password_pool.shutdown()
+    generation_service.shutdown()
+    await chat_buffer.close()
+    await close_db()
@@ -0,0 +1,244 @@
+# scheduler.py
+# Admission control for agent replies. A reply that needs the LLM holds one
+# of GENERATION_SLOTS slots for its whole turn; set it to the number of
+# requests Ollama serves in parallel (OLLAMA_NUM_PARALLEL) so requests queue
+# here, where the order can be chosen, rather than inside Ollama. Waiting
+# replies are served short turns first, then full itinerary builds, first
+# come first served within a priority; a build that has waited
+# GENERATION_AGING_SECONDS is served with the short turns, so a steady stream
+# of them can't starve it. Each user's messages are limited by a token
+# bucket, and new messages are refused while GENERATION_QUEUE_MAX replies are
+# already waiting.
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from telemetry import telemetry
+
+GENERATION_SLOTS = int(os.getenv("GENERATION_SLOTS", os.getenv("OLLAMA_NUM_PARALLEL", 4)))
+GENERATION_QUEUE_MAX = int(os.getenv("GENERATION_QUEUE_MAX", 100))
+# Seconds after which a waiting reply is served as a short turn; 0 turns aging off
+GENERATION_AGING_SECONDS = float(os.getenv("GENERATION_AGING_SECONDS", 30))
+# Sustained messages per minute per user, and how many may arrive at once;
+# a rate of 0 turns the limit off
+GENERATION_RATE_PER_MINUTE = float(os.getenv("GENERATION_RATE_PER_MINUTE", 10))
+GENERATION_BURST = int(os.getenv("GENERATION_BURST", 5))
+# Idle users' buckets kept before full ones are dropped
+RATE_LIMIT_MAX_USERS = 10000
+
+# Served lowest first
+PRIORITY_SHORT = 0
+PRIORITY_ITINERARY = 1
+PRIORITY_NAMES = {PRIORITY_SHORT: "short", PRIORITY_ITINERARY: "itinerary"}
+
+queue_wait_seconds = telemetry.histogram(
+    "generation_queue_wait_seconds", "Time a reply waited for an LLM slot", ["priority"]
+)
+queue_position = telemetry.histogram(
+    "generation_queue_position",
+    "Replies ahead of a new reply when it was queued",
+    ["priority"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+rejected = telemetry.counter(
+    "generation_rejected_total", "Chat messages refused before generation", ["reason"]
+)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class QueueFull(Exception):
+    pass
+
+
+# Per-key token buckets holding up to `burst` tokens, refilled at
+# `rate_per_minute`. take() spends one token, refund() gives it back.
+class TokenBucket:
+    def __init__(
+        self,
+        rate_per_minute: float = GENERATION_RATE_PER_MINUTE,
+        burst: int = GENERATION_BURST,
+        max_keys: int = RATE_LIMIT_MAX_USERS,
+        clock=time.monotonic,
+    ):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> [tokens, last refill]
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: str) -> List[float]:
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._drop_full(now)
+            bucket = self._buckets[key] = [float(self.burst), now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        return bucket
+
+    def _drop_full(self, now: float):
+        for key in [
+            key
+            for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate >= self.burst
+        ]:
+            del self._buckets[key]
+
+    def take(self, key: str) -> float:
+        """Spends a token: 0, or the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._bucket(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def refund(self, key: str):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket[0] = min(self.burst, bucket[0] + 1)
+
+
+class Ticket:
+    __slots__ = ("priority", "rank", "seq", "enqueued", "position", "future", "state")
+
+    def __init__(self, priority: int, seq: int, enqueued: float):
+        self.priority = priority
+        # Priority the queue orders by; raised to PRIORITY_SHORT once aged
+        self.rank = priority
+        self.seq = seq
+        self.enqueued = enqueued
+        self.position = 0
+        self.future: Optional[asyncio.Future] = None
+        # "waiting", "running" or "done"
+        self.state = "waiting"
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+# Hands out LLM slots on the event loop. enqueue() gets a ticket, which either
+# holds a slot already or has a place in the queue; wait() until it holds
+# one, and release() it when the reply is finished.
+class GenerationScheduler:
+    def __init__(
+        self,
+        slots: int = GENERATION_SLOTS,
+        max_queue: int = GENERATION_QUEUE_MAX,
+        aging: float = GENERATION_AGING_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.aging = aging
+        self.clock = clock
+        self.in_use = 0
+        self.admitted = 0
+        self.aged = 0
+        self._queue: List[Ticket] = []
+        self._seq = itertools.count()
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+    def check_capacity(self):
+        if len(self._queue) >= self.max_queue:
+            raise QueueFull()
+
+    def enqueue(self, priority: int) -> Ticket:
+        ticket = Ticket(priority, next(self._seq), self.clock())
+        if self.in_use < self.slots and not self._queue:
+            self._start(ticket)
+        else:
+            ticket.position = sum(1 for waiting in self._queue if waiting < ticket)
+            ticket.future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, ticket)
+        telemetry.observe(queue_position, ticket.position, priority=PRIORITY_NAMES[priority])
+        return ticket
+
+    async def wait(self, ticket: Ticket):
+        if ticket.future is not None:
+            try:
+                await ticket.future
+            except asyncio.CancelledError:
+                self._abandon(ticket)
+                raise
+
+    def release(self, ticket: Ticket):
+        if ticket.state != "running":
+            return
+        ticket.state = "done"
+        self.in_use -= 1
+        self._hand_over()
+
+    def _start(self, ticket: Ticket):
+        ticket.state = "running"
+        self.in_use += 1
+        self.admitted += 1
+        wait = self.clock() - ticket.enqueued
+        self._waits.append(wait)
+        telemetry.observe(queue_wait_seconds, wait, priority=PRIORITY_NAMES[ticket.priority])
+
+    def _promote_aged(self):
+        if self.aging <= 0:
+            return
+        now = self.clock()
+        promoted = False
+        for ticket in self._queue:
+            if ticket.rank > PRIORITY_SHORT and now - ticket.enqueued >= self.aging:
+                ticket.rank = PRIORITY_SHORT
+                self.aged += 1
+                promoted = True
+        if promoted:
+            heapq.heapify(self._queue)
+
+    def _hand_over(self):
+        self._promote_aged()
+        while self._queue and self.in_use < self.slots:
+            ticket = heapq.heappop(self._queue)
+            if ticket.future.cancelled():
+                # Its waiter was cancelled and hasn't run _abandon yet; the
+                # slot goes to the next ticket
+                ticket.state = "done"
+                continue
+            self._start(ticket)
+            ticket.future.set_result(None)
+
+    def _abandon(self, ticket: Ticket):
+        if ticket.state == "running":
+            # Given a slot just as the waiter went away
+            self.release(ticket)
+        elif ticket.state == "waiting":
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            ticket.state = "done"
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for ticket in self._queue:
+            queued[PRIORITY_NAMES[ticket.priority]] += 1
+        return {
+            "slots": self.slots,
+            "in_use": self.in_use,
+            "queued": queued,
+            "admitted": self.admitted,
+            "aged": self.aged,
+            "queue_wait_p50": waits[int(0.5 * (len(waits) - 1))] if waits else None,
+            "queue_wait_p95": waits[int(0.95 * (len(waits) - 1))] if waits else None,
+        }
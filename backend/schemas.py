@@ -1,4 +1,6 @@
 # schemas.py
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -19,9 +21,61 @@ class UserOut(BaseModel):
     name: str
     msg: str = None
     email: str
+    access_token: Optional[str] = None
+    token_type: Optional[str] = None
+
+
+class CurrentUser(BaseModel):
+    id: str
+    name: str
+    email: str
 
 
 class ChatMessage(BaseModel):
     user_id: str
     message: str
     timestamp: str
+    role: str = "user"
+
+
+class ChatHistoryItem(BaseModel):
+    id: str
+    message: str
+    timestamp: str
+    role: str = "user"
+
+
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatHistoryItem]
+    next_cursor: Optional[str] = None
+
+
+class Preference(BaseModel):
+    type: str
+    value: str
+
+
+class UserPreferences(BaseModel):
+    user_id: str
+    preferences: List[Preference]
+
+
+class AgentSessionRequest(BaseModel):
+    user_id: str
+    run_id: Optional[str] = None
+
+
+class AgentMessage(BaseModel):
+    role: str
+    content: str
+
+
+class AgentSessionOut(BaseModel):
+    run_id: str
+    messages: List[AgentMessage]
+
+
+class AgentChatRequest(BaseModel):
+    user_id: str
+    message: str
+    run_id: Optional[str] = None
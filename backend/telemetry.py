@@ -0,0 +1,242 @@
+# telemetry.py
+# In-process latency histograms and counters, exported in the Prometheus text
+# format on GET /metrics. The API records request, database and password
+# hashing timings; the agent stack records LLM, tool, delegation and knowledge
+# search timings through frontend/tracing.py when it runs in this process.
+# Components that keep their own counters (caches, pools, queues) register
+# their stats() function, which is read at export time.
+# With TELEMETRY_ENABLED=0 every hook returns immediately.
+import os
+import time
+import bisect
+import asyncio
+import threading
+from contextlib import nullcontext
+from functools import wraps
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+
+# Bucket upper bounds in seconds, from a cache hit to a long LLM reply
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 150, 250)
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = _label_text(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {int(values[-1])}"
+            labels = _label_text(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {values[-2]:.6f}"
+            yield f"{self.name}_count{labels} {int(values[-1])}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_label_text(self.labelnames, key)} {value:g}"
+
+
+def _numeric_stats(stats: dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _numeric_stats(value, f"{name}_")
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+
+# Gauges read from a component's stats() dict on every export, one sample per
+# numeric entry (nested dicts are flattened with "_"); other values are skipped
+class Stats:
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self) -> Iterator[str]:
+        for stat, value in sorted(_numeric_stats(self.read())):
+            yield f"{self.name}{_label_text(('stat',), (stat,))} {value:g}"
+
+
+class _Span:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            errors.inc(stage=self.histogram.name)
+        return False
+
+
+NULL_SPAN = nullcontext()
+
+
+class Telemetry:
+    def __init__(self, enabled: bool = TELEMETRY_ENABLED):
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def stats(self, name: str, documentation: str, read) -> Stats:
+        """Export `read()` under `name`; registering again replaces the function."""
+        metric = self._register(Stats, name, documentation, read)
+        metric.read = read
+        return metric
+
+    def observe(self, histogram: Histogram, value: float, **labels):
+        if self.enabled:
+            histogram.observe(value, **labels)
+
+    def inc(self, counter: Counter, amount: float = 1, **labels):
+        if self.enabled:
+            counter.inc(amount, **labels)
+
+    def span(self, histogram: Histogram, **labels):
+        """Times the block into `histogram`; failures also count in errors_total."""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(histogram, labels)
+
+    def timed(self, histogram: Histogram, **labels):
+        """Decorator timing every call of a function or coroutine function."""
+
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+
+                @wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with self.span(histogram, **labels):
+                        return await fn(*args, **kwargs)
+
+                return async_wrapper
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.span(histogram, **labels):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in sorted(metrics, key=lambda metric: metric.name):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+telemetry = Telemetry()
+
+errors = telemetry.counter("errors_total", "Failed operations, by timed stage", ["stage"])
+http_request_seconds = telemetry.histogram(
+    "http_request_duration_seconds",
+    "Time to the response headers, by route",
+    ["method", "route", "status"],
+)
+db_operation_seconds = telemetry.histogram(
+    "db_operation_duration_seconds", "Database calls, by store and operation", ["store", "operation"]
+)
+password_seconds = telemetry.histogram(
+    "password_operation_duration_seconds",
+    "bcrypt hashing and verification, excluding the wait for a worker",
+    ["operation"],
+)
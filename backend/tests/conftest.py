@@ -0,0 +1,10 @@
+# conftest.py
+# The backend modules import each other by plain name (run from backend/),
+# so the tests put backend/ on the path the same way, with the in-process
+# data store instead of MongoDB.
+import os
+import sys
+
+os.environ.setdefault("DATA_BACKEND", "memory")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
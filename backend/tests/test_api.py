@@ -0,0 +1,277 @@
+# test_api.py
+import json
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import main
+from auth_utils import create_access_token
+from database import InMemoryStore, set_store
+from generation import AgentSession, GenerationService
+from scheduler import GenerationScheduler, TokenBucket
+
+
+@pytest.fixture
+def store():
+    store = InMemoryStore()
+    set_store(store)
+    yield store
+    set_store(None)
+
+
+@pytest.fixture
+def client(store):
+    # Without the context manager startup and shutdown (Mongo indexes,
+    # agent preload) are skipped
+    return TestClient(main.app)
+
+
+def auth(user_id: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id, f'{user_id}@example.com', user_id)}"}
+
+
+@pytest.mark.parametrize("path", ["/chat/u1", "/preferences/u1"])
+def test_reads_need_a_token(client, path):
+    response = client.get(path)
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+CHAT = {"user_id": "u1", "message": "hi", "timestamp": "2026-01-01T10:00"}
+WRITES = [
+    ("/chat/", {"json": CHAT}),
+    ("/chat/batch", {"json": [CHAT]}),
+    ("/preferences/", {"params": {"user_id": "u1", "preference_type": "interest", "preference_value": "art"}}),
+    ("/preferences/bulk", {"json": {"user_id": "u1", "preferences": [{"type": "interest", "value": "art"}]}}),
+]
+
+
+@pytest.mark.parametrize("path, request_kwargs", WRITES)
+def test_writes_need_the_users_own_token(client, path, request_kwargs):
+    assert client.post(path, **request_kwargs).status_code == 401
+    assert client.post(path, headers=auth("u2"), **request_kwargs).status_code == 403
+
+
+def test_reads_need_the_users_own_token(client):
+    assert client.get("/chat/u1", headers=auth("u2")).status_code == 403
+    assert client.get("/chat/u1", headers=auth("u1")).status_code == 200
+
+
+def test_expired_token_is_rejected(client):
+    token = create_access_token("u1", "u1@example.com", "u1", expires_minutes=-1)
+    response = client.get("/chat/u1", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("path", ["/agent/session", "/agent/chat"])
+def test_agent_runs_need_a_token(client, path):
+    response = client.post(path, json={"user_id": "u1", "run_id": None, "message": "hi"})
+    assert response.status_code == 401
+
+
+def seed_chats(store, user_id: str, timestamps):
+    chats = [
+        {"user_id": user_id, "message": f"message {i}", "timestamp": timestamp, "role": "user"}
+        for i, timestamp in enumerate(timestamps)
+    ]
+    asyncio.run(store.insert_chats(chats))
+
+
+# Two messages share a timestamp, so pages must also split on _id
+HISTORY = [
+    "2026-01-01T10:00",
+    "2026-01-01T10:01",
+    "2026-01-01T10:01",
+    "2026-01-01T10:02",
+    "2026-01-01T10:03",
+]
+
+
+def read_pages(client, order: str, limit: int = 2):
+    messages, pages, cursor = [], 0, None
+    while True:
+        params = {"limit": limit, "order": order}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/chat/u1", params=params, headers=auth("u1")).json()
+        pages += 1
+        messages += page["messages"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return messages, pages
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_chat_history_pages_cover_every_message_once(client, store, order):
+    seed_chats(store, "u1", HISTORY)
+    seed_chats(store, "u2", HISTORY[:2])
+    messages, pages = read_pages(client, order)
+    assert pages == 3
+    assert len({message["id"] for message in messages}) == len(HISTORY)
+    keys = [(message["timestamp"], message["id"]) for message in messages]
+    assert keys == sorted(keys, reverse=order == "desc")
+
+
+def test_chat_history_last_full_page_has_no_cursor(client, store):
+    seed_chats(store, "u1", HISTORY[:4])
+    messages, pages = read_pages(client, "asc")
+    assert (len(messages), pages) == (4, 2)
+
+
+def test_chat_history_streams_after_the_cursor(client, store):
+    seed_chats(store, "u1", HISTORY)
+    first = client.get("/chat/u1", params={"limit": 2}, headers=auth("u1")).json()
+    response = client.get(
+        "/chat/u1", params={"cursor": first["next_cursor"], "stream": True}, headers=auth("u1")
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["message"] for line in lines] == ["message 2", "message 3", "message 4"]
+
+
+def test_chat_cursor_round_trip():
+    chat = {"timestamp": HISTORY[0], "_id": ObjectId()}
+    assert main.decode_chat_cursor(main.encode_chat_cursor(chat)) == (chat["timestamp"], chat["_id"])
+
+
+def test_invalid_chat_cursor_is_rejected(client):
+    response = client.get("/chat/u1", params={"cursor": "not-a-cursor"}, headers=auth("u1"))
+    assert response.status_code == 400
+
+
+def test_rate_limited_agent_chat_opens_no_session(client, monkeypatch):
+    opened = []
+
+    async def open_session(user_id, run_id=None):
+        opened.append(user_id)
+        raise AssertionError("a refused message should not open a session")
+
+    monkeypatch.setattr(main.generation_service, "limiter", TokenBucket(rate_per_minute=1, burst=0))
+    monkeypatch.setattr(main.generation_service, "open_session", open_session)
+    response = client.post(
+        "/agent/chat", json={"user_id": "u1", "run_id": None, "message": "hi"}, headers=auth("u1")
+    )
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert opened == []
+
+
+def test_message_whose_session_fails_is_refunded(client, monkeypatch):
+    async def open_session(user_id, run_id=None):
+        raise main.AgentUnavailable("Agent stack not available")
+
+    limiter = TokenBucket(rate_per_minute=1, burst=1)
+    monkeypatch.setattr(main.generation_service, "limiter", limiter)
+    monkeypatch.setattr(main.generation_service, "open_session", open_session)
+    response = client.post(
+        "/agent/chat", json={"user_id": "u1", "run_id": None, "message": "hi"}, headers=auth("u1")
+    )
+    assert response.status_code == 503
+    assert limiter.take("u1") == 0
+
+
+# Generation service running `cached_run` as the agent, without the intake
+@pytest.fixture
+def generation(monkeypatch):
+    def make(cached_run):
+        service = GenerationService(
+            workers=1,
+            scheduler=GenerationScheduler(slots=1, max_queue=10),
+            limiter=TokenBucket(rate_per_minute=0),
+        )
+        service._modules = {
+            "intake_enabled": False,
+            "cached_run": cached_run,
+            "remember_exchange": lambda agent, message, reply: None,
+        }
+
+        async def open_session(user_id, run_id=None):
+            session = AgentSession(user_id, agent=None, intake=None)
+            session.run_id = run_id or "run-1"
+            return session
+
+        service.open_session = open_session
+        monkeypatch.setattr(main, "generation_service", service)
+        services.append(service)
+        return service
+
+    services = []
+    yield make
+    for service in services:
+        service.shutdown()
+
+
+def stream_events(client, message: str):
+    with client.stream(
+        "POST",
+        "/agent/chat",
+        json={"user_id": "u1", "run_id": None, "message": message},
+        headers=auth("u1"),
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        events, event = [], None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: ") :])))
+    return events
+
+
+def test_agent_chat_streams_the_reply_as_server_sent_events(client, generation):
+    def cached_run(agent, message, slots=None):
+        yield "Day "
+        yield "plan for " + message
+
+    generation(cached_run)
+    events = stream_events(client, "Rome")
+    assert events[:3] == [
+        ("run", {"run_id": "run-1"}),
+        ("delta", {"delta": "Day "}),
+        ("delta", {"delta": "plan for Rome"}),
+    ]
+    event, done = events[3]
+    assert event == "done" and len(events) == 4
+    assert done["run_id"] == "run-1" and done["ttft"] <= done["seconds"]
+
+
+def test_agent_chat_reports_a_failed_reply_in_the_stream(client, generation):
+    def cached_run(agent, message, slots=None):
+        yield "Day "
+        raise RuntimeError("ollama down")
+
+    service = generation(cached_run)
+    events = stream_events(client, "Rome")
+    assert [event for event, _ in events] == ["run", "delta", "error", "done"]
+    assert events[2][1] == {"detail": "The agent failed to respond"}
+    assert service.stats()["failed"] == 1
+
+
+def test_metrics_export_request_latency_and_component_stats(client):
+    client.get("/chat/u1", headers=auth("u1"))
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/chat/{user_id}",status="200"} ' in body
+    for name in ["chat_buffer", "generation", "password_pool", "preferences_cache"]:
+        assert f"# TYPE {name} gauge" in body
+    assert 'generation{stat="queued_short"} 0' in body
+    assert 'preferences_cache{stat="enabled"} 1' in body
+
+
+@pytest.mark.parametrize("name", ["chat-buffer", "generation", "password-pool", "preferences-cache"])
+def test_json_metrics_routes_are_gone(client, name):
+    assert client.get(f"/metrics/{name}").status_code == 404
+
+
+def test_chats_are_accepted_for_the_write_buffer(client, store, monkeypatch):
+    response = client.post("/chat/", json=CHAT, headers=auth("u1"))
+    assert (response.status_code, response.json()) == (202, {"status": "Message accepted"})
+
+    monkeypatch.setattr(main.chat_buffer, "enabled", False)
+    response = client.post("/chat/batch", json=[], headers=auth("u1"))
+    assert (response.status_code, response.json()["count"]) == (202, 0)
@@ -0,0 +1,115 @@
+# test_cache.py
+import asyncio
+
+import pytest
+
+import cache
+from cache import LRUCache, ReadThroughCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+    assert len(lru) == 2
+
+
+def test_lru_entries_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    lru = LRUCache(ttl=10)
+    lru.set("a", 1)
+    clock.now += 9
+    assert lru.get("a") == 1
+    clock.now += 2
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_read_through_loads_once_until_invalidated():
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {"theme": "dark"}
+
+    async def run(reads):
+        return [await reads.get_or_load("u1", loader) for _ in range(3)]
+
+    reads = ReadThroughCache(LRUCache())
+    assert asyncio.run(run(reads)) == [{"theme": "dark"}] * 3
+    assert len(loads) == 1
+    reads.invalidate("u1")
+    asyncio.run(reads.get_or_load("u1", loader))
+    assert len(loads) == 2
+    assert reads.stats() == {
+        "enabled": True,
+        "hits": 2,
+        "misses": 2,
+        "invalidations": 1,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    reads = ReadThroughCache(LRUCache())
+
+    async def stale_loader():
+        # A write lands while the old value is being read
+        reads.invalidate("u1")
+        return "old"
+
+    async def fresh_loader():
+        return "new"
+
+    assert asyncio.run(reads.get_or_load("u1", stale_loader)) == "old"
+    assert asyncio.run(reads.get_or_load("u1", fresh_loader)) == "new"
+
+
+def test_disabled_cache_always_loads():
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return "value"
+
+    reads = ReadThroughCache(LRUCache(), enabled=False)
+    for _ in range(2):
+        asyncio.run(reads.get_or_load("u1", loader))
+    assert len(loads) == 2
+    assert reads.stats()["hits"] == 0
+
+
+def test_invalidation_state_is_kept_only_while_loading():
+    reads = ReadThroughCache(LRUCache(max_size=1))
+
+    async def loader():
+        return "value"
+
+    async def run():
+        for user in range(100):
+            await reads.get_or_load(f"u{user}", loader)
+            reads.invalidate(f"u{user}")
+
+    asyncio.run(run())
+    assert reads._generations == {} and reads._loading == {}
+
+
+def test_backend_must_implement_the_whole_interface():
+    class GetOnly(cache.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
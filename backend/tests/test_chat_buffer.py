@@ -0,0 +1,146 @@
+# test_chat_buffer.py
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from chat_buffer import ChatBufferFull, ChatWriteBuffer
+from database import InMemoryStore, set_store
+
+DOCUMENT_VALIDATION_FAILED = 121
+
+
+def chats(count, start=0):
+    return [
+        {"user_id": "u1", "message": f"m{i}", "role": "user", "timestamp": f"2026-06-01T00:00:{i:02d}"}
+        for i in range(start, start + count)
+    ]
+
+
+# InMemoryStore whose next writes fail in scripted ways
+class FlakyStore(InMemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.failures = []
+
+    async def insert_chats(self, chats):
+        failure = self.failures.pop(0) if self.failures else None
+        if failure == "down":
+            raise AutoReconnect("connection refused")
+        if failure == "lost reply":
+            # The server applied the write but the reply never arrived
+            await super().insert_chats(chats)
+            raise AutoReconnect("connection reset")
+        if failure == "invalid first":
+            rest = chats[1:]
+            try:
+                await super().insert_chats(rest)
+            except BulkWriteError as e:
+                errors = [dict(error, index=error["index"] + 1) for error in e.details["writeErrors"]]
+            else:
+                errors = []
+            errors.insert(0, {"index": 0, "code": DOCUMENT_VALIDATION_FAILED})
+            raise BulkWriteError({"writeErrors": errors})
+        return await super().insert_chats(chats)
+
+
+@pytest.fixture
+def store():
+    store = FlakyStore()
+    set_store(store)
+    yield store
+    set_store(None)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def buffer(**kwargs) -> ChatWriteBuffer:
+    kwargs.setdefault("flush_interval", 60)
+    return ChatWriteBuffer(enabled=True, **kwargs)
+
+
+def test_flush_writes_in_batches(store):
+    async def scenario():
+        chat_buffer = buffer(max_batch=4)
+        await chat_buffer.add(chats(10))
+        await chat_buffer.close()
+        return chat_buffer
+
+    chat_buffer = run(scenario())
+    assert len(store.chats) == 10
+    assert chat_buffer.stats()["written"] == 10
+    assert chat_buffer.batches == 3
+    assert chat_buffer.pending == 0
+
+
+def test_failed_flush_keeps_messages(store):
+    async def scenario():
+        chat_buffer = buffer()
+        await chat_buffer.add(chats(3))
+        store.failures = ["down"]
+        with pytest.raises(AutoReconnect):
+            await chat_buffer.flush()
+        assert chat_buffer.pending == 3
+        await chat_buffer.close()
+        return chat_buffer
+
+    chat_buffer = run(scenario())
+    assert len(store.chats) == 3
+    assert chat_buffer.failed_batches == 1
+
+
+def test_retry_after_lost_reply_does_not_duplicate(store):
+    async def scenario():
+        chat_buffer = buffer()
+        await chat_buffer.add(chats(3))
+        store.failures = ["lost reply"]
+        with pytest.raises(AutoReconnect):
+            await chat_buffer.flush()
+        await chat_buffer.add(chats(2, start=3))
+        # The three re-sent messages come back as duplicate keys
+        await chat_buffer.close()
+        return chat_buffer
+
+    chat_buffer = run(scenario())
+    assert [chat["message"] for chat in store.chats] == ["m0", "m1", "m2", "m3", "m4"]
+    assert chat_buffer.written == 5
+    assert chat_buffer.pending == 0
+
+
+def test_only_failed_documents_are_requeued(store):
+    async def scenario():
+        chat_buffer = buffer()
+        await chat_buffer.add(chats(4))
+        store.failures = ["invalid first"]
+        with pytest.raises(BulkWriteError):
+            await chat_buffer.flush()
+        assert [chat["message"] for chat in chat_buffer._pending] == ["m0"]
+        assert chat_buffer.written == 3
+        await chat_buffer.close()
+        return chat_buffer
+
+    chat_buffer = run(scenario())
+    assert sorted(chat["message"] for chat in store.chats) == ["m0", "m1", "m2", "m3"]
+
+
+def test_full_buffer_with_database_down_is_rejected(store):
+    async def scenario():
+        chat_buffer = buffer(max_pending=5)
+        await chat_buffer.add(chats(5))
+        store.failures = ["down"]
+        with pytest.raises(ChatBufferFull):
+            await chat_buffer.add(chats(1, start=5))
+        assert chat_buffer.pending == 5
+        await chat_buffer.close()
+
+    run(scenario())
+    assert len(store.chats) == 5
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_empty_batch_writes_nothing(store, enabled):
+    store.failures = ["down"]
+    asyncio.run(ChatWriteBuffer(enabled=enabled).add([]))
+    assert store.failures == ["down"]
@@ -0,0 +1,159 @@
+# test_generation.py
+import asyncio
+import threading
+
+from generation import AgentSession, AgentUnavailable, GenerationService
+from scheduler import PRIORITY_SHORT, GenerationScheduler, TokenBucket
+
+TRIP = "Plan a day in Rome"
+
+
+# Trip intake that has everything once it sees TRIP, and asks otherwise
+class StubIntake:
+    def __init__(self):
+        self.slots = None
+        self.completed = False
+
+    def update(self, message):
+        if self.completed:
+            return None
+        return None if message == TRIP else "Which city would you like to visit?"
+
+    def agent_message(self, message):
+        if self.completed:
+            return message
+        self.completed = True
+        self.slots = {"city": "Rome"}
+        return f"Trip details: {message}"
+
+
+def service(cached_run, slots: int = 2) -> GenerationService:
+    service = GenerationService(
+        workers=2,
+        scheduler=GenerationScheduler(slots=slots, max_queue=10),
+        limiter=TokenBucket(rate_per_minute=0),
+    )
+    service._modules = {
+        "intake_enabled": True,
+        "cached_run": cached_run,
+        "remember_exchange": lambda agent, message, reply: None,
+    }
+    return service
+
+
+def session() -> AgentSession:
+    session = AgentSession("u1", agent=None, intake=StubIntake())
+    session.run_id = "run-1"
+    return session
+
+
+def collect(service: GenerationService, session: AgentSession, message: str):
+    async def run():
+        return [event async for event in service.stream_reply(session, message)]
+
+    try:
+        return asyncio.run(run())
+    finally:
+        service.shutdown()
+
+
+def test_reply_streams_deltas_and_advances_the_intake():
+    sent = []
+
+    def cached_run(agent, message, slots=None):
+        sent.append((message, slots))
+        yield "Day "
+        yield "plan"
+
+    chat = session()
+    events = collect(service(cached_run), chat, TRIP)
+    assert [event["event"] for event in events] == ["run", "delta", "delta", "done"]
+    assert "".join(event["delta"] for event in events if event["event"] == "delta") == "Day plan"
+    assert sent == [(f"Trip details: {TRIP}", {"city": "Rome"})]
+    assert chat.intake.completed
+
+
+def test_intake_question_is_answered_without_the_agent():
+    def cached_run(agent, message, slots=None):
+        raise AssertionError("the agent should not run")
+
+    chat = session()
+    events = collect(service(cached_run), chat, "Hi")
+    assert events[1] == {"event": "delta", "delta": "Which city would you like to visit?"}
+
+
+def test_failed_reply_keeps_the_trip_details_for_the_next_message():
+    def failing_run(agent, message, slots=None):
+        raise RuntimeError("ollama down")
+        yield
+
+    chat = session()
+    events = collect(service(failing_run), chat, TRIP)
+    assert "error" in [event["event"] for event in events]
+    assert not chat.intake.completed
+
+    sent = []
+
+    def cached_run(agent, message, slots=None):
+        sent.append(message)
+        yield "ok"
+
+    collect(service(cached_run), chat, TRIP)
+    assert sent == [f"Trip details: {TRIP}"]
+
+
+def test_reply_cancelled_while_queued_keeps_the_intake():
+    def cached_run(agent, message, slots=None):
+        yield "never"
+
+    generation = service(cached_run, slots=1)
+    chat = session()
+
+    async def run():
+        # Another reply holds the only slot
+        generation.scheduler.enqueue(PRIORITY_SHORT)
+
+        async def consume():
+            async for _ in generation.stream_reply(chat, TRIP):
+                pass
+
+        task = asyncio.create_task(consume())
+        while not any(generation.scheduler.stats()["queued"].values()):
+            await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    generation.shutdown()
+    assert not chat.intake.completed
+    assert generation.cancelled == 1
+
+
+def test_preload_imports_the_agent_stack_without_waiting(monkeypatch):
+    imported = threading.Event()
+    release = threading.Event()
+
+    def agent_modules():
+        release.wait(5)
+        imported.set()
+        return {}
+
+    generation = GenerationService(workers=1)
+    monkeypatch.setattr(generation, "_agent_modules", agent_modules)
+    generation.preload()
+    # preload() returned while the import is still running
+    assert not imported.is_set()
+    release.set()
+    assert imported.wait(5)
+    generation.shutdown()
+
+
+def test_preload_failure_is_only_logged(monkeypatch, caplog):
+    def agent_modules():
+        raise AgentUnavailable("Agent stack not available: No module named 'phi'")
+
+    generation = GenerationService(workers=1)
+    monkeypatch.setattr(generation, "_agent_modules", agent_modules)
+    generation.preload()
+    generation.executor.shutdown(wait=True)
+    assert "Agent stack not available" in caplog.text
@@ -0,0 +1,77 @@
+# test_indexes.py
+import asyncio
+
+from database import MongoStore
+from indexes import CHAT_INDEXES, check_query_plans, ensure_indexes
+
+
+# Motor collection stand-in recording the queries it is asked to explain
+class ExplainedCollection:
+    def __init__(self, stages):
+        self.stages = stages
+        self.queries = []
+
+    def find(self, filter):
+        self.queries.append({"filter": filter})
+        return self
+
+    def sort(self, sort):
+        self.queries[-1]["sort"] = sort
+        return self
+
+    def limit(self, limit):
+        return self
+
+    async def explain(self):
+        plan = {}
+        for stage in reversed(self.stages):
+            plan = {"stage": stage, "inputStage": plan} if plan else {"stage": stage}
+        return {"queryPlanner": {"winningPlan": plan}, "executionStats": {}}
+
+
+def store_with(user_stages, chat_stages) -> MongoStore:
+    store = MongoStore.__new__(MongoStore)
+    store.users = ExplainedCollection(user_stages)
+    store.chats = ExplainedCollection(chat_stages)
+    return store
+
+
+def test_chat_index_covers_the_history_sort():
+    assert list(CHAT_INDEXES[0].document["key"].items()) == [("user_id", 1), ("timestamp", 1), ("_id", 1)]
+
+
+def test_history_plans_use_the_keyset_filter_and_two_key_sort():
+    store = store_with(["FETCH", "IXSCAN"], ["FETCH", "IXSCAN"])
+    plans = asyncio.run(check_query_plans(store))
+    first, next_page, previous_page = store.chats.queries
+    assert first == {"filter": {"user_id": "plan-check"}, "sort": [("timestamp", 1), ("_id", 1)]}
+    assert next_page["sort"] == [("timestamp", 1), ("_id", 1)]
+    assert next_page["filter"]["$or"][0]["timestamp"].keys() == {"$gt"}
+    assert previous_page["sort"] == [("timestamp", -1), ("_id", -1)]
+    assert previous_page["filter"]["$or"][1]["_id"].keys() == {"$lt"}
+    assert not any(plan["blocking_sort"] for plan in plans.values())
+
+
+def test_in_memory_sort_is_reported(caplog):
+    store = store_with(["FETCH", "IXSCAN"], ["SORT", "FETCH", "IXSCAN"])
+    plans = asyncio.run(check_query_plans(store))
+    assert plans["chat_history"]["blocking_sort"]
+    assert "sorts in memory" in caplog.text
+
+
+# Collection whose every call fails, as when MongoDB is unreachable
+class FailingCollection:
+    async def create_indexes(self, indexes):
+        raise RuntimeError("connection refused")
+
+    def find(self, filter):
+        raise RuntimeError("connection refused")
+
+
+def test_startup_checks_log_failures_and_continue(caplog):
+    store = MongoStore.__new__(MongoStore)
+    store.users = store.chats = FailingCollection()
+    assert asyncio.run(ensure_indexes(store)) == []
+    assert asyncio.run(check_query_plans(store)) == {}
+    assert "Could not create MongoDB indexes" in caplog.text
+    assert "Could not check the MongoDB query plans" in caplog.text
@@ -0,0 +1,73 @@
+# test_password_pool.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from auth_utils import PasswordPool, PasswordPoolFull, hash_password, verify_password
+
+
+def slow(seconds: float) -> str:
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+
+def test_work_runs_off_the_event_loop():
+    pool = PasswordPool(kind="thread", workers=2)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        thread = await pool.run(slow, 0.2)
+        task.cancel()
+        return thread, ticks
+
+    try:
+        thread, ticks = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert thread.startswith("password")
+    # The loop kept running while the worker slept
+    assert ticks >= 5
+
+
+def test_work_beyond_the_workers_waits_and_beyond_the_queue_is_rejected():
+    pool = PasswordPool(kind="thread", workers=2, max_queue=2)
+
+    async def run():
+        calls = [pool.run(slow, 0.1) for _ in range(5)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    rejected = [result for result in results if isinstance(result, PasswordPoolFull)]
+    assert len(rejected) == 1
+    stats = pool.stats()
+    assert (stats["completed"], stats["rejected"], stats["max_queued"]) == (4, 1, 2)
+    assert (stats["in_flight"], stats["queued"]) == (0, 0)
+
+
+@pytest.mark.parametrize("kind", ["thread", "inline"])
+def test_hash_and_verify_through_the_pool(kind):
+    pool = PasswordPool(kind=kind, workers=1)
+
+    async def run():
+        hashed = await pool.run(hash_password, "s3cret")
+        return await pool.run(verify_password, "s3cret", hashed), await pool.run(
+            verify_password, "wrong", hashed
+        )
+
+    try:
+        assert asyncio.run(run()) == (True, False)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,135 @@
+# test_preferences.py
+import asyncio
+import re
+
+import pytest
+
+import database
+from database import get_user_preferences, preferences_cache, store_user_preferences
+from indexes import NEO4J_CONSTRAINTS, ensure_neo4j_constraints
+
+
+# Async Neo4j driver recording every transaction and statement. The preference
+# graph is kept as user id -> set of (type, value), which is what MERGE on the
+# constrained keys guarantees: running the same write twice adds nothing.
+class RecordingDriver:
+    def __init__(self):
+        self.transactions = []
+        self.graph = {}
+
+    def session(self):
+        return RecordingSession(self)
+
+
+class RecordingResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+    async def consume(self):
+        pass
+
+
+class RecordingSession:
+    def __init__(self, driver: RecordingDriver):
+        self.driver = driver
+        # Statements of the current transaction; run() outside one starts an
+        # auto-commit transaction for the rest of the session
+        self.statements = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def _transaction(self, kind, work, *args):
+        self.statements = []
+        self.driver.transactions.append((kind, self.statements))
+        try:
+            return await work(self, *args)
+        finally:
+            self.statements = None
+
+    async def execute_write(self, work, *args):
+        return await self._transaction("write", work, *args)
+
+    async def execute_read(self, work, *args):
+        return await self._transaction("read", work, *args)
+
+    async def run(self, query: str, **params):
+        if self.statements is None:
+            self.statements = []
+            self.driver.transactions.append(("auto", self.statements))
+        self.statements.append((" ".join(query.split()), params))
+        user = self.driver.graph.setdefault(params.get("user_id"), set())
+        if "UNWIND" in query:
+            user.update((preference["type"], preference["value"]) for preference in params["preferences"])
+        elif query.lstrip().startswith("MATCH"):
+            return RecordingResult([{"type": t, "value": v} for t, v in sorted(user)])
+        return RecordingResult([])
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    driver = RecordingDriver()
+    monkeypatch.setattr(database, "neo4j_driver", driver)
+    preferences_cache.backend.clear()
+    yield driver
+    preferences_cache.backend.clear()
+
+
+PREFERENCES = [{"type": "interest", "value": value} for value in ["art", "food", "art"]]
+
+
+def test_bulk_store_is_one_write_with_one_statement(driver):
+    asyncio.run(store_user_preferences("u1", PREFERENCES))
+    assert len(driver.transactions) == 1
+    kind, statements = driver.transactions[0]
+    assert kind == "write" and len(statements) == 1
+    query, params = statements[0]
+    assert "UNWIND $preferences AS preference" in query
+    assert params == {"user_id": "u1", "preferences": PREFERENCES}
+    assert driver.graph["u1"] == {("interest", "art"), ("interest", "food")}
+
+
+def test_merge_keys_are_backed_by_the_uniqueness_constraints(driver):
+    asyncio.run(store_user_preferences("u1", PREFERENCES))
+    query = driver.transactions[0][1][0][0]
+    merged = dict(re.findall(r"MERGE \(\w+:(\w+) \{([^}]*)\}\)", query))
+    merged = {label: sorted(re.findall(r"(\w+):", keys)) for label, keys in merged.items()}
+    constrained = {
+        label: sorted(re.findall(r"\w+\.(\w+)", keys))
+        for label, keys in (
+            re.search(r"FOR \(\w+:(\w+)\) REQUIRE \(?([^)]*?)\)? IS UNIQUE", constraint).groups()
+            for constraint in NEO4J_CONSTRAINTS
+        )
+    }
+    assert merged == constrained == {"User": ["id"], "Preference": ["type", "value"]}
+
+    asyncio.run(ensure_neo4j_constraints(driver))
+    kind, statements = driver.transactions[-1]
+    created = [statement for statement, _ in statements]
+    assert kind == "auto"
+    assert created == [" ".join(constraint.split()) for constraint in NEO4J_CONSTRAINTS]
+    assert all("IF NOT EXISTS" in statement for statement in created)
+
+
+def test_storing_preferences_invalidates_the_cached_read(driver):
+    async def run():
+        await store_user_preferences("u1", PREFERENCES[:1])
+        first = await get_user_preferences("u1")
+        cached = await get_user_preferences("u1")
+        await store_user_preferences("u1", PREFERENCES[1:2])
+        return first, cached, await get_user_preferences("u1")
+
+    first, cached, updated = asyncio.run(run())
+    assert first == cached == [{"type": "interest", "value": "art"}]
+    assert updated == [{"type": "interest", "value": "art"}, {"type": "interest", "value": "food"}]
+    assert [kind for kind, _ in driver.transactions] == ["write", "read", "write", "read"]
@@ -0,0 +1,113 @@
+# test_scheduler.py
+import asyncio
+
+import pytest
+
+from scheduler import (
+    PRIORITY_ITINERARY,
+    PRIORITY_SHORT,
+    GenerationScheduler,
+    QueueFull,
+    TokenBucket,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_burst_and_refill():
+    clock = Clock()
+    bucket = TokenBucket(rate_per_minute=60, burst=2, clock=clock)
+    assert bucket.take("u1") == 0
+    assert bucket.take("u1") == 0
+    assert bucket.take("u1") == pytest.approx(1.0)
+    assert bucket.take("u2") == 0
+    clock.now = 1.0
+    assert bucket.take("u1") == 0
+
+
+def test_token_bucket_refund_and_disabled():
+    bucket = TokenBucket(rate_per_minute=60, burst=1, clock=Clock())
+    assert bucket.take("u1") == 0
+    bucket.refund("u1")
+    assert bucket.take("u1") == 0
+    unlimited = TokenBucket(rate_per_minute=0, burst=1)
+    assert all(unlimited.take("u1") == 0 for _ in range(10))
+
+
+def test_token_bucket_drops_full_buckets_at_max_keys():
+    clock = Clock()
+    bucket = TokenBucket(rate_per_minute=60, burst=1, max_keys=2, clock=clock)
+    bucket.take("u1")
+    bucket.take("u2")
+    clock.now = 5.0
+    bucket.take("u3")
+    assert set(bucket._buckets) == {"u3"}
+
+
+def test_short_turns_are_served_first():
+    async def scenario():
+        scheduler = GenerationScheduler(slots=1, max_queue=10, aging=0)
+        running = scheduler.enqueue(PRIORITY_SHORT)
+        itinerary = scheduler.enqueue(PRIORITY_ITINERARY)
+        short = scheduler.enqueue(PRIORITY_SHORT)
+        assert (itinerary.position, short.position) == (0, 0)
+        scheduler.release(running)
+        assert (short.state, itinerary.state) == ("running", "waiting")
+        scheduler.release(short)
+        assert itinerary.state == "running"
+        await scheduler.wait(itinerary)
+
+    asyncio.run(scenario())
+
+
+def test_aged_itinerary_is_served_before_newer_short_turns():
+    async def scenario():
+        clock = Clock()
+        scheduler = GenerationScheduler(slots=1, max_queue=10, aging=30, clock=clock)
+        running = scheduler.enqueue(PRIORITY_SHORT)
+        itinerary = scheduler.enqueue(PRIORITY_ITINERARY)
+        clock.now = 31
+        short = scheduler.enqueue(PRIORITY_SHORT)
+        scheduler.release(running)
+        assert (itinerary.state, short.state) == ("running", "waiting")
+        assert scheduler.stats()["aged"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_passes_the_slot_on():
+    async def scenario():
+        scheduler = GenerationScheduler(slots=1, max_queue=10)
+        running = scheduler.enqueue(PRIORITY_SHORT)
+        first = scheduler.enqueue(PRIORITY_SHORT)
+        second = scheduler.enqueue(PRIORITY_SHORT)
+        waiter = asyncio.create_task(scheduler.wait(first))
+        await asyncio.sleep(0)
+        # Cancelled, but release() runs before the waiter handles it
+        waiter.cancel()
+        scheduler.release(running)
+        assert (first.state, second.state) == ("done", "running")
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.in_use == 1
+        scheduler.release(second)
+        assert scheduler.in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_refused():
+    async def scenario():
+        scheduler = GenerationScheduler(slots=1, max_queue=1)
+        scheduler.enqueue(PRIORITY_SHORT)
+        scheduler.enqueue(PRIORITY_SHORT)
+        with pytest.raises(QueueFull):
+            scheduler.check_capacity()
+
+    asyncio.run(scenario())
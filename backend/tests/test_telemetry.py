@@ -0,0 +1,61 @@
+# test_telemetry.py
+from telemetry import Telemetry, telemetry
+
+
+def test_stats_are_read_at_export_time():
+    registry = Telemetry()
+    pool = {"checked_out": 1, "saturation": 0.25, "status": "Pool size: 10", "queued": {"short": 2}}
+    registry.stats("postgres_pool", "Shared pool", lambda: pool)
+    pool["checked_out"] = 3
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP postgres_pool Shared pool", "# TYPE postgres_pool gauge"]
+    assert lines[2:] == [
+        'postgres_pool{stat="checked_out"} 3',
+        'postgres_pool{stat="queued_short"} 2',
+        'postgres_pool{stat="saturation"} 0.25',
+    ]
+
+
+def test_registering_stats_again_exports_the_new_function():
+    registry = Telemetry()
+    registry.stats("cache", "A cache", lambda: {"hits": 1})
+    registry.stats("cache", "A cache", lambda: {"hits": 7})
+    assert 'cache{stat="hits"} 7' in registry.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Telemetry()
+    histogram = registry.histogram("op_seconds", "Operations", ["op"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        registry.observe(histogram, value, op="read")
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP op_seconds Operations", "# TYPE op_seconds histogram"]
+    assert lines[2:] == [
+        'op_seconds_bucket{op="read",le="0.1"} 1',
+        'op_seconds_bucket{op="read",le="1"} 2',
+        'op_seconds_bucket{op="read",le="+Inf"} 3',
+        'op_seconds_sum{op="read"} 5.550000',
+        'op_seconds_count{op="read"} 3',
+    ]
+
+
+def test_failed_span_is_timed_and_counted_as_an_error():
+    registry = Telemetry()
+    histogram = registry.histogram("stage_seconds", "Stage")
+    try:
+        with registry.span(histogram):
+            raise RuntimeError("down")
+    except RuntimeError:
+        pass
+    assert "stage_seconds_count 1" in registry.render()
+    assert 'errors_total{stage="stage_seconds"}' in telemetry.render()
+
+
+def test_disabled_registry_records_nothing():
+    registry = Telemetry(enabled=False)
+    counter = registry.counter("events_total", "Events")
+    registry.inc(counter)
+    with registry.span(registry.histogram("stage_seconds", "Stage")):
+        pass
+    assert all(line.startswith("#") for line in registry.render().splitlines())
@@ -0,0 +1,106 @@
+# bench_auth.py
+# Requests/sec on an authenticated endpoint (GET /me) served by uvicorn on
+# localhost with the in-memory store. Compares a new connection per request
+# (bare requests.post/get, as the Streamlit app used) with one keep-alive
+# session, and the per-request auth check: verifying the access token versus
+# looking the user up in the store with a simulated round-trip.
+#
+#   python benchmarks/backend/bench_auth.py --requests 2000 --latency 0.002
+import paths  # puts backend/ on sys.path
+import os
+
+os.environ.setdefault("DATA_BACKEND", "memory")
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import requests
+import uvicorn
+
+import database
+from auth_utils import create_access_token, decode_access_token
+from database import InMemoryStore, set_store
+from main import app
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark-password"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def requests_per_second(get, url, headers, total):
+    start = time.perf_counter()
+    for _ in range(total):
+        response = get(url, headers=headers)
+        assert response.status_code == 200, response.text
+    return total / (time.perf_counter() - start)
+
+
+async def checks_per_second(check, total):
+    start = time.perf_counter()
+    for _ in range(total):
+        await check()
+    return total / (time.perf_counter() - start)
+
+
+def main(args):
+    store = InMemoryStore(latency=args.latency)
+    set_store(store)
+    base = f"http://127.0.0.1:{free_port()}"
+    server = start_server(int(base.rsplit(":", 1)[1]))
+    try:
+        session = requests.Session()
+        session.post(
+            f"{base}/register",
+            json={"name": "Bench", "email": EMAIL, "contact": "0123456789", "password": PASSWORD},
+        )
+        user = session.post(f"{base}/login", json={"email": EMAIL, "password": PASSWORD}).json()
+        headers = {"Authorization": f"Bearer {user['access_token']}"}
+
+        print(f"GET /me, {args.requests} sequential requests")
+        print(f"{'client':>24} {'req/s':>10}")
+        fresh = requests_per_second(requests.get, f"{base}/me", headers, args.requests)
+        print(f"{'new connection':>24} {fresh:>10.0f}")
+        pooled = requests_per_second(session.get, f"{base}/me", headers, args.requests)
+        print(f"{'keep-alive session':>24} {pooled:>10.0f}")
+    finally:
+        server.should_exit = True
+
+    token = create_access_token(user["id"], EMAIL, "Bench")
+
+    async def verify_token():
+        decode_access_token(token)
+
+    async def lookup_user():
+        await store.get_user_by_id(user["id"])
+
+    print(f"\nauth check per request (store round-trip {args.latency * 1000:.1f} ms)")
+    print(f"{'check':>24} {'checks/s':>10}")
+    rate = asyncio.run(checks_per_second(verify_token, args.requests))
+    print(f"{'access token':>24} {rate:>10.0f}")
+    rate = asyncio.run(checks_per_second(lookup_user, min(args.requests, 500)))
+    print(f"{'user lookup':>24} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Authenticated request benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.002, help="Store round-trip seconds")
+    args = parser.parse_args()
+    main(args)
+    asyncio.run(database.close_db())
@@ -0,0 +1,79 @@
+# bench_chat_ingest.py
+# Chat logging cost per message: one insert per message (buffer disabled)
+# versus the buffered /chat/ path and the /chat/batch endpoint, against an
+# InMemoryStore with a simulated round-trip latency.
+#
+#   python benchmarks/backend/bench_chat_ingest.py --messages 5000 --latency 0.002
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import time
+
+import chat_buffer as chat_buffer_module
+import database
+import main
+from chat_buffer import ChatWriteBuffer
+from database import InMemoryStore, set_store
+from schemas import ChatMessage
+
+
+def make_chats(count: int, per_user: int):
+    # Consecutive messages per user, so each batch is one user's
+    return [
+        ChatMessage(user_id=f"user-{i // per_user}", message=f"message {i}", timestamp="")
+        for i in range(count)
+    ]
+
+
+async def run_mode(name: str, args):
+    store = InMemoryStore(latency=args.latency)
+    set_store(store)
+    main.chat_buffer = ChatWriteBuffer(
+        enabled=name != "unbuffered", max_batch=args.max_batch, flush_interval=0.05
+    )
+    chats = make_chats(args.messages, args.batch_size)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def single(chat):
+        async with semaphore:
+            await main.store_chat_message(chat, claims={"sub": chat.user_id})
+
+    async def batch(chunk):
+        async with semaphore:
+            await main.store_chat_messages(chunk, claims={"sub": chunk[0].user_id})
+
+    start = time.perf_counter()
+    if name == "batch":
+        chunks = [chats[i : i + args.batch_size] for i in range(0, len(chats), args.batch_size)]
+        await asyncio.gather(*(batch(chunk) for chunk in chunks))
+    else:
+        await asyncio.gather(*(single(chat) for chat in chats))
+    await main.chat_buffer.close()
+    elapsed = time.perf_counter() - start
+
+    assert len(store.chats) == args.messages
+    print(
+        f"{name:>11} {args.messages / elapsed:>12.1f} "
+        f"{elapsed / args.messages * 1e6:>14.1f}"
+    )
+
+
+async def run(args):
+    print(
+        f"messages: {args.messages}, latency: {args.latency * 1000:.1f} ms, "
+        f"concurrency: {args.concurrency}"
+    )
+    print(f"{'mode':>11} {'messages/s':>12} {'us/message':>14}")
+    for name in ["unbuffered", "buffered", "batch"]:
+        await run_mode(name, args)
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat ingestion benchmark")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--max-batch", type=int, default=chat_buffer_module.CHAT_BUFFER_MAX_BATCH)
+    parser.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,49 @@
+# bench_concurrency.py
+# Load benchmark for the async data layer. Runs the chat and user-lookup
+# handlers against an InMemoryStore with a simulated round-trip latency and
+# reports throughput at increasing concurrency levels.
+#
+#   python benchmarks/backend/bench_concurrency.py --requests 500 --latency 0.02
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import time
+
+import database
+from database import InMemoryStore, set_store
+from main import get_user, store_chat_message
+from schemas import ChatMessage
+
+
+async def run_level(concurrency: int, total: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await store_chat_message(
+                ChatMessage(user_id=f"user-{i}", message="hello", timestamp=""),
+                claims={"sub": f"user-{i}"},
+            )
+            await get_user(f"user-{i}@example.com")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    set_store(InMemoryStore(latency=args.latency))
+    print(f"latency per round-trip: {args.latency * 1000:.1f} ms, requests: {args.requests}")
+    print(f"{'concurrency':>12} {'req/s':>10}")
+    for level in args.levels:
+        throughput = await run_level(level, args.requests)
+        print(f"{level:>12} {throughput:>10.1f}")
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async data layer load benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+# bench_indexes.py
+# Seeds users and chats into a local mongod in steps and measures the login
+# (email) and chat history (user_id, by timestamp and _id) lookups after each
+# step, so lookup latency and keys/docs examined can be compared as the data
+# grows.
+# Uses a separate database which is dropped first.
+#
+#   python benchmarks/backend/bench_indexes.py --users 1000000 --chats 10000000
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from database import MongoStore
+from indexes import ensure_indexes, explain_query
+
+BENCH_DB_NAME = "tour_planner_bench"
+
+
+async def seed(store, start_user, end_user, chats_per_user, batch_size):
+    base = datetime(2024, 1, 1)
+    users, chats = [], []
+    for i in range(start_user, end_user):
+        users.append({"name": f"user {i}", "email": f"user{i}@example.com", "password": "x"})
+        for j in range(chats_per_user):
+            chats.append(
+                {
+                    "user_id": f"user-{i}",
+                    "message": f"message {j}",
+                    "timestamp": (base + timedelta(minutes=j)).isoformat(),
+                }
+            )
+        if len(chats) >= batch_size or len(users) >= batch_size:
+            await store.users.insert_many(users, ordered=False)
+            if chats:
+                await store.chats.insert_many(chats, ordered=False)
+            users, chats = [], []
+    if users:
+        await store.users.insert_many(users, ordered=False)
+    if chats:
+        await store.chats.insert_many(chats, ordered=False)
+
+
+async def measure(store, total_users, samples):
+    login, history = [], []
+    for _ in range(samples):
+        i = random.randrange(total_users)
+        start = time.perf_counter()
+        await store.get_user_by_email(f"user{i}@example.com")
+        login.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await store.iter_chats(f"user-{i}", descending=True, limit=20).to_list(20)
+        history.append(time.perf_counter() - start)
+
+    i = random.randrange(total_users)
+    login_plan = await explain_query(store.users, {"email": f"user{i}@example.com"})
+    history_plan = await explain_query(
+        store.chats, {"user_id": f"user-{i}"}, [("timestamp", -1), ("_id", -1)]
+    )
+    return (
+        sum(login) / samples,
+        login_plan,
+        sum(history) / samples,
+        history_plan,
+    )
+
+
+async def main(args):
+    store = MongoStore(uri=args.uri, db_name=BENCH_DB_NAME)
+    await store.client.drop_database(BENCH_DB_NAME)
+    if not args.no_indexes:
+        await ensure_indexes(store)
+
+    chats_per_user = max(1, args.chats // args.users)
+    steps = sorted({max(1, args.users // 10**k) for k in range(args.steps - 1, -1, -1)})
+    print(f"indexes: {not args.no_indexes}, chats per user: {chats_per_user}")
+    print(
+        f"{'users':>10} {'chats':>11} {'login ms':>9} {'keys':>6} {'docs':>6} "
+        f"{'history ms':>11} {'keys':>6} {'docs':>6}"
+    )
+    seeded = 0
+    for total_users in steps:
+        await seed(store, seeded, total_users, chats_per_user, args.batch_size)
+        seeded = total_users
+        login_ms, login_plan, history_ms, history_plan = await measure(
+            store, total_users, args.samples
+        )
+        print(
+            f"{total_users:>10} {total_users * chats_per_user:>11} "
+            f"{login_ms * 1000:>9.2f} {login_plan['keys_examined']:>6} "
+            f"{login_plan['docs_examined']:>6} {history_ms * 1000:>11.2f} "
+            f"{history_plan['keys_examined']:>6} {history_plan['docs_examined']:>6}"
+        )
+    if not args.keep:
+        await store.client.drop_database(BENCH_DB_NAME)
+    store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index benchmark against a local mongod")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=10_000_000)
+    parser.add_argument("--steps", type=int, default=4, help="Measure at users/10^k")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--no-indexes", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database")
+    asyncio.run(main(parser.parse_args()))
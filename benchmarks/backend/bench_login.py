@@ -0,0 +1,87 @@
+# bench_login.py
+# Login latency under a burst of concurrent users, with bcrypt running inline
+# on the event loop versus on the password worker pool. All logins arrive at
+# once, so latency is measured from the start of the burst. A probe coroutine
+# measures event loop lag to show how much other endpoints are stalled.
+#
+#   python benchmarks/backend/bench_login.py --users 200 --rounds 10
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import time
+
+import auth_utils
+import database
+from auth_utils import PasswordPool, pwd_context
+from database import InMemoryStore, set_store
+from main import login_user, store_chat_message
+from schemas import ChatMessage, UserLogin
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark-password"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def completed_after(start, coro):
+    await coro
+    return time.perf_counter() - start
+
+
+async def run_mode(kind: str, users: int, workers: int):
+    auth_utils.password_pool = PasswordPool(kind=kind, workers=workers, max_queue=users)
+    credentials = UserLogin(email=EMAIL, password=PASSWORD)
+
+    async def probe():
+        # Event loop lag seen by a chat write during the login burst
+        lags = []
+        for _ in range(20):
+            tick = time.perf_counter()
+            await asyncio.sleep(0.01)
+            await store_chat_message(
+                ChatMessage(user_id="probe", message="ping", timestamp=""),
+                claims={"sub": "probe"},
+            )
+            lags.append(time.perf_counter() - tick - 0.01)
+        return lags
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        probe(),
+        *(completed_after(start, login_user(credentials)) for _ in range(users)),
+    )
+    elapsed = time.perf_counter() - start
+    probe_samples, login_samples = results[0], results[1:]
+    auth_utils.password_pool.shutdown()
+
+    print(
+        f"{kind:>8} {percentile(login_samples, 50) * 1000:>10.1f} "
+        f"{percentile(login_samples, 99) * 1000:>10.1f} "
+        f"{max(probe_samples) * 1000:>14.1f} {users / elapsed:>10.1f}"
+    )
+
+
+async def main(args):
+    store = InMemoryStore()
+    set_store(store)
+    hashed = pwd_context.handler("bcrypt").using(rounds=args.rounds).hash(PASSWORD)
+    await store.insert_user({"name": "bench", "email": EMAIL, "password": hashed})
+
+    print(f"users: {args.users}, bcrypt rounds: {args.rounds}, workers: {args.workers}")
+    print(f"{'mode':>8} {'p50 ms':>10} {'p99 ms':>10} {'max lag ms':>14} {'logins/s':>10}")
+    for kind in args.modes:
+        await run_mode(kind, args.users, args.workers)
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login latency benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=auth_utils.PASSWORD_POOL_WORKERS)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    asyncio.run(main(parser.parse_args()))
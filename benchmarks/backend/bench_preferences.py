@@ -0,0 +1,90 @@
+# bench_preferences.py
+# Preference reads per second with and without the read-through cache,
+# against FakeNeo4jDriver with a simulated round-trip latency. A fraction of
+# operations are writes, which invalidate the user's cached entry. Also
+# compares saving a full profile one pair at a time versus in one bulk write.
+#
+#   python benchmarks/backend/bench_preferences.py --operations 20000 --latency 0.002
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import random
+import time
+
+import database
+from cache import LRUCache, ReadThroughCache
+from fakes import FakeNeo4jDriver
+
+
+async def run_reads(enabled: bool, args):
+    driver = FakeNeo4jDriver(latency=args.latency)
+    database.neo4j_driver = driver
+    database.preferences_cache = ReadThroughCache(
+        LRUCache(max_size=args.cache_size, ttl=300), enabled=enabled
+    )
+    for user in range(args.users):
+        await database.store_user_preference(f"user-{user}", "interest", "museums")
+
+    rng = random.Random(42)
+    driver.queries = 0
+    reads = 0
+    start = time.perf_counter()
+    for _ in range(args.operations):
+        # Skewed towards a small set of active users
+        user_id = f"user-{int(rng.paretovariate(1.2)) % args.users}"
+        if rng.random() < args.write_ratio:
+            await database.store_user_preference(
+                user_id, "interest", f"food-{rng.random()}"
+            )
+        else:
+            await database.get_user_preferences(user_id)
+            reads += 1
+    elapsed = time.perf_counter() - start
+
+    stats = database.preferences_cache.stats()
+    print(
+        f"{'cache' if enabled else 'no cache':>9} {reads / elapsed:>10.1f} "
+        f"{driver.queries:>13} {stats['hit_ratio']:>10.2%}"
+    )
+
+
+async def run_profile_save(args):
+    driver = FakeNeo4jDriver(latency=args.latency)
+    database.neo4j_driver = driver
+    profile = [{"type": "interest", "value": f"interest-{i}"} for i in range(args.profile_size)]
+
+    start = time.perf_counter()
+    for preference in profile:
+        await database.store_user_preference("single", preference["type"], preference["value"])
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await database.store_user_preferences("bulk", profile)
+    bulk = time.perf_counter() - start
+
+    print(
+        f"saving {args.profile_size} preferences: one per call {single * 1000:.1f} ms, "
+        f"bulk {bulk * 1000:.1f} ms"
+    )
+
+
+async def main(args):
+    print(
+        f"operations: {args.operations}, users: {args.users}, "
+        f"latency: {args.latency * 1000:.1f} ms, writes: {args.write_ratio:.0%}"
+    )
+    print(f"{'mode':>9} {'reads/s':>10} {'neo4j queries':>13} {'hit ratio':>10}")
+    await run_reads(False, args)
+    await run_reads(True, args)
+    await run_profile_save(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preferences benchmark")
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--write-ratio", type=float, default=0.02)
+    parser.add_argument("--cache-size", type=int, default=database.PREFERENCES_CACHE_SIZE)
+    parser.add_argument("--profile-size", type=int, default=15)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,195 @@
+# bench_scheduler.py
+# Simulated burst of chat traffic against one Ollama with a few parallel
+# slots (FakeLLMServer), through GenerationService.stream_reply:
+#   - light users send a few messages spread over `--window` seconds,
+#   - heavy users send `--heavy-messages` at once,
+#   - a `--short-ratio` share of messages are short turns (one LLM call),
+#     the rest full itinerary builds (`--itinerary-calls` sequential calls),
+#     told apart by the real trip intake.
+# Compared: every reply straight to Ollama (no scheduler, no rate limit),
+# the scheduler serving first come first served, and the scheduler with
+# short turns first; both scheduler runs apply the per-user rate limit.
+#
+#   python benchmarks/backend/bench_scheduler.py --users 30 --heavy-users 2 --parallel 4
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, List
+
+from fakes import FakeLLMServer
+from generation import AGENT_DIR, AgentSession, GenerationService
+from scheduler import (
+    PRIORITY_SHORT,
+    GenerationScheduler,
+    QueueFull,
+    RateLimited,
+    TokenBucket,
+)
+
+SHORT_MESSAGE = "What should I pack for a rainy day out?"
+ITINERARY_MESSAGE = (
+    "Plan a day in Lisbon on 2026-11-20 from 9am to 6pm, budget 100 euros, "
+    "I love food and history, starting from Rossio station"
+)
+
+
+class FifoScheduler(GenerationScheduler):
+    def enqueue(self, priority: int):
+        return super().enqueue(PRIORITY_SHORT)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def workload(args) -> List[tuple]:
+    """(delay, user, heavy, message) for every message of the run."""
+    rng = random.Random(args.seed)
+    messages = []
+
+    def message():
+        return SHORT_MESSAGE if rng.random() < args.short_ratio else ITINERARY_MESSAGE
+
+    for user in range(args.users):
+        for _ in range(args.messages):
+            messages.append((rng.uniform(0, args.window), f"light-{user}", False, message()))
+    for user in range(args.heavy_users):
+        for _ in range(args.heavy_messages):
+            messages.append((rng.uniform(0, 0.2), f"heavy-{user}", True, message()))
+    return messages
+
+
+async def simulate(name: str, service: GenerationService, args, TripIntake):
+    server = FakeLLMServer(args.parallel, prefill=args.prefill, token_delay=args.token_delay)
+
+    def cached_run(agent, message, slots=None):
+        if slots is None:
+            yield from server.generate(args.short_tokens)
+            return
+        for _ in range(args.itinerary_calls):
+            yield from server.generate(args.itinerary_tokens)
+
+    service._modules = {
+        "intake_enabled": True,
+        "cached_run": cached_run,
+        "remember_exchange": lambda agent, message, reply: None,
+    }
+    results: List[Dict] = []
+    positions: List[int] = []
+
+    async def send(delay, user_id, heavy, message):
+        await asyncio.sleep(delay)
+        result = {"heavy": heavy, "kind": "short" if message == SHORT_MESSAGE else "itinerary"}
+        results.append(result)
+        start = time.perf_counter()
+        try:
+            service.admit(user_id)
+        except (RateLimited, QueueFull):
+            result["status"] = "rejected"
+            return
+        session = AgentSession(user_id, None, TripIntake())
+        session.run_id = f"{user_id}-{start}"
+        async for event in service.stream_reply(session, message):
+            if event["event"] == "queued":
+                positions.append(event["position"])
+            elif event["event"] == "delta" and "ttft" not in result:
+                result["ttft"] = time.perf_counter() - start
+            elif event["event"] == "done":
+                result["seconds"] = time.perf_counter() - start
+                result["status"] = "completed"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(*message) for message in workload(args)))
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    def values(key, **match):
+        return [
+            result[key]
+            for result in results
+            if result.get("status") == "completed"
+            and all(result[field] == value for field, value in match.items())
+        ]
+
+    short_ttft = values("ttft", kind="short")
+    itinerary = values("seconds", kind="itinerary")
+    light_ttft = values("ttft", heavy=False)
+    rejected = sum(1 for result in results if result.get("status") == "rejected")
+    print(
+        f"{name:>22} {percentile(short_ttft, 0.5):>8.2f} {percentile(short_ttft, 0.95):>8.2f} "
+        f"{percentile(itinerary, 0.5):>8.2f} {percentile(itinerary, 0.95):>8.2f} "
+        f"{percentile(light_ttft, 0.95):>9.2f} {rejected:>9} "
+        f"{max(positions, default=0):>8} {server.max_wait:>9.2f} {elapsed:>8.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generation scheduler simulation")
+    parser.add_argument("--users", type=int, default=30, help="Light users")
+    parser.add_argument("--messages", type=int, default=3, help="Messages per light user")
+    parser.add_argument("--window", type=float, default=5.0, help="Seconds light users send over")
+    parser.add_argument("--heavy-users", type=int, default=2)
+    parser.add_argument("--heavy-messages", type=int, default=15)
+    parser.add_argument("--short-ratio", type=float, default=0.6)
+    parser.add_argument("--parallel", type=int, default=4, help="Ollama parallel slots")
+    parser.add_argument("--prefill", type=float, default=0.05, help="Seconds to first token")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--short-tokens", type=int, default=30)
+    parser.add_argument("--itinerary-tokens", type=int, default=80)
+    parser.add_argument("--itinerary-calls", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10, help="Messages per minute per user")
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--queue-max", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sys.path.append(AGENT_DIR)
+    from intake import TripIntake
+
+    print(
+        f"{len(workload(args))} messages, {args.parallel} Ollama slots; seconds, "
+        "ttft = time to first reply text"
+    )
+    print(
+        f"{'':>22} {'short ttft':>17} {'itinerary total':>17} {'light':>9} {'':>9} "
+        f"{'max':>8} {'max wait':>9}"
+    )
+    print(
+        f"{'mode':>22} {'p50':>8} {'p95':>8} {'p50':>8} {'p95':>8} {'p95 ttft':>9} "
+        f"{'rejected':>9} {'position':>8} {'in ollama':>9} {'elapsed':>8}"
+    )
+    unlimited = TokenBucket(rate_per_minute=0)
+    modes = [
+        (
+            "no scheduler",
+            GenerationService(
+                workers=512,
+                scheduler=GenerationScheduler(slots=10**6, max_queue=10**6),
+                limiter=unlimited,
+            ),
+        ),
+        (
+            "scheduler, fifo",
+            GenerationService(
+                workers=64,
+                scheduler=FifoScheduler(slots=args.parallel, max_queue=args.queue_max),
+                limiter=TokenBucket(args.rate, args.burst),
+            ),
+        ),
+        (
+            "scheduler, short first",
+            GenerationService(
+                workers=64,
+                scheduler=GenerationScheduler(slots=args.parallel, max_queue=args.queue_max),
+                limiter=TokenBucket(args.rate, args.burst),
+            ),
+        ),
+    ]
+    for name, service in modes:
+        asyncio.run(simulate(name, service, args, TripIntake))
@@ -0,0 +1,360 @@
+# bench_suite.py
+# End-to-end benchmark of the API with every external service replaced by a
+# local stand-in, so runs are reproducible on any machine:
+#   - MongoDB: InMemoryStore, `--store-latency` seconds per call,
+#   - Neo4j: FakeNeo4jDriver, `--neo4j-latency` seconds per query,
+#   - Ollama: ScriptedOllamaClient from benchmarks/frontend/fakes.py, streaming
+#     deterministic tokens at `--tokens-per-second` and delegating to the
+#     Weather, News and Itinerary agents the way the model is prompted to,
+#   - SerpApi/DuckDuckGo: StubSearchTools, `--search-latency` per search,
+#   - Postgres storage and the pgvector knowledge base: left out.
+# The agent turn uses the real team built by frontend/agent.py. Requests go
+# through the ASGI app in-process (middleware, validation, auth), with
+# `--concurrency` clients per scenario.
+#
+# Every scenario reports throughput and p50/p95/p99 latency. `--save` writes
+# them to a baseline file; `--compare` checks a run against one and exits
+# with status 1 when a scenario's p95 grew, or its throughput fell, by more
+# than `--tolerance`.
+#
+#   python benchmarks/backend/bench_suite.py --save bench_baseline.json
+#   python benchmarks/backend/bench_suite.py --compare bench_baseline.json --tolerance 0.2
+import paths  # puts backend/ on sys.path
+import os
+
+os.environ.setdefault("DATA_BACKEND", "memory")
+os.environ.setdefault("AGENT_PRELOAD", "0")
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+import database
+from chat_buffer import chat_buffer
+from database import InMemoryStore, set_store
+from fakes import FakeNeo4jDriver
+from generation import generation_service
+from main import app
+
+PASSWORD = "benchmark-password"
+TRIP_REQUEST = (
+    "Plan a day in Paris on {date} from 9am to 6pm, budget 120 euros, "
+    "I love museums and food, starting from Gare du Nord"
+)
+# What the fake model calls: the main agent delegates to the three planning
+# agents, and those look the details up with a search
+TOOL_PLAN = [
+    {
+        "delegate_task_to_weather_agent": {"task_description": "Weather in Paris on the visit date"},
+        "delegate_task_to_news_agent": {"task_description": "Events in Paris on the visit date"},
+        "delegate_task_to_itinerary_agent": {"task_description": "Museum and food day in Paris"},
+    },
+    {"search_google": {"query": "Paris museums food events weather"}},
+]
+
+
+def load_agent_fakes():
+    # benchmarks/frontend/fakes.py shares its module name with fakes.py here,
+    # so it is loaded from its path under another name
+    path = Path(__file__).resolve().parent.parent / "frontend" / "fakes.py"
+    spec = importlib.util.spec_from_file_location("agent_fakes", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def offline_agent_factory(args):
+    """The agent factory with Ollama, search, storage and knowledge stubbed."""
+    modules = generation_service._agent_modules()
+    from agent import AgentFactory
+
+    agent_fakes = load_agent_fakes()
+    client = agent_fakes.ScriptedOllamaClient(
+        TOOL_PLAN,
+        prefill_per_token=args.prefill_per_token,
+        token_delay=1 / args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+    )
+    search = agent_fakes.StubSearchTools(latency=args.search_latency)
+
+    class OfflineAgentFactory(AgentFactory):
+        def _ollama_client(self, timeout=None):
+            return client
+
+        def _search_backend(self):
+            return search
+
+        def _web_search_backend(self):
+            return search
+
+        def _storage(self):
+            return None
+
+        def _knowledge_base(self):
+            return None
+
+    factory = OfflineAgentFactory()
+    modules["get_agent"] = lambda llm_id, user_id=None, run_id=None: factory.get_agent(
+        user_id=user_id, run_id=run_id
+    )
+    return client, search
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def summary(latencies: List[float], elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+async def run_scenario(
+    total: int, concurrency: int, call: Callable[[int], Awaitable[None]]
+) -> tuple:
+    """Runs call(0..total-1) from `concurrency` clients; (latencies, elapsed)."""
+    latencies: List[float] = []
+
+    async def client(indices):
+        for i in indices:
+            start = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(range(c, total, concurrency)) for c in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def expect(response: httpx.Response, status: int = 200):
+    if response.status_code != status:
+        raise RuntimeError(
+            f"{response.request.method} {response.request.url.path}: "
+            f"{response.status_code} {response.text[:200]}"
+        )
+
+
+def parse_events(body: str) -> List[tuple]:
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields.get("data", "{}"))))
+    return events
+
+
+async def run_suite(args) -> Dict[str, dict]:
+    set_store(InMemoryStore(latency=args.store_latency))
+    database.neo4j_driver = FakeNeo4jDriver(latency=args.neo4j_latency)
+    client, search = offline_agent_factory(args)
+
+    results: Dict[str, dict] = {}
+    users: List[dict] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+
+        async def register(i):
+            response = await http.post(
+                "/register",
+                json={
+                    "name": f"Bench {i}",
+                    "email": f"bench-{i}@example.com",
+                    "contact": "0123456789",
+                    "password": PASSWORD,
+                },
+            )
+            expect(response)
+
+        async def login(i):
+            response = await http.post(
+                "/login", json={"email": f"bench-{i}@example.com", "password": PASSWORD}
+            )
+            expect(response)
+            users.append(response.json())
+
+        def user(i):
+            return users[i % len(users)]
+
+        def auth(i):
+            return {"Authorization": f"Bearer {user(i)['access_token']}"}
+
+        async def store_chat(i):
+            response = await http.post(
+                "/chat/",
+                json={
+                    "user_id": user(i)["id"],
+                    "message": f"Message {i} about museums in Paris",
+                    "timestamp": f"2026-01-01T00:00:{i % 60:02d}",
+                },
+                headers=auth(i),
+            )
+            expect(response, 202)
+
+        async def read_chat(i):
+            expect(await http.get(f"/chat/{user(i)['id']}", headers=auth(i)))
+
+        async def save_preferences(i):
+            response = await http.post(
+                "/preferences/bulk",
+                json={
+                    "user_id": user(i)["id"],
+                    "preferences": [
+                        {"type": "interest", "value": "museums"},
+                        {"type": "interest", "value": f"food-{i % 10}"},
+                        {"type": "budget", "value": "120"},
+                    ],
+                },
+                headers=auth(i),
+            )
+            expect(response)
+
+        async def read_preferences(i):
+            expect(await http.get(f"/preferences/{user(i)['id']}", headers=auth(i)))
+
+        ttfts: List[float] = []
+
+        async def agent_turn(i):
+            response = await http.post(
+                "/agent/chat",
+                json={
+                    "user_id": user(i)["id"],
+                    "message": TRIP_REQUEST.format(date=f"2026-11-{1 + i % 28:02d}"),
+                },
+                headers=auth(i),
+            )
+            expect(response)
+            events = parse_events(response.text)
+            kinds = [kind for kind, _ in events]
+            if "error" in kinds or kinds[-1:] != ["done"]:
+                raise RuntimeError(f"agent turn {i} failed: {events[-1]}")
+            ttfts.append(events[-1][1]["ttft"])
+
+        scenarios = [
+            ("register", args.auth_requests, register),
+            ("login", args.auth_requests, login),
+            ("chat store", args.requests, store_chat),
+            ("chat history", args.requests, read_chat),
+            ("preferences save", args.requests, save_preferences),
+            ("preferences read", args.requests, read_preferences),
+            ("agent turn", args.turns, agent_turn),
+        ]
+        for name, total, call in scenarios:
+            latencies, elapsed = await run_scenario(total, args.concurrency, call)
+            results[name] = summary(latencies, elapsed)
+            if name == "agent turn":
+                results["agent first token"] = dict(summary(ttfts, elapsed), throughput=None)
+
+    await chat_buffer.close()
+    generation_service.shutdown()
+    print(
+        f"fake LLM: {client.calls} requests, {client.tool_calls} tool calls; "
+        f"stub search: {search.calls} searches\n"
+    )
+    return results
+
+
+def settings(args) -> dict:
+    return {
+        name: getattr(args, name)
+        for name in (
+            "requests", "auth_requests", "turns", "concurrency", "store_latency",
+            "neo4j_latency", "tokens_per_second", "prefill_per_token", "reply_tokens",
+            "search_latency",
+        )
+    }
+
+
+def change(value: Optional[float], base: Optional[float]) -> str:
+    if value is None or not base:
+        return ""
+    return f"{(value - base) / base:+.0%}"
+
+
+def print_results(results: Dict[str, dict], baseline: Optional[dict]):
+    print(
+        f"{'scenario':>18} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        + (f" {'req/s vs base':>14} {'p95 vs base':>12}" if baseline else "")
+    )
+    for name, result in results.items():
+        throughput = f"{result['throughput']:.1f}" if result["throughput"] is not None else "-"
+        line = (
+            f"{name:>18} {result['requests']:>9} {throughput:>9} {result['p50'] * 1000:>9.1f} "
+            f"{result['p95'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f}"
+        )
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base:
+            line += (
+                f" {change(result['throughput'], base['throughput']):>14}"
+                f" {change(result['p95'], base['p95']):>12}"
+            )
+        print(line)
+
+
+def regressions(results: Dict[str, dict], baseline: dict, tolerance: float) -> List[str]:
+    found = []
+    for name, result in results.items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if result["p95"] > base["p95"] * (1 + tolerance):
+            found.append(f"{name}: p95 {base['p95'] * 1000:.1f} -> {result['p95'] * 1000:.1f} ms")
+        if base["throughput"] and result["throughput"] < base["throughput"] * (1 - tolerance):
+            found.append(
+                f"{name}: {base['throughput']:.1f} -> {result['throughput']:.1f} req/s"
+            )
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API and agent benchmark with local stand-ins")
+    parser.add_argument("--requests", type=int, default=400, help="Per chat/preferences scenario")
+    parser.add_argument("--auth-requests", type=int, default=40, help="Registrations and logins")
+    parser.add_argument("--turns", type=int, default=16, help="Agent turns")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--store-latency", type=float, default=0.001, help="Store round-trip seconds")
+    parser.add_argument("--neo4j-latency", type=float, default=0.001, help="Neo4j query seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Fake LLM decode rate")
+    parser.add_argument(
+        "--prefill-per-token", type=float, default=0.00002, help="Fake LLM seconds per prompt token"
+    )
+    parser.add_argument("--reply-tokens", type=int, default=40, help="Tokens per fake LLM reply")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Stub search seconds")
+    parser.add_argument("--save", help="Write the results to this baseline file")
+    parser.add_argument("--compare", help="Compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown, fraction")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    if baseline and baseline["settings"] != settings(args):
+        print("warning: settings differ from the baseline's, results are not comparable\n")
+    results = asyncio.run(run_suite(args))
+    print_results(results, baseline)
+
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps({"settings": settings(args), "scenarios": results}, indent=2) + "\n"
+        )
+        print(f"\nbaseline written to {args.save}")
+    if baseline:
+        found = regressions(results, baseline, args.tolerance)
+        if found:
+            print(f"\nregressions beyond {args.tolerance:.0%}:")
+            for regression in found:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
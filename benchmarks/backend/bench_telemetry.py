@@ -0,0 +1,74 @@
+# bench_telemetry.py
+# Per-call overhead of the telemetry hooks, enabled and in no-op mode
+# (TELEMETRY_ENABLED=0), against an untimed call, plus the time to render
+# GET /metrics with many label series.
+#
+#   python benchmarks/backend/bench_telemetry.py --calls 200000
+import paths  # puts backend/ on sys.path
+import argparse
+import asyncio
+import time
+
+from telemetry import Telemetry
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+async def per_await_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def overheads(enabled, calls):
+    telemetry = Telemetry(enabled=enabled)
+    histogram = telemetry.histogram("bench_seconds", "Benchmark", ["operation"])
+
+    def span():
+        with telemetry.span(histogram, operation="op"):
+            pass
+
+    @telemetry.timed(histogram, operation="op")
+    async def timed():
+        pass
+
+    return (
+        per_call_ns(span, calls),
+        asyncio.run(per_await_ns(timed, calls)),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetry overhead benchmark")
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--series", type=int, default=200, help="Label series when rendering")
+    args = parser.parse_args()
+
+    async def untimed():
+        pass
+
+    bare_sync = per_call_ns(lambda: None, args.calls)
+    bare_async = asyncio.run(per_await_ns(untimed, args.calls))
+    print(f"{'mode':>10} {'span ns':>10} {'timed async ns':>15}")
+    print(f"{'untimed':>10} {bare_sync:>10.0f} {bare_async:>15.0f}")
+    for name, enabled in (("no-op", False), ("enabled", True)):
+        span_ns, timed_ns = overheads(enabled, args.calls)
+        print(f"{name:>10} {span_ns:>10.0f} {timed_ns:>15.0f}")
+
+    telemetry = Telemetry()
+    histogram = telemetry.histogram("bench_seconds", "Benchmark", ["route"])
+    for i in range(args.series):
+        for _ in range(10):
+            histogram.observe(0.01 * (i % 7), route=f"/route/{i}")
+    start = time.perf_counter()
+    text = telemetry.render()
+    print(
+        f"\nrender {args.series} series: {(time.perf_counter() - start) * 1000:.2f} ms, "
+        f"{len(text) / 1024:.0f} KB"
+    )
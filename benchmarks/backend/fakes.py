@@ -0,0 +1,103 @@
+# fakes.py
+# In-process stand-ins for external services, used by the benchmarks.
+import time
+import asyncio
+import threading
+from collections import defaultdict
+
+
+# Minimal async Neo4j driver that understands the preference queries in
+# database.py. `latency` (seconds) simulates a query round-trip.
+class FakeNeo4jDriver:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.preferences = defaultdict(dict)
+        self.queries = 0
+
+    def session(self):
+        return FakeNeo4jSession(self)
+
+    async def close(self):
+        pass
+
+
+class FakeNeo4jResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+    async def consume(self):
+        pass
+
+
+class FakeNeo4jSession:
+    def __init__(self, driver: FakeNeo4jDriver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute_read(self, work, *args, **kwargs):
+        return await work(self, *args, **kwargs)
+
+    async def execute_write(self, work, *args, **kwargs):
+        return await work(self, *args, **kwargs)
+
+    async def run(self, query: str, **params):
+        driver = self.driver
+        driver.queries += 1
+        if driver.latency:
+            await asyncio.sleep(driver.latency)
+        if "UNWIND" in query:
+            for preference in params["preferences"]:
+                key = (preference["type"], preference["value"])
+                driver.preferences[params["user_id"]][key] = True
+            return FakeNeo4jResult([])
+        if "MATCH" in query:
+            return FakeNeo4jResult(
+                [
+                    {"type": preference_type, "value": value}
+                    for preference_type, value in driver.preferences[params["user_id"]]
+                ]
+            )
+        return FakeNeo4jResult([])
+
+
+# Ollama serving `parallel` requests at once; further requests wait for a
+# slot in arrival order. A request takes `prefill` seconds to its first
+# token, then `token_delay` seconds per token. Tracks the longest wait for a
+# slot and the busy slot-seconds.
+class FakeLLMServer:
+    def __init__(self, parallel: int = 4, prefill: float = 0.0, token_delay: float = 0.0):
+        self.parallel = parallel
+        self.prefill = prefill
+        self.token_delay = token_delay
+        self.requests = 0
+        self.busy_seconds = 0.0
+        self.max_wait = 0.0
+        self._slots = threading.Semaphore(parallel)
+        self._lock = threading.Lock()
+
+    def generate(self, tokens: int):
+        queued = time.perf_counter()
+        with self._slots:
+            start = time.perf_counter()
+            try:
+                time.sleep(self.prefill)
+                for i in range(tokens):
+                    time.sleep(self.token_delay)
+                    yield f"token{i} "
+            finally:
+                with self._lock:
+                    self.requests += 1
+                    self.busy_seconds += time.perf_counter() - start
+                    self.max_wait = max(self.max_wait, start - queued)
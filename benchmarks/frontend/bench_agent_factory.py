@@ -0,0 +1,54 @@
+# bench_agent_factory.py
+# Session start-up cost of the Tour Planning Agent: building every component
+# per session (a new AgentFactory each time, as before) versus handing out
+# views from the shared factory. Reports creation latency and the memory held
+# per concurrent user. No services need to be running; nothing is called.
+#
+#   python benchmarks/frontend/bench_agent_factory.py --sessions 200
+import paths  # puts frontend/ on sys.path
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from phi.utils.log import logger
+
+from agent import AgentFactory, get_agent_factory
+
+
+def run_mode(name: str, create_agent, sessions: int):
+    # Keep every agent alive, as concurrent Streamlit sessions would
+    agents = []
+    latencies = []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(sessions):
+        start = time.perf_counter()
+        agents.append(create_agent(f"user-{i}"))
+        latencies.append(time.perf_counter() - start)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    print(
+        f"{name:>11} {statistics.median(latencies) * 1000:>10.2f} "
+        f"{max(latencies) * 1000:>10.2f} {held / sessions / 1024:>13.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agent session creation benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--llm-id", default="llama3")
+    args = parser.parse_args()
+    logger.setLevel("ERROR")
+
+    print(f"sessions: {args.sessions}")
+    print(f"{'mode':>11} {'p50 ms':>10} {'max ms':>10} {'KiB/session':>13}")
+    run_mode(
+        "per-session",
+        lambda user_id: AgentFactory(args.llm_id).get_agent(user_id=user_id),
+        args.sessions,
+    )
+    # Build the shared factory outside the measured loop, as at process start
+    factory = get_agent_factory(args.llm_id)
+    run_mode("shared", lambda user_id: factory.get_agent(user_id=user_id), args.sessions)
@@ -0,0 +1,102 @@
+# bench_chat_sender.py
+# Time the chat loop spends storing each exchange, posting it inline (the
+# previous app.py) versus handing it to ChatSender, against FakeChatBackend
+# with a fixed latency. The background run takes the backend down for the
+# middle third of the exchanges and reports what was delivered, retried,
+# spilled to disk and dropped once it is back.
+#
+#   python benchmarks/frontend/bench_chat_sender.py --exchanges 300 --latency 0.05
+import paths  # puts frontend/ on sys.path
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import requests
+
+from chat_sender import ChatSender, ChatSpill
+from fakes import FakeChatBackend
+
+
+def exchange(i):
+    return [
+        {"user_id": f"user{i % 20}", "role": "user", "message": f"question {i}", "timestamp": str(i)},
+        {"user_id": f"user{i % 20}", "role": "assistant", "message": f"answer {i}", "timestamp": str(i)},
+    ]
+
+
+def percentiles(seconds):
+    ordered = sorted(seconds)
+    return (
+        statistics.median(ordered) * 1000,
+        ordered[int(0.99 * (len(ordered) - 1))] * 1000,
+    )
+
+
+def run_inline(args):
+    backend = FakeChatBackend(latency=args.latency)
+    blocked, failed = [], 0
+    for i in range(args.exchanges):
+        backend.down = args.exchanges // 3 <= i < 2 * args.exchanges // 3
+        start = time.perf_counter()
+        for message in exchange(i):
+            try:
+                backend.post("/chat/", json=message)
+            except requests.exceptions.RequestException:
+                failed += 1
+        blocked.append(time.perf_counter() - start)
+        time.sleep(args.interval)
+    return blocked, len(backend.received), failed
+
+
+def run_background(args, spill_path):
+    backend = FakeChatBackend(latency=args.latency)
+    sender = ChatSender(
+        "http://backend",
+        session=backend,
+        spill=ChatSpill(spill_path),
+        flush_interval=0.05,
+        backoff=0.05,
+        backoff_max=0.5,
+    )
+    blocked = []
+    for i in range(args.exchanges):
+        backend.down = args.exchanges // 3 <= i < 2 * args.exchanges // 3
+        start = time.perf_counter()
+        sender.enqueue(exchange(i))
+        blocked.append(time.perf_counter() - start)
+        time.sleep(args.interval)
+    # Backend is back: wait for the spill file to drain
+    deadline = time.monotonic() + 30
+    while (sender.stats()["queue_depth"] or sender.spill.count) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    sender.close()
+    return blocked, len(backend.received), backend.requests, sender.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background chat sender benchmark")
+    parser.add_argument("--exchanges", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="Backend seconds per request")
+    parser.add_argument("--interval", type=float, default=0.005, help="Seconds between exchanges")
+    args = parser.parse_args()
+    total = 2 * args.exchanges
+
+    blocked, delivered, failed = run_inline(args)
+    p50, p99 = percentiles(blocked)
+    print(f"{args.exchanges} exchanges ({total} messages), backend down for the middle third")
+    print(f"{'':>12} {'p50 ms':>8} {'p99 ms':>8} {'delivered':>10} {'lost':>6}")
+    print(f"{'inline':>12} {p50:>8.2f} {p99:>8.2f} {delivered:>10} {failed:>6}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        blocked, delivered, requests_made, stats = run_background(
+            args, os.path.join(tmp, "spill.jsonl")
+        )
+    p50, p99 = percentiles(blocked)
+    print(f"{'background':>12} {p50:>8.2f} {p99:>8.2f} {delivered:>10} {stats['dropped']:>6}")
+    print(
+        f"background: {requests_made} requests, {stats['batches']} batches, "
+        f"{stats['retries']} retries, {stats['spilled']} spilled, {stats['dropped']} dropped, "
+        f"queue {stats['queue_depth']}, spill {stats['spill_depth']}"
+    )
@@ -0,0 +1,96 @@
+# bench_context.py
+# Prompt tokens and time to first token per turn of a long conversation with
+# an agent configured like the Tour Planning Assistant (long instructions,
+# chat history in every prompt), with and without the context token ceiling.
+# Runs a real phi Assistant against FakeOllamaClient, whose time to first
+# token grows with the prompt size.
+#
+#   python benchmarks/frontend/bench_context.py --turns 20 --reply-tokens 600 --budget 3000
+import paths  # puts frontend/ on sys.path
+import argparse
+import statistics
+from textwrap import dedent
+
+from phi.assistant import Assistant
+from phi.utils.log import logger
+
+from context import BudgetedOllama, ContextMetrics
+from fakes import FakeOllamaClient
+
+INSTRUCTIONS = [
+    "Always follow this sequence:",
+    "1. If city is mentioned without date/time, ask for:",
+    "- Preferred date of visit",
+    "- Start time",
+    "- End time",
+    "2. Once all details are collected:",
+    "- Check weather using Weather Agent",
+    "- Check events using News Agent",
+    "- Create optimized itinerary",
+    "3. Format itinerary with sections:",
+    "- Schedule Overview",
+    "- Weather Advisory",
+    "- Essential Items",
+    "- Local Updates",
+]
+
+
+def run_conversation(args, budget):
+    client = FakeOllamaClient(
+        prefill_per_token=args.prefill_ms / 1000, reply_tokens=args.reply_tokens
+    )
+    recorder = ContextMetrics()
+    agent = Assistant(
+        name="Tour Planning Assistant",
+        llm=BudgetedOllama(
+            model="llama3", ollama_client=client, max_prompt_tokens=budget, metrics_recorder=recorder
+        ),
+        description=dedent(
+            """
+            I am your Tour Planning Assistant. I create personalized one-day tour itineraries by:
+            1. Collecting essential details (city, date, timings)
+            2. Checking weather conditions
+            3. Reviewing local events
+            4. Creating optimized schedules
+            5. Providing detailed recommendations
+            """
+        ),
+        instructions=INSTRUCTIONS,
+        add_chat_history_to_messages=True,
+        num_history_messages=args.history,
+        markdown=True,
+        add_datetime_to_instructions=True,
+    )
+    for turn in range(args.turns):
+        for _ in agent.run(f"Turn {turn}: change the plan to include stop number {turn}.", stream=True):
+            pass
+    return recorder.recent(args.turns)
+
+
+def report(name, records):
+    print(f"\n{name}")
+    print(f"{'turn':>6} {'tokens in':>10} {'sent':>8} {'ollama':>8} {'summarized':>11} {'ttft s':>8}")
+    for turn, record in enumerate(records):
+        print(
+            f"{turn:>6} {record['tokens_in']:>10} {record['tokens_out']:>8} "
+            f"{record['prompt_eval_count']:>8} {record['summarized']:>11} {record['ttft']:>8.2f}"
+        )
+    print(
+        f"{'mean':>6} {statistics.mean(r['tokens_in'] for r in records):>10.0f} "
+        f"{statistics.mean(r['tokens_out'] for r in records):>8.0f} {'':>8} {'':>11} "
+        f"{statistics.mean(r['ttft'] for r in records):>8.2f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Context budget benchmark")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--reply-tokens", type=int, default=600, help="Words per agent reply")
+    parser.add_argument("--history", type=int, default=5, help="num_history_messages")
+    parser.add_argument("--budget", type=int, default=3000, help="Prompt token ceiling")
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="Prefill ms per prompt token")
+    args = parser.parse_args()
+    logger.setLevel("WARNING")
+
+    report("no ceiling", run_conversation(args, budget=0))
+    report(f"ceiling {args.budget}", run_conversation(args, budget=args.budget))
@@ -0,0 +1,81 @@
+# bench_embeddings.py
+# Embeddings per second and cache hit ratio for a workload of recurring
+# search queries plus a bulk knowledge load, using FakeEmbedder with a
+# simulated per-request and per-text cost. Compares no cache, the in-memory
+# cache with one text per request, and the cache with batched embedding.
+#
+#   python benchmarks/frontend/bench_embeddings.py --queries 5000 --documents 2000
+import paths  # puts frontend/ on sys.path
+import argparse
+import random
+import time
+
+from embeddings import CachedEmbedder
+from fakes import FakeEmbedder
+
+CITIES = ["Paris", "Rome", "Tokyo", "London", "Barcelona", "New York", "Lisbon", "Prague"]
+TOPICS = ["things to do in", "best museums in", "weather in", "street food in", "day trip from"]
+
+
+def workload(args):
+    rng = random.Random(42)
+    # Query popularity is skewed, as with real users
+    queries = [
+        f"{rng.choice(TOPICS)} {CITIES[min(int(rng.paretovariate(1.0)) - 1, len(CITIES) - 1)]}"
+        for _ in range(args.queries)
+    ]
+    documents = [
+        f"chunk {i % args.unique_documents} about {CITIES[i % len(CITIES)]}"
+        for i in range(args.documents)
+    ]
+    return queries, documents
+
+
+def run_mode(name, embedder, queries, documents, batch_size, fake):
+    start = time.perf_counter()
+    for query in queries:
+        embedder.get_embedding(query)
+    if batch_size > 1:
+        for offset in range(0, len(documents), batch_size):
+            embedder.get_embeddings(documents[offset : offset + batch_size])
+    else:
+        for document in documents:
+            embedder.get_embedding(document)
+    elapsed = time.perf_counter() - start
+
+    total = len(queries) + len(documents)
+    hit_ratio = embedder.stats()["hit_ratio"] if hasattr(embedder, "stats") else 0.0
+    print(
+        f"{name:>14} {total / elapsed:>14.1f} {hit_ratio:>10.2%} "
+        f"{fake.requests:>9} {fake.embedded:>9}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding cache benchmark")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--unique-documents", type=int, default=1500)
+    parser.add_argument("--request-latency", type=float, default=0.005)
+    parser.add_argument("--item-latency", type=float, default=0.0005)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    queries, documents = workload(args)
+
+    print(
+        f"queries: {args.queries}, documents: {args.documents}, "
+        f"request: {args.request_latency * 1000:.1f} ms, per text: {args.item_latency * 1000:.2f} ms"
+    )
+    print(f"{'mode':>14} {'embeddings/s':>14} {'hit ratio':>10} {'requests':>9} {'embedded':>9}")
+
+    def fake():
+        return FakeEmbedder(request_latency=args.request_latency, item_latency=args.item_latency)
+
+    uncached = fake()
+    run_mode("no cache", uncached, queries, documents, 1, uncached)
+    cached = fake()
+    run_mode("cache", CachedEmbedder(embedder=cached), queries, documents, 1, cached)
+    batched = fake()
+    run_mode(
+        "cache + batch", CachedEmbedder(embedder=batched), queries, documents, args.batch_size, batched
+    )
@@ -0,0 +1,129 @@
+# bench_imports.py
+# Cold-start import cost of the Streamlit app, measured with
+# `python -X importtime` in a fresh interpreter per module set:
+#   - login page: the module-level imports of app.py (read from its source,
+#     so the numbers follow the app as it changes),
+#   - chat page: the imports app.py defers until the chat page,
+#   - agent stack: agent.py, which only the backend's generation tier loads.
+# With streamlit installed it also times a cold run and a rerun of app.py
+# with streamlit.testing's AppTest (the login page, as nobody is logged in).
+#
+#   python benchmarks/frontend/bench_imports.py --repeat 3 --top 10
+import paths  # puts frontend/ on sys.path
+import argparse
+import ast
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+APP = Path(paths.APP_DIR) / "app.py"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def app_imports() -> Tuple[List[str], List[str]]:
+    """(module-level imports, imports inside functions) of app.py."""
+    tree = ast.parse(APP.read_text())
+    top_level, deferred = [], []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        else:
+            continue
+        (top_level if node in tree.body else deferred).extend(names)
+    return sorted(set(top_level)), sorted(set(deferred) - set(top_level))
+
+
+def import_time(
+    modules: List[str], preloaded: List[str] = ()
+) -> Tuple[float, Dict[str, int], List[str]]:
+    """Seconds to import `modules` after `preloaded`, cumulative us of what they
+    import directly, and the modules that are not installed here."""
+    code = "import sys\n"
+    for module in list(preloaded) + ["--- start"] + list(modules):
+        if module == "--- start":
+            code += "sys.stderr.write('--- start\\n')\n"
+            continue
+        code += (
+            f"try:\n    import {module}\n"
+            f"except ModuleNotFoundError:\n    sys.stderr.write('--- missing {module}\\n')\n"
+        )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP.parent,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total = 0
+    children: Dict[str, int] = {}
+    missing: List[str] = []
+    started = False
+    for line in result.stderr.splitlines():
+        if line == "--- start":
+            started = True
+        elif started and line.startswith("--- missing "):
+            missing.append(line[len("--- missing ") :])
+        match = IMPORTTIME_LINE.match(line)
+        if not (started and match):
+            continue
+        depth = len(match.group(3)) // 2
+        if depth == 0:
+            total += int(match.group(2))
+        if depth <= 1:
+            children[match.group(4)] = int(match.group(2))
+    return total / 1e6, children, sorted(set(missing))
+
+
+def report(name, modules, args, preloaded=()):
+    try:
+        runs = [import_time(modules, preloaded) for _ in range(args.repeat)]
+    except RuntimeError as e:
+        print(f"{name:>12}: could not import ({e})")
+        return
+    seconds = statistics.median(run[0] for run in runs)
+    print(f"{name:>12}: {seconds * 1000:8.1f} ms  ({', '.join(modules)})")
+    if runs[-1][2]:
+        print(f"{'':>14}not installed, not counted: {', '.join(runs[-1][2])}")
+    heaviest = sorted(runs[-1][1].items(), key=lambda item: -item[1])[: args.top]
+    for module, us in heaviest:
+        print(f"{'':>14}{us / 1000:8.1f} ms  {module}")
+
+
+def report_app_runs(args):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("\nstreamlit not installed; skipping the app run timings")
+        return
+    app = AppTest.from_file(str(APP), default_timeout=60)
+    start = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - start
+    reruns = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - start)
+    print(f"\napp.py login page: cold run {cold * 1000:.1f} ms, rerun p50 {statistics.median(reruns) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frontend import-time benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports shown per set")
+    args = parser.parse_args()
+
+    top_level, deferred = app_imports()
+    print("cumulative import time, fresh interpreter (median of runs)")
+    report("login page", top_level, args)
+    if deferred:
+        report("chat page", deferred, args, preloaded=top_level)
+    report("agent stack", ["agent"], args)
+    report_app_runs(args)
@@ -0,0 +1,126 @@
+# bench_knowledge_index.py
+# Recall vs. latency of knowledge base retrieval over a synthetic corpus.
+# Loads clustered random vectors into a separate collection of the pgvector
+# database, computes exact top-k neighbours with index scans disabled, then
+# builds each index type and sweeps hnsw.ef_search / ivfflat.probes.
+#
+#   python benchmarks/frontend/bench_knowledge_index.py --chunks 1000000 --dim 768
+import paths  # puts frontend/ on sys.path
+import argparse
+import statistics
+import time
+
+import numpy as np
+from phi.embedder.ollama import OllamaEmbedder
+from phi.utils.log import logger
+
+from db import get_db_engine
+from knowledge import TunedPgVector, get_vector_index
+
+BENCH_COLLECTION = "tour_planner_knowledge_bench"
+
+
+def synthetic_vectors(rng, centers, count):
+    labels = rng.integers(0, len(centers), size=count)
+    vectors = centers[labels] + rng.normal(scale=0.3, size=(count, centers.shape[1]))
+    return vectors.astype(np.float32)
+
+
+def load_corpus(vector_db, args, rng, centers):
+    vector_db.delete()
+    vector_db.create()
+    connection = get_db_engine().raw_connection()
+    try:
+        psycopg_connection = connection.driver_connection
+        with psycopg_connection.cursor() as cursor:
+            with cursor.copy(
+                f"COPY {vector_db.table} (id, name, content, embedding) FROM STDIN"
+            ) as copy:
+                for offset in range(0, args.chunks, args.batch_size):
+                    count = min(args.batch_size, args.chunks - offset)
+                    for i, vector in enumerate(synthetic_vectors(rng, centers, count)):
+                        chunk_id = f"chunk-{offset + i}"
+                        embedding = "[" + ",".join(f"{x:.5f}" for x in vector) + "]"
+                        copy.write_row((chunk_id, chunk_id, chunk_id, embedding))
+        psycopg_connection.commit()
+    finally:
+        connection.close()
+
+
+def run_queries(vector_db, queries, k, **params):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        documents = vector_db.search_by_embedding(query.tolist(), limit=k, **params)
+        latencies.append(time.perf_counter() - start)
+        results.append({document.name for document in documents})
+    return latencies, results
+
+
+def report(label, latencies, results, truth, k):
+    recall = statistics.mean(len(r & t) / k for r, t in zip(results, truth))
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(
+        f"{label:>24} {recall:>8.3f} {statistics.median(latencies) * 1000:>9.2f} "
+        f"{p95 * 1000:>9.2f}"
+    )
+
+
+def main(args):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(args.clusters, args.dim))
+    vector_db = TunedPgVector(
+        db_engine=get_db_engine(),
+        collection=BENCH_COLLECTION,
+        embedder=OllamaEmbedder(model="nomic-embed-text", dimensions=args.dim),
+        index=get_vector_index("hnsw"),
+    )
+
+    if not args.skip_load:
+        start = time.perf_counter()
+        load_corpus(vector_db, args, rng, centers)
+        print(f"loaded {args.chunks} chunks in {time.perf_counter() - start:.1f}s")
+    queries = synthetic_vectors(rng, centers, args.queries)
+
+    vector_db.maintenance().drop_indexes()
+    latencies, truth = run_queries(vector_db, queries, args.k, exact=True)
+    print(f"{'setting':>24} {'recall':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    report("exact (seq scan)", latencies, truth, truth, args.k)
+
+    for index_type in args.index_types:
+        vector_db.index = get_vector_index(
+            index_type, m=args.m, ef_construction=args.ef_construction, lists=args.lists
+        )
+        start = time.perf_counter()
+        vector_db.build_index(rebuild=True)
+        print(f"built {index_type} index in {time.perf_counter() - start:.1f}s")
+        sweep = args.ef_search if index_type == "hnsw" else args.probes
+        param = "ef_search" if index_type == "hnsw" else "probes"
+        for value in sweep:
+            latencies, results = run_queries(vector_db, queries, args.k, **{param: value})
+            report(f"{index_type} {param}={value}", latencies, results, truth, args.k)
+
+    if not args.keep:
+        vector_db.delete()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge index recall/latency benchmark")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--index-types", nargs="+", default=["hnsw", "ivfflat"])
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=0)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20, 50])
+    parser.add_argument("--skip-load", action="store_true", help="Reuse a kept corpus")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collection")
+    args = parser.parse_args()
+    logger.setLevel("WARNING")
+    main(args)
@@ -0,0 +1,115 @@
+# bench_model_routing.py
+# Latency and model busy-seconds per completed plan for the real agent team
+# (agent.py) on MultiModelOllamaClient, with every agent on the large model
+# versus the Weather and News agents routed to a small one (models.py), and
+# routed with the small model stalling now and then so requests fall back
+# to the large one after the timeout, before the first token or part way
+# through a reply. Model speeds are rough llama3 8B vs.
+# llama3.2 3B figures on one GPU; all sleeps are multiplied by --time-scale
+# and the reported seconds are scaled back.
+#
+#   python benchmarks/frontend/bench_model_routing.py --plans 10 --stall-rate 0.3
+import paths  # puts frontend/ on sys.path
+import argparse
+import statistics
+import time
+
+from phi.utils.log import logger
+
+from agent import AgentFactory
+from fakes import MultiModelOllamaClient, StubSearchTools
+from models import ModelRouter
+
+LARGE = "llama3"
+SMALL = "llama3.2:3b"
+TRIP_REQUEST = (
+    "Plan a day in Paris on 2026-11-20 from 9am to 6pm, budget 120 euros, "
+    "I love museums and food, starting from Gare du Nord"
+)
+TOOL_PLAN = [
+    {
+        "delegate_task_to_weather_agent": {"task_description": "Weather in Paris on the visit date"},
+        "delegate_task_to_news_agent": {"task_description": "Events in Paris on the visit date"},
+        "delegate_task_to_itinerary_agent": {"task_description": "Museum and food day in Paris"},
+    },
+    {"search_google": {"query": "Paris museums food events weather"}},
+]
+
+
+def run_plans(name, args, small_model, stall_rate, stall_midway=0.0):
+    scale = args.time_scale
+    client = MultiModelOllamaClient(
+        TOOL_PLAN,
+        models={
+            # (prefill seconds per prompt token, seconds per generated token)
+            LARGE: (scale / args.large_prefill_rate, scale / args.large_token_rate),
+            SMALL: (scale / args.small_prefill_rate, scale / args.small_token_rate),
+        },
+        reply_tokens=args.reply_tokens,
+        stall_rates={SMALL: stall_rate},
+        stall_seconds=args.stall_seconds * scale,
+        stall_midway=stall_midway,
+        seed=args.seed,
+    )
+    search = StubSearchTools()
+
+    class OfflineAgentFactory(AgentFactory):
+        def _ollama_client(self, timeout=None):
+            return client.with_timeout(timeout and args.fallback_timeout * scale)
+
+        def _search_backend(self):
+            return search
+
+        def _web_search_backend(self):
+            return search
+
+        def _storage(self):
+            return None
+
+        def _knowledge_base(self):
+            return None
+
+    factory = OfflineAgentFactory(LARGE, router=ModelRouter(LARGE, small_model, overrides={}))
+    latencies = []
+    for _ in range(args.plans):
+        agent = factory.get_agent()
+        start = time.perf_counter()
+        for _ in agent.run(TRIP_REQUEST, stream=True):
+            pass
+        latencies.append((time.perf_counter() - start) / scale)
+
+    usage = client.usage
+    large = usage["seconds"][LARGE] / scale / args.plans
+    small = usage["seconds"][SMALL] / scale / args.plans
+    print(
+        f"{name:>24} {statistics.median(latencies):>8.1f} {max(latencies):>8.1f} "
+        f"{large:>9.1f} {small:>9.1f} {large + small:>9.1f} "
+        f"{usage['requests'][SMALL]:>9} {usage['timeouts'][SMALL]:>9}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-role model routing benchmark")
+    parser.add_argument("--plans", type=int, default=5)
+    parser.add_argument("--reply-tokens", type=int, default=150)
+    parser.add_argument("--large-token-rate", type=float, default=30, help="Tokens/s generated")
+    parser.add_argument("--large-prefill-rate", type=float, default=1000, help="Prompt tokens/s")
+    parser.add_argument("--small-token-rate", type=float, default=75)
+    parser.add_argument("--small-prefill-rate", type=float, default=3000)
+    parser.add_argument("--stall-rate", type=float, default=0.3, help="Small model stalls, share")
+    parser.add_argument("--stall-seconds", type=float, default=60)
+    parser.add_argument("--fallback-timeout", type=float, default=15, help="Seconds")
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Sleep multiplier")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logger.setLevel("ERROR")
+
+    print(f"{args.plans} plans; seconds per plan at full speed, busy = time a model spends on requests")
+    print(
+        f"{'mode':>24} {'p50':>8} {'max':>8} {'large busy':>9} {'small busy':>9} {'total':>9} "
+        f"{'small req':>9} {'timeouts':>9}"
+    )
+    run_plans("large only", args, "", 0.0)
+    run_plans("routed", args, SMALL, 0.0)
+    run_plans("routed, small stalls", args, SMALL, args.stall_rate)
+    run_plans("routed, stalls mid-reply", args, SMALL, args.stall_rate, stall_midway=1.0)
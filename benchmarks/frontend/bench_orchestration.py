@@ -0,0 +1,67 @@
+# bench_orchestration.py
+# Wall-clock time of a full tour plan when the Weather, News and Itinerary
+# stages run one after another (team delegation) versus with weather and news
+# fanned out in parallel by TourPlanOrchestrator. Uses FakeAgent stand-ins
+# with configurable per-stage latency and prints per-stage timings.
+#
+#   python benchmarks/frontend/bench_orchestration.py --weather 2.0 --news 2.5 --itinerary 4.0
+import paths  # puts frontend/ on sys.path
+import argparse
+import time
+
+from fakes import FakeAgent
+from orchestration import TourPlanOrchestrator
+
+TRIP = "Paris, 2024-06-01, 09:00-18:00, budget $100, museums, starting at Gare du Nord"
+
+
+def agents(args):
+    return (
+        FakeAgent("weather", latency=args.weather),
+        FakeAgent("news", latency=args.news),
+        FakeAgent("itinerary", latency=args.itinerary, token_delay=args.token_delay),
+    )
+
+
+def run_sequential(args):
+    weather_agent, news_agent, itinerary_agent = agents(args)
+    timings = {}
+    start = time.perf_counter()
+    weather = weather_agent.run(TRIP, stream=False)
+    timings["weather"] = time.perf_counter() - start
+    news_start = time.perf_counter()
+    news = news_agent.run(TRIP, stream=False)
+    timings["news"] = time.perf_counter() - news_start
+    itinerary_start = time.perf_counter()
+    for _ in itinerary_agent.run(f"{TRIP}\n{weather}\n{news}", stream=True):
+        pass
+    timings["itinerary"] = time.perf_counter() - itinerary_start
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def run_parallel(args):
+    orchestrator = TourPlanOrchestrator(*agents(args))
+    for _ in orchestrator.plan(TRIP, stream=True):
+        pass
+    return orchestrator.timings
+
+
+def report(name, timings):
+    stages = ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+    print(f"{name:>10}: {stages}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tour plan orchestration benchmark")
+    parser.add_argument("--weather", type=float, default=2.0)
+    parser.add_argument("--news", type=float, default=2.5)
+    parser.add_argument("--itinerary", type=float, default=4.0)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    sequential = run_sequential(args)
+    parallel = run_parallel(args)
+    report("sequential", sequential)
+    report("parallel", parallel)
+    print(f"wall-clock reduction: {1 - parallel['total'] / sequential['total']:.0%}")
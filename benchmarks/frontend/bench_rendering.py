@@ -0,0 +1,83 @@
+# bench_rendering.py
+# Bytes sent to the browser and server-side render time for one streamed
+# itinerary-style reply, rendering every delta into one markdown element (the
+# previous chat loop) versus StreamingMarkdown with throttling only and with
+# throttling plus paragraph blocks. Deltas arrive at a simulated token rate;
+# each render encodes the element text as Streamlit does before sending it.
+#
+#   python benchmarks/frontend/bench_rendering.py --tokens 5000 --tokens-per-second 30
+import paths  # puts frontend/ on sys.path
+import argparse
+import random
+import time
+
+from rendering import StreamingMarkdown
+
+WORDS = (
+    "visit the old town market museum lunch at a local cafe walk along the river "
+    "tickets open from closes at budget about minutes by metro or on foot"
+).split()
+
+
+class RecordingBlock:
+    def __init__(self, elements):
+        self.text = ""
+        elements.append(self)
+
+    def markdown(self, text):
+        # Streamlit serializes the whole element text on every update
+        self.text = text
+        text.encode("utf-8")
+
+
+def reply_tokens(count, rng):
+    """Token stream of a reply with headings, bullet lists and a code block."""
+    tokens = []
+    while len(tokens) < count:
+        tokens += ["\n\n### ", rng.choice(WORDS).title(), "\n\n"]
+        for _ in range(rng.randint(3, 6)):
+            tokens.append("- ")
+            tokens += [rng.choice(WORDS) + " " for _ in range(rng.randint(8, 20))]
+            tokens.append("\n")
+        if rng.random() < 0.2:
+            tokens += ["\n```\n"] + [rng.choice(WORDS) + " " for _ in range(20)] + ["\n```\n"]
+    return tokens[:count]
+
+
+def run(tokens, args, **options):
+    elements = []
+    clock = {"now": 0.0}
+    renderer = StreamingMarkdown(
+        lambda: RecordingBlock(elements), clock=lambda: clock["now"], **options
+    )
+    start = time.perf_counter()
+    for token in tokens:
+        clock["now"] += 1 / args.tokens_per_second
+        renderer.push(token)
+    text = renderer.flush()
+    seconds = time.perf_counter() - start
+    assert "".join(element.text + "\n\n" for element in elements).split() == text.split()
+    return renderer.stats(), len(elements), seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming render benchmark")
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between updates")
+    args = parser.parse_args()
+
+    tokens = reply_tokens(args.tokens, random.Random(42))
+    modes = [
+        ("every delta", dict(interval=0, min_chars=0, split_blocks=False)),
+        ("throttled", dict(interval=args.interval, split_blocks=False)),
+        ("throttled + blocks", dict(interval=args.interval, split_blocks=True)),
+    ]
+    print(f"{args.tokens} tokens at {args.tokens_per_second:.0f} tokens/s")
+    print(f"{'mode':>20} {'renders':>8} {'elements':>9} {'KB sent':>10} {'render ms':>10}")
+    for name, options in modes:
+        stats, elements, seconds = run(tokens, args, **options)
+        print(
+            f"{name:>20} {stats['renders']:>8} {elements:>9} "
+            f"{stats['bytes_sent'] / 1024:>10.1f} {seconds * 1000:>10.1f}"
+        )
@@ -0,0 +1,113 @@
+# bench_response_cache.py
+# Hit rate and latency saved by the semantic response cache on a replayed
+# query log. The log is generated from a skewed mix of trips (city, day,
+# budget, interests) phrased with different templates; each request goes
+# through cached_run against a FakeAgent with a fixed generation time.
+# "wrong" counts hits that served an itinerary for a different trip.
+#
+#   python benchmarks/frontend/bench_response_cache.py --requests 500 --generation 0.2
+#   python benchmarks/frontend/bench_response_cache.py --log queries.txt --ollama
+import paths  # puts frontend/ on sys.path
+import argparse
+import random
+import statistics
+import time
+from datetime import date
+
+from fakes import BagOfWordsEmbedder, FakeAgent
+from response_cache import SemanticResponseCache, cached_run
+from slots import extract_slots
+
+CITIES = ["Paris", "Rome", "London", "Tokyo", "Barcelona", "Lisbon", "Berlin", "Prague"]
+DAYS = ["today", "tomorrow", "on saturday", "next friday"]
+BUDGETS = [50, 100, 200]
+INTERESTS = [["museums"], ["food"], ["museums", "food"], ["nature"], ["history", "architecture"]]
+TEMPLATES = [
+    "One day in {city} {day}, budget ${budget}, {interests}",
+    "Plan my day in {city} {day}. I like {interests} and have ${budget}",
+    "{day} I want to explore {city} with {budget} dollars, interested in {interests}",
+    "Can you make an itinerary for a day in {city} {day}? Budget ${budget}, mostly {interests}.",
+]
+
+
+def generate_log(args):
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(len(CITIES))]
+    log = []
+    for _ in range(args.requests):
+        city = rng.choices(CITIES, weights)[0]
+        day = rng.choice(DAYS)
+        budget = rng.choice(BUDGETS)
+        interests = rng.choice(INTERESTS)
+        request = rng.choice(TEMPLATES).format(
+            city=city, day=day, budget=budget, interests=" and ".join(interests)
+        )
+        log.append(request)
+    return log
+
+
+def main(args):
+    if args.log:
+        with open(args.log) as f:
+            log = [line.strip() for line in f if line.strip()]
+    else:
+        log = generate_log(args)
+
+    if args.ollama:
+        from embeddings import get_embedder
+
+        embedder = get_embedder()
+    else:
+        embedder = BagOfWordsEmbedder()
+    cache = SemanticResponseCache(embedder=embedder, threshold=args.threshold, enabled=True)
+    today = date.today()
+
+    latencies, hit_latencies, miss_latencies = [], [], []
+    wrong = 0
+    for request in log:
+        agent = FakeAgent(
+            "itinerary",
+            latency=args.generation,
+            token_delay=args.token_delay,
+            header=f"## Schedule Overview\n{request}\n",
+        )
+        start = time.perf_counter()
+        response = "".join(cached_run(agent, request, cache=cache))
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        if agent.calls:
+            miss_latencies.append(elapsed)
+        else:
+            hit_latencies.append(elapsed)
+            served = extract_slots(response.splitlines()[1], today)
+            if served != extract_slots(request, today):
+                wrong += 1
+
+    stats = cache.stats()
+    baseline = len(log) * args.generation
+    print(f"{len(log)} requests, {stats['lookups']} cacheable, {stats['size']} cached itineraries")
+    print(
+        f"hits={stats['hits']} misses={stats['misses']} stale={stats['stale']} "
+        f"hit_ratio={stats['hit_ratio']:.2f} wrong={wrong}"
+    )
+    if hit_latencies:
+        print(f"hit latency p50 {statistics.median(hit_latencies) * 1000:.1f} ms")
+    if miss_latencies:
+        print(f"miss latency p50 {statistics.median(miss_latencies) * 1000:.1f} ms")
+    print(
+        f"total {sum(latencies):.1f}s vs {baseline:.1f}s uncached "
+        f"(saved {stats['saved_seconds']:.1f}s, {stats['saved_seconds'] / baseline:.0%})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Semantic response cache benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--log", help="Replay requests from a file, one per line")
+    parser.add_argument("--generation", type=float, default=0.2, help="Seconds per itinerary")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--ollama", action="store_true", help="Embed with nomic-embed-text")
+    args = parser.parse_args()
+
+    main(args)
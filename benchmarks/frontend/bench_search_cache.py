@@ -0,0 +1,83 @@
+# bench_search_cache.py
+# Search tool latency and backend calls for a burst of users asking
+# overlapping questions, with and without the shared search cache. Queries are
+# drawn from a small pool with a skewed distribution and random casing and
+# punctuation, against StubSearchTools with a fixed per-call latency.
+#
+#   python benchmarks/frontend/bench_search_cache.py --users 200 --latency 0.3
+import paths  # puts frontend/ on sys.path
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import StubSearchTools
+from search_cache import CachedSearchTools, SearchResultCache
+
+CITIES = ["Rome", "Paris", "London", "Tokyo", "New York", "Barcelona", "Berlin", "Lisbon"]
+TOPICS = ["weather in {} tomorrow", "events in {} this weekend", "top museums in {}"]
+
+
+def query_log(args):
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(len(CITIES))]
+    log = []
+    for _ in range(args.users * args.queries_per_user):
+        query = rng.choice(TOPICS).format(rng.choices(CITIES, weights)[0])
+        if rng.random() < 0.5:
+            query = query.capitalize() + "?"
+        log.append(query)
+    return log
+
+
+def run(tools, log, workers):
+    search = tools.functions["search_google"].entrypoint
+
+    def timed(query):
+        start = time.perf_counter()
+        search(query=query)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(timed, log))
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed, backend_calls):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(
+        f"{name:>10} {backend_calls:>8} {statistics.median(latencies) * 1000:>9.1f} "
+        f"{p95 * 1000:>9.1f} {elapsed:>9.2f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search result cache benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--queries-per-user", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per search")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--ttl", type=float, default=600)
+    args = parser.parse_args()
+
+    log = query_log(args)
+    print(f"{len(log)} queries, {len(set(log))} distinct strings")
+    print(f"{'mode':>10} {'backend':>8} {'p50 ms':>9} {'p95 ms':>9} {'wall s':>9}")
+
+    backend = StubSearchTools(latency=args.latency)
+    latencies, elapsed = run(backend, log, args.workers)
+    report("no cache", latencies, elapsed, backend.calls)
+
+    backend = StubSearchTools(latency=args.latency)
+    cache = SearchResultCache()
+    latencies, elapsed = run(CachedSearchTools(backend, ttl=args.ttl, cache=cache), log, args.workers)
+    report("cache", latencies, elapsed, backend.calls)
+
+    stats = cache.stats()
+    print(
+        f"hits={stats['hits']} coalesced={stats['coalesced']} misses={stats['misses']} "
+        f"hit_ratio={stats['hit_ratio']:.2f} fetch_avg_ms={stats['fetch_avg_ms']:.1f}"
+    )
@@ -0,0 +1,129 @@
+# bench_slot_filling.py
+# LLM calls per completed itinerary when the agent collects the trip details
+# itself versus when TripIntake collects them and only the final request
+# reaches the agent. Simulated users give the seven details (city, date,
+# start/end time, budget, interests, starting point) spread over a random
+# number of messages, sometimes opening with small talk. Also checks that
+# the intake ended up with the details the user gave.
+#
+#   python benchmarks/frontend/bench_slot_filling.py --users 1000 --llm-latency 3.0
+import paths  # puts frontend/ on sys.path
+import argparse
+import random
+import statistics
+import time
+from datetime import date, time as day_time, timedelta
+
+from intake import TripIntake
+from slots import TripSlots
+
+CITIES = ["Paris", "Rome", "London", "Tokyo", "Barcelona", "Lisbon", "New York"]
+INTERESTS = [["museums"], ["food"], ["museums", "food"], ["nature"], ["history"]]
+STARTS = ["Gare du Nord", "my hotel near the old town", "the central station", "Hotel Arts"]
+PHRASES = {
+    "city": [
+        "I'd like to visit {city}",
+        "{city}",
+        "Planning a day in {city}",
+        "I want to go to {city}",
+        "I'm going to be in {city}",
+        "I'm going to {city}",
+        "explore the city of {city}",
+    ],
+    "date": ["on {date:%B} {date.day}", "{date:%Y-%m-%d}", "tomorrow"],
+    "times": ["from {start}am to {end}pm", "{start}-{end}pm", "{start}:00 to {end}:00"],
+    "budget": ["budget ${budget}", "I have {budget} dollars", "around ${budget}"],
+    "interests": ["I love {interests}", "mostly {interests}", "interested in {interests}"],
+    "starting_point": ["starting from {start_point}", "staying at {start_point}"],
+}
+
+
+def simulated_user(rng, today):
+    tomorrow = today + timedelta(days=1)
+    trip = {
+        "city": rng.choice(CITIES),
+        "date": rng.choice([tomorrow, today + timedelta(days=rng.randint(2, 60))]),
+        "start": rng.randint(8, 11),
+        "end": rng.randint(4, 7),
+        "budget": rng.choice([50, 80, 100, 150, 200]),
+        "interests": rng.choice(INTERESTS),
+        "start_point": rng.choice(STARTS),
+    }
+    parts = []
+    for field, phrases in PHRASES.items():
+        phrase = rng.choice(phrases)
+        if field == "date" and phrase == "tomorrow":
+            trip["date"] = tomorrow
+        parts.append(
+            phrase.format(
+                city=trip["city"],
+                date=trip["date"],
+                start=trip["start"],
+                end=trip["end"],
+                budget=trip["budget"],
+                interests=" and ".join(trip["interests"]),
+                start_point=trip["start_point"],
+            )
+        )
+    # The city comes first (answering the welcome question), the rest in any
+    # order over one to four messages
+    rest = parts[1:]
+    rng.shuffle(rest)
+    groups = rng.randint(1, 4)
+    messages = [parts[0]] + [", ".join(rest[i::groups]) for i in range(groups)]
+    if rng.random() < 0.3:
+        messages.insert(0, "Hi!")
+    expected = TripSlots(
+        city=trip["city"],
+        date=trip["date"],
+        budget=float(trip["budget"]),
+        interests=frozenset(trip["interests"]),
+        start_time=day_time(trip["start"]),
+        end_time=day_time(trip["end"] + 12),
+        starting_point=trip["start_point"],
+    )
+    return messages, expected
+
+
+def main(args):
+    rng = random.Random(42)
+    today = date.today()
+    calls_before, calls_after, intake_seconds = [], [], []
+    correct = 0
+    for _ in range(args.users):
+        messages, expected = simulated_user(rng, today)
+        # Without the intake every message is an LLM turn
+        calls_before.append(len(messages))
+
+        intake = TripIntake(today=today)
+        calls = 0
+        for message in messages:
+            start = time.perf_counter()
+            question = intake.update(message)
+            intake_seconds.append(time.perf_counter() - start)
+            if question is None:
+                intake.agent_message(message)
+                calls += 1
+        if not intake.completed:
+            # Fell back to the agent to finish the collection
+            calls += 1
+        calls_after.append(calls)
+        correct += intake.slots == expected
+
+    before, after = statistics.mean(calls_before), statistics.mean(calls_after)
+    print(f"{args.users} conversations")
+    print(f"{'':>16} {'LLM calls':>10} {'LLM seconds':>12}")
+    print(f"{'agent collects':>16} {before:>10.2f} {before * args.llm_latency:>12.1f}")
+    print(f"{'intake':>16} {after:>10.2f} {after * args.llm_latency:>12.1f}")
+    print(
+        f"slots correct {correct / args.users:.0%}, intake turn p50 "
+        f"{statistics.median(intake_seconds) * 1e6:.0f} us"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slot-filling fast path benchmark")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--llm-latency", type=float, default=3.0, help="Seconds per LLM turn")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,317 @@
+# fakes.py
+# Local stand-ins for Ollama and other services, used by the benchmarks.
+import copy
+import json
+import time
+import random
+import threading
+from collections import defaultdict
+from hashlib import sha256
+from typing import List, Optional, Tuple, Dict
+
+import httpx
+import requests
+from ollama import Client as OllamaClient
+from phi.assistant import AssistantMemory
+from phi.embedder.base import Embedder
+from phi.tools import Toolkit
+
+
+# Deterministic embedder: the same text always maps to the same vector.
+# Simulates a fixed cost per request plus a cost per embedded text.
+class FakeEmbedder(Embedder):
+    dimensions: int = 768
+    model: str = "fake-embed"
+    request_latency: float = 0.0
+    item_latency: float = 0.0
+    requests: int = 0
+    embedded: int = 0
+
+    def _vector(self, text: str) -> List[float]:
+        rng = random.Random(sha256(text.encode()).digest())
+        return [rng.uniform(-1, 1) for _ in range(self.dimensions)]
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        self.embedded += len(texts)
+        time.sleep(self.request_latency + self.item_latency * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+# Embedder where texts sharing words get similar vectors (hashed bag of
+# words), so paraphrased requests can be told apart from unrelated ones.
+class BagOfWordsEmbedder(FakeEmbedder):
+    dimensions: int = 256
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            vector[int(sha256(word.encode()).hexdigest(), 16) % self.dimensions] += 1.0
+        return vector
+
+
+# Stand-in for a phi Assistant: answers after `latency` seconds (an LLM plus
+# search round-trip) and streams its reply `token_delay` seconds per token,
+# starting with `header` if given.
+class FakeAgent:
+    def __init__(
+        self,
+        name: str,
+        latency: float = 0.0,
+        token_delay: float = 0.0,
+        tokens: int = 20,
+        header: str = "",
+    ):
+        self.name = name
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.header = header
+        self.calls = 0
+        self.memory = AssistantMemory()
+
+    def write_to_storage(self):
+        return None
+
+    def _tokens(self):
+        time.sleep(self.latency)
+        if self.header:
+            yield self.header
+        for i in range(self.tokens):
+            time.sleep(self.token_delay)
+            yield f"{self.name} token {i} "
+
+    def run(self, message: str, stream: bool = True):
+        self.calls += 1
+        if stream:
+            return self._tokens()
+        return "".join(self._tokens())
+
+
+# Local search backend with the same function as SerpApiTools. Each call
+# sleeps `latency` seconds and returns canned results for the query.
+class StubSearchTools(Toolkit):
+    def __init__(self, latency: float = 0.0):
+        super().__init__(name="stub_search")
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.register(self.search_google)
+
+    def search_google(self, query: str) -> str:
+        """Search Google for a query. Returns the search results.
+
+        Args:
+            query(str): The query to search for.
+        Returns:
+            str: The search results.
+        """
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return json.dumps({"search_results": [{"title": f"Result for {query}"}]})
+
+
+# Stand-in for ollama.Client.chat. Time to first token grows with the prompt
+# (`prefill_per_token` seconds per prompt token, estimated at 4 characters
+# each), then `reply_tokens` words stream `token_delay` seconds apart.
+# Subclasses the real client only so phi's Ollama accepts it; nothing of the
+# HTTP client is set up.
+class FakeOllamaClient(OllamaClient):
+    def __init__(
+        self, prefill_per_token: float = 0.0, token_delay: float = 0.0, reply_tokens: int = 50
+    ):
+        self.prefill_per_token = prefill_per_token
+        self.token_delay = token_delay
+        self.reply_tokens = reply_tokens
+        self.calls = 0
+        self.prompt_tokens: List[int] = []
+
+    def _prompt_tokens(self, messages) -> int:
+        return sum(len(str(message.get("content") or "")) for message in messages) // 4
+
+    def _reply(self, messages) -> List[str]:
+        return [f"word{i} " for i in range(self.reply_tokens)]
+
+    def _stream(self, prompt_tokens: int, pieces: List[str]):
+        time.sleep(self.prefill_per_token * prompt_tokens)
+        for piece in pieces:
+            time.sleep(self.token_delay)
+            yield {"message": {"role": "assistant", "content": piece}, "done": False}
+        yield {
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": len(pieces),
+        }
+
+    def chat(self, model: str, messages, stream: bool = False, **kwargs):
+        self.calls += 1
+        prompt_tokens = self._prompt_tokens(messages)
+        self.prompt_tokens.append(prompt_tokens)
+        chunks = self._stream(prompt_tokens, self._reply(messages))
+        if stream:
+            return chunks
+        chunks = list(chunks)
+        content = "".join(chunk["message"]["content"] for chunk in chunks)
+        return dict(chunks[-1], message={"role": "assistant", "content": content})
+
+
+# FakeOllamaClient that also calls tools, the way a model prompted by phi
+# does: by replying with {"tool_calls": [...]} JSON. `tool_plan` is a list of
+# stages mapping function names to arguments; a request calls the functions
+# of the first stage offered in its system prompt, and the follow-up request
+# carrying the tool results gets the prose reply.
+class ScriptedOllamaClient(FakeOllamaClient):
+    TOOL_RESULTS_PROMPT = "Using the results of the tools above"
+
+    def __init__(self, tool_plan: List[Dict[str, dict]], **kwargs):
+        super().__init__(**kwargs)
+        self.tool_plan = tool_plan
+        self.tool_calls = 0
+
+    def _planned_calls(self, messages) -> List[dict]:
+        if str(messages[-1].get("content") or "").startswith(self.TOOL_RESULTS_PROMPT):
+            return []
+        system = "".join(
+            str(message.get("content") or "") for message in messages if message["role"] == "system"
+        )
+        for stage in self.tool_plan:
+            calls = [
+                {"name": name, "arguments": arguments}
+                for name, arguments in stage.items()
+                if name in system
+            ]
+            if calls:
+                return calls
+        return []
+
+    def _reply(self, messages) -> List[str]:
+        calls = self._planned_calls(messages)
+        if not calls:
+            return super()._reply(messages)
+        self.tool_calls += len(calls)
+        # Streamed about 4 characters per token, like the model would
+        content = json.dumps({"tool_calls": calls})
+        return [content[i : i + 4] for i in range(0, len(content), 4)]
+
+
+# ScriptedOllamaClient serving several models at their own speed: `models`
+# maps a model name to (prefill seconds per prompt token, seconds per
+# token). With `stall_rates` a model's requests stall `stall_seconds` that
+# often (an overloaded or cold model): before the first token, or halfway
+# through the reply for a `stall_midway` share of them. with_timeout() gives
+# a client that, like ollama.Client(timeout=...), raises httpx.ReadTimeout
+# when a read waits too long: for any one chunk when streaming, for the
+# whole reply otherwise. `usage` (shared by such clients)
+# counts busy seconds, requests and timeouts per model.
+class MultiModelOllamaClient(ScriptedOllamaClient):
+    def __init__(
+        self,
+        tool_plan: List[Dict[str, dict]],
+        models: Dict[str, Tuple[float, float]],
+        reply_tokens: int = 50,
+        stall_rates: Optional[Dict[str, float]] = None,
+        stall_seconds: float = 0.0,
+        stall_midway: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(tool_plan, reply_tokens=reply_tokens)
+        self.models = models
+        self.stall_rates = stall_rates or {}
+        self.stall_seconds = stall_seconds
+        self.stall_midway = stall_midway
+        self.timeout: Optional[float] = None
+        self.usage = {
+            "seconds": defaultdict(float),
+            "requests": defaultdict(int),
+            "timeouts": defaultdict(int),
+        }
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def with_timeout(self, timeout: Optional[float]) -> "MultiModelOllamaClient":
+        client = copy.copy(self)
+        client.timeout = timeout
+        return client
+
+    def _use(self, model: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.usage["seconds"][model] += seconds
+            self.usage["requests"][model] += 1
+            if timed_out:
+                self.usage["timeouts"][model] += 1
+
+    def _generate(self, model: str, prompt_tokens: int, pieces: List[str], stream: bool):
+        prefill_per_token, token_delay = self.models[model]
+        with self._lock:
+            stalled = self._rng.random() < self.stall_rates.get(model, 0.0)
+            midway = stalled and self._rng.random() < self.stall_midway
+        # Seconds waited for each chunk, the final one included
+        gaps = [token_delay] * len(pieces) + [0.0]
+        gaps[0] += prefill_per_token * prompt_tokens
+        if stalled:
+            gaps[max(1, len(pieces) // 2) if midway and len(pieces) > 1 else 0] += self.stall_seconds
+        if not stream:
+            # The whole reply is one read
+            gaps = [sum(gaps)] + [0.0] * (len(gaps) - 1)
+        chunks = [{"message": {"role": "assistant", "content": piece}, "done": False} for piece in pieces]
+        chunks.append(
+            {
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": len(pieces),
+            }
+        )
+        start = time.perf_counter()
+        for gap, chunk in zip(gaps, chunks):
+            if self.timeout is not None and gap > self.timeout:
+                time.sleep(self.timeout)
+                self._use(model, time.perf_counter() - start, timed_out=True)
+                raise httpx.ReadTimeout(f"{model} timed out")
+            time.sleep(gap)
+            if chunk["done"]:
+                self._use(model, time.perf_counter() - start)
+            yield chunk
+
+    def chat(self, model: str, messages, stream: bool = False, **kwargs):
+        self.calls += 1
+        prompt_tokens = self._prompt_tokens(messages)
+        self.prompt_tokens.append(prompt_tokens)
+        chunks = self._generate(model, prompt_tokens, self._reply(messages), stream)
+        if stream:
+            return chunks
+        chunks = list(chunks)
+        content = "".join(chunk["message"]["content"] for chunk in chunks)
+        return dict(chunks[-1], message={"role": "assistant", "content": content})
+
+
+# Stand-in for the requests.Session posting to the backend's /chat/batch.
+# Each request takes `latency` seconds; while `down` is set it fails like an
+# unreachable backend.
+class FakeChatBackend:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.down = False
+        self.requests = 0
+        self.received: List[dict] = []
+        self._lock = threading.Lock()
+
+    def post(self, url: str, json=None, headers=None, timeout=None):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        if self.down:
+            raise requests.exceptions.ConnectionError("backend down")
+        with self._lock:
+            self.received.extend(json if isinstance(json, list) else [json])
+        response = requests.Response()
+        response.status_code = 200
+        return response
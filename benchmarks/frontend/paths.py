@@ -0,0 +1,11 @@
+# paths.py
+# The benchmarks here import the frontend modules by plain name, the way they
+# import each other when run from frontend/. Importing this module first puts
+# frontend/ on the path, so the scripts run from any directory.
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+APP_DIR = os.path.join(REPO_DIR, "frontend")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
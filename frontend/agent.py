@@ -1,26 +1,299 @@
 # agent.py
+import os
+import threading
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List
 from textwrap import dedent
+from uuid import uuid4
 
-from phi.assistant import Assistant
-from phi.tools import Toolkit
+from ollama import Client as OllamaClient
+
+from phi.assistant import Assistant, AssistantMemory
 from phi.tools.serpapi_tools import SerpApiTools
 from phi.tools.duckduckgo import DuckDuckGo
-from phi.llm.ollama import Ollama
 from phi.knowledge import AssistantKnowledge
-from phi.embedder.ollama import OllamaEmbedder
+from phi.storage.assistant.base import AssistantStorage
 from phi.storage.assistant.postgres import PgAssistantStorage
-from phi.vectordb.pgvector import PgVector2
+from phi.tools import Toolkit
 from phi.utils.log import logger
 
-db_url = "postgresql+psycopg://ai:ai@localhost:5532/ai"
+from context import BudgetedOllama, CONTEXT_MAX_TOKENS, CONTEXT_MAX_TOKENS_MEMBER
+from db import get_db_engine
+from embeddings import get_embedder
+from knowledge import get_knowledge_vector_db
+from models import MODEL_FALLBACK_TIMEOUT, ModelRouter
+from orchestration import TourPlanOrchestrator
+from search_cache import (
+    CachedSearchTools,
+    SEARCH_TTL_DEFAULT,
+    SEARCH_TTL_NEWS,
+    SEARCH_TTL_WEATHER,
+)
+
+# "team": the main agent delegates to the Weather, News and Itinerary agents in
+# turn; "parallel": weather and news run concurrently via TourPlanOrchestrator
+TOUR_PLAN_MODE = os.getenv("TOUR_PLAN_MODE", "team")
+
 cwd = Path(__file__).parent.resolve()
 scratch_dir = cwd.joinpath("scratch")
 if not scratch_dir.exists():
     scratch_dir.mkdir(exist_ok=True, parents=True)
 
 
+# Builds the parts of the Tour Planning Agent that can be shared across
+# sessions (Ollama connection, toolkits, storage, knowledge base, team
+# definitions) once, and hands out lightweight per-user Assistants.
+class AgentFactory:
+    def __init__(self, llm_id: str = "llama3", router: Optional[ModelRouter] = None):
+        logger.info(f"-*- Building Tour Planning Agent factory with {llm_id} -*-")
+        self.llm_id = llm_id
+        # Sub-agents may run on a smaller model than llm_id (models.py)
+        self.router = router or ModelRouter(llm_id)
+        # One HTTP client for every Ollama call instead of one per request
+        self.ollama_client = self._ollama_client()
+        # For requests that can fall back to llm_id: gives up on the smaller
+        # model after MODEL_FALLBACK_TIMEOUT seconds without a token
+        self.routed_ollama_client = self._ollama_client(timeout=MODEL_FALLBACK_TIMEOUT)
+        # Search results are shared across users through the process-wide
+        # cache; each kind of lookup keeps results fresh for its own TTL
+        self.search_tools = CachedSearchTools(self._search_backend(), ttl=SEARCH_TTL_DEFAULT)
+        self.weather_search_tools = CachedSearchTools(self._search_backend(), ttl=SEARCH_TTL_WEATHER)
+        self.news_search_tools = CachedSearchTools(self._search_backend(), ttl=SEARCH_TTL_NEWS)
+        self.web_search_tools = CachedSearchTools(self._web_search_backend(), ttl=SEARCH_TTL_NEWS)
+        self.storage = self._storage()
+        self.knowledge_base = self._knowledge_base()
+        self.team_templates = self._build_team()
+
+    # The services the agents talk to. Benchmarks override these with local
+    # stand-ins (benchmarks/backend/bench_suite.py).
+    def _ollama_client(self, timeout: Optional[float] = None) -> OllamaClient:
+        return OllamaClient(timeout=timeout)
+
+    def _search_backend(self) -> Toolkit:
+        return SerpApiTools()
+
+    def _web_search_backend(self) -> Toolkit:
+        return DuckDuckGo()
+
+    def _storage(self) -> Optional[AssistantStorage]:
+        # Storage and vector DB share one pooled engine across all factories
+        return PgAssistantStorage(table_name="tour_planner_runs", db_engine=get_db_engine())
+
+    def _knowledge_base(self) -> Optional[AssistantKnowledge]:
+        return AssistantKnowledge(
+            vector_db=get_knowledge_vector_db(
+                embedder=get_embedder(ollama_client=self.ollama_client)
+            ),
+            num_documents=3,
+        )
+
+    def llm(
+        self, agent_name: str = "Tour Planning Assistant", max_prompt_tokens: int = CONTEXT_MAX_TOKENS
+    ) -> BudgetedOllama:
+        # LLM objects hold per-run tool and metric state, so each Assistant
+        # gets its own wrapper around the shared client
+        route = self.router.route(agent_name)
+        return BudgetedOllama(
+            model=route.model,
+            ollama_client=self.routed_ollama_client if route.fallback else self.ollama_client,
+            fallback_model=route.fallback,
+            fallback_client=self.ollama_client,
+            agent_name=agent_name,
+            max_prompt_tokens=max_prompt_tokens,
+        )
+
+    def member_llm(self, name: str) -> BudgetedOllama:
+        return self.llm(agent_name=name, max_prompt_tokens=CONTEXT_MAX_TOKENS_MEMBER)
+
+    def _build_team(self) -> List[Assistant]:
+        team: List[Assistant] = []
+
+        # User Interaction Agent
+        user_interaction_agent = Assistant(
+            name="User Interaction Agent",
+            llm=self.member_llm("User Interaction Agent"),
+            role="Gather user preferences and collect required details",
+            description="You collect user preferences and requirements for their tour planning.",
+            instructions=[
+                "Ask for the following details:",
+                "1. City to visit",
+                "2. Date of visit",
+                "3. Available timings",
+                "4. Budget",
+                "5. Interests",
+                "6. Starting point",
+                "If preferences are unclear, suggest popular options",
+            ],
+            show_tool_calls=False,
+            process_tool_responses=True,
+        )
+        team.append(user_interaction_agent)
+
+        # Weather Agent
+        weather_agent = Assistant(
+            name="Weather Agent",
+            llm=self.member_llm("Weather Agent"),
+            role="Provide weather information",
+            description="You provide weather forecasts and recommendations.",
+            tools=[self.weather_search_tools],
+            instructions=[
+                "Search for current weather conditions",
+                "Provide weather-based recommendations",
+                "Suggest appropriate clothing and items",
+                "Format response in a clear, direct manner",
+            ],
+            show_tool_calls=False,
+            process_tool_responses=True,
+        )
+        team.append(weather_agent)
+
+        # News Agent
+        news_agent = Assistant(
+            name="News Agent",
+            llm=self.member_llm("News Agent"),
+            role="Check local events and updates",
+            description="You find relevant local news and events.",
+            tools=[self.news_search_tools],
+            instructions=[
+                "Search for:",
+                "- Local events and festivals",
+                "- Attraction status updates",
+                "- Transportation updates",
+                "- Safety information",
+                "Present information clearly without showing search details",
+            ],
+            show_tool_calls=False,
+            process_tool_responses=True,
+        )
+        team.append(news_agent)
+
+        # Itinerary Agent
+        itinerary_agent = Assistant(
+            name="Itinerary Agent",
+            llm=self.member_llm("Itinerary Agent"),
+            role="Create optimized itineraries",
+            description="You create detailed, time-optimized tour plans.",
+            tools=[self.search_tools],
+            instructions=[
+                "Create itineraries with:",
+                "- Optimal visit sequence",
+                "- Travel times and methods",
+                "- Entry fees and status",
+                "- Time allocations",
+                "Update plans based on weather and news",
+            ],
+            show_tool_calls=False,
+            process_tool_responses=True,
+        )
+        team.append(itinerary_agent)
+
+        return team
+
+    def team(self) -> List[Assistant]:
+        # Shallow copies of the prebuilt sub-agents with their own LLM wrapper,
+        # memory and run id, so concurrent sessions never share run state
+        return [
+            member.model_copy(
+                update={
+                    "llm": self.member_llm(member.name),
+                    "memory": AssistantMemory(),
+                    "run_id": str(uuid4()),
+                }
+            )
+            for member in self.team_templates
+        ]
+
+    def get_orchestrator(self, team: Optional[List[Assistant]] = None) -> TourPlanOrchestrator:
+        members = {member.name: member for member in (team or self.team())}
+        return TourPlanOrchestrator(
+            weather_agent=members["Weather Agent"],
+            news_agent=members["News Agent"],
+            itinerary_agent=members["Itinerary Agent"],
+        )
+
+    def get_agent(
+        self,
+        user_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        debug_mode: bool = False,
+        mode: str = TOUR_PLAN_MODE,
+    ) -> Assistant:
+        team = self.team()
+        tools = [self.search_tools, self.web_search_tools]
+        planning_steps = [
+            "- Check weather using Weather Agent",
+            "- Check events using News Agent",
+            "- Create optimized itinerary",
+        ]
+        if mode == "parallel":
+            orchestrator = self.get_orchestrator(team)
+            team = [member for member in team if member.name == "User Interaction Agent"]
+            tools.append(orchestrator.plan_tour)
+            planning_steps = [
+                "- Call plan_tour with all collected details; it checks weather and "
+                "events in parallel and returns the optimized itinerary",
+            ]
+
+        # Main Tour Planning Agent
+        return Assistant(
+            name="Tour Planning Assistant",
+            run_id=run_id,
+            user_id=user_id,
+            llm=self.llm(),
+            description=dedent(
+                """
+                I am your Tour Planning Assistant. I create personalized one-day tour itineraries by:
+                1. Collecting essential details (city, date, timings)
+                2. Checking weather conditions
+                3. Reviewing local events
+                4. Creating optimized schedules
+                5. Providing detailed recommendations
+                """
+            ),
+            instructions=[
+                "Always follow this sequence:",
+                "1. If city is mentioned without date/time, ask for:",
+                "- Preferred date of visit",
+                "- Start time",
+                "- End time",
+                "A message with a 'Trip details' section already has every detail; go to step 2",
+                "2. Once all details are collected:",
+                *planning_steps,
+                "3. Format itinerary with sections:",
+                "- Schedule Overview",
+                "- Weather Advisory",
+                "- Essential Items",
+                "- Local Updates",
+            ],
+            tools=tools,
+            team=team,
+            storage=self.storage,
+            knowledge_base=self.knowledge_base,
+            show_tool_calls=False,
+            process_tool_responses=True,
+            search_knowledge=True,
+            read_chat_history=True,
+            add_chat_history_to_messages=True,
+            num_history_messages=5,
+            markdown=True,
+            add_datetime_to_instructions=True,
+            introduction=f"Welcome to Wanderlust! 🌟 I'm your personal one-day adventure planner. Ready to explore a city in 24 hours? Which destination sparks your wanderlust?",
+            debug_mode=debug_mode,
+        )
+
+
+# Process-wide factories, one per model, shared by all Streamlit sessions
+_agent_factories: Dict[str, AgentFactory] = {}
+_agent_factories_lock = threading.Lock()
+
+
+def get_agent_factory(llm_id: str = "llama3") -> AgentFactory:
+    with _agent_factories_lock:
+        if llm_id not in _agent_factories:
+            _agent_factories[llm_id] = AgentFactory(llm_id)
+        return _agent_factories[llm_id]
+
+
 def get_agent(
     llm_id: str = "llama3",
     user_id: Optional[str] = None,
@@ -28,143 +301,6 @@ def get_agent(
     debug_mode: bool = False,
 ) -> Assistant:
     logger.info(f"-*- Creating Tour Planning Agent with {llm_id} -*-")
-
-    # Add tools available to the Agent
-    tools: List[Toolkit] = [SerpApiTools(), DuckDuckGo()]
-
-    # Add team members (sub-agents)
-    team: List[Assistant] = []
-
-    # User Interaction Agent
-    user_interaction_agent = Assistant(
-        name="User Interaction Agent",
-        llm=Ollama(model=llm_id),
-        role="Gather user preferences and collect required details",
-        description="You collect user preferences and requirements for their tour planning.",
-        instructions=[
-            "Ask for the following details:",
-            "1. City to visit",
-            "2. Date of visit",
-            "3. Available timings",
-            "4. Budget",
-            "5. Interests",
-            "6. Starting point",
-            "If preferences are unclear, suggest popular options",
-        ],
-        show_tool_calls=False,
-        process_tool_responses=True,
-    )
-    team.append(user_interaction_agent)
-
-    # Weather Agent
-    weather_agent = Assistant(
-        name="Weather Agent",
-        llm=Ollama(model=llm_id),
-        role="Provide weather information",
-        description="You provide weather forecasts and recommendations.",
-        tools=[SerpApiTools()],
-        instructions=[
-            "Search for current weather conditions",
-            "Provide weather-based recommendations",
-            "Suggest appropriate clothing and items",
-            "Format response in a clear, direct manner",
-        ],
-        show_tool_calls=False,
-        process_tool_responses=True,
-    )
-    team.append(weather_agent)
-
-    # News Agent
-    news_agent = Assistant(
-        name="News Agent",
-        llm=Ollama(model=llm_id),
-        role="Check local events and updates",
-        description="You find relevant local news and events.",
-        tools=[SerpApiTools()],
-        instructions=[
-            "Search for:",
-            "- Local events and festivals",
-            "- Attraction status updates",
-            "- Transportation updates",
-            "- Safety information",
-            "Present information clearly without showing search details",
-        ],
-        show_tool_calls=False,
-        process_tool_responses=True,
-    )
-    team.append(news_agent)
-
-    # Itinerary Agent
-    itinerary_agent = Assistant(
-        name="Itinerary Agent",
-        llm=Ollama(model=llm_id),
-        role="Create optimized itineraries",
-        description="You create detailed, time-optimized tour plans.",
-        tools=[SerpApiTools()],
-        instructions=[
-            "Create itineraries with:",
-            "- Optimal visit sequence",
-            "- Travel times and methods",
-            "- Entry fees and status",
-            "- Time allocations",
-            "Update plans based on weather and news",
-        ],
-        show_tool_calls=False,
-        process_tool_responses=True,
-    )
-    team.append(itinerary_agent)
-
-    # Main Tour Planning Agent
-    return Assistant(
-        name="Tour Planning Assistant",
-        run_id=run_id,
-        user_id=user_id,
-        llm=Ollama(model=llm_id),
-        description=dedent(
-            """
-            I am your Tour Planning Assistant. I create personalized one-day tour itineraries by:
-            1. Collecting essential details (city, date, timings)
-            2. Checking weather conditions
-            3. Reviewing local events
-            4. Creating optimized schedules
-            5. Providing detailed recommendations
-            """
-        ),
-        instructions=[
-            "Always follow this sequence:",
-            "1. If city is mentioned without date/time, ask for:",
-            "- Preferred date of visit",
-            "- Start time",
-            "- End time",
-            "2. Once all details are collected:",
-            "- Check weather using Weather Agent",
-            "- Check events using News Agent",
-            "- Create optimized itinerary",
-            "3. Format itinerary with sections:",
-            "- Schedule Overview",
-            "- Weather Advisory",
-            "- Essential Items",
-            "- Local Updates",
-        ],
-        tools=tools,
-        team=team,
-        storage=PgAssistantStorage(table_name="tour_planner_runs", db_url=db_url),
-        knowledge_base=AssistantKnowledge(
-            vector_db=PgVector2(
-                db_url=db_url,
-                collection="tour_planner_knowledge",
-                embedder=OllamaEmbedder(model="nomic-embed-text", dimensions=1536),
-            ),
-            num_documents=3,
-        ),
-        show_tool_calls=False,
-        process_tool_responses=True,
-        search_knowledge=True,
-        read_chat_history=True,
-        add_chat_history_to_messages=True,
-        num_history_messages=5,
-        markdown=True,
-        add_datetime_to_instructions=True,
-        introduction=f"Welcome to Wanderlust! 🌟 I'm your personal one-day adventure planner. Ready to explore a city in 24 hours? Which destination sparks your wanderlust?",
-        debug_mode=debug_mode,
+    return get_agent_factory(llm_id).get_agent(
+        user_id=user_id, run_id=run_id, debug_mode=debug_mode
     )
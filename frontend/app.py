@@ -1,18 +1,51 @@
+# app.py
+# Streamlit re-executes this script on every interaction, so module-level
+# imports are kept to the light helpers the pages need. Nothing here imports
+# the AI stack, which runs behind the backend's /agent endpoints; process-wide
+# resources are built on first use and cached with st.cache_resource.
+import os
+import json
+import logging
 import streamlit as st
 import requests
 from datetime import datetime
-import nest_asyncio
-from phi.assistant import Assistant
-from phi.utils.log import logger
-from agent import get_agent
+from http_client import HTTP_TIMEOUT, auth_headers, get_http_client
+from rendering import CHAT_HISTORY_WINDOW, StreamingMarkdown, history_window
 
-nest_asyncio.apply()
+logger = logging.getLogger(__name__)
 
 st.set_page_config(page_title="Wanderlust", page_icon="✨")
 
 
 # Replace with your FastAPI backend URL
 BACKEND_URL = "http://localhost:8000"  # Adjust the port if necessary
+# The agent runs behind the backend's /agent endpoints; point this at a
+# separate generation deployment to scale it apart from the API
+AGENT_BACKEND_URL = os.getenv("AGENT_BACKEND_URL", BACKEND_URL)
+# Seconds to connect, and to wait between streamed chunks of a reply
+AGENT_CONNECT_TIMEOUT = 5
+AGENT_READ_TIMEOUT = 300
+
+
+# Built once per process and shared by every browser session
+@st.cache_resource
+def chat_sender():
+    from chat_sender import get_chat_sender
+
+    return get_chat_sender(BACKEND_URL)
+
+
+def report_chat_delivery():
+    """Log the background sender's backlog while messages wait to be stored."""
+    stats = chat_sender().stats()
+    if stats["spill_depth"] or stats["dropped"]:
+        logger.warning(
+            f"Chat messages not yet stored: {stats['queue_depth']} queued, "
+            f"{stats['spill_depth']} spilled to disk, {stats['dropped']} dropped, "
+            f"{stats['auth_expired']} token expiries"
+        )
+    else:
+        logger.debug(f"Chat sender: {stats}")
 
 
 def init_session_state():
@@ -25,14 +58,81 @@ def init_session_state():
         st.session_state["email"] = None
     if "user_id" not in st.session_state:
         st.session_state["user_id"] = None
+    if "access_token" not in st.session_state:
+        st.session_state["access_token"] = None
     if "register_mode" not in st.session_state:
         st.session_state["register_mode"] = False
-    if "agent" not in st.session_state:
-        st.session_state["agent"] = None
     if "agent_run_id" not in st.session_state:
         st.session_state["agent_run_id"] = None
     if "messages" not in st.session_state:
         st.session_state["messages"] = None
+    if "history_window" not in st.session_state:
+        st.session_state["history_window"] = CHAT_HISTORY_WINDOW
+
+
+def open_agent_session():
+    """Create (or reload) the user's chat run on the backend; returns its history."""
+    response = get_http_client().post(
+        f"{AGENT_BACKEND_URL}/agent/session",
+        json={
+            "user_id": st.session_state["user_id"],
+            "run_id": st.session_state["agent_run_id"],
+        },
+        headers=auth_headers(st.session_state["access_token"]),
+        timeout=(AGENT_CONNECT_TIMEOUT, AGENT_READ_TIMEOUT),
+    )
+    response.raise_for_status()
+    session = response.json()
+    st.session_state["agent_run_id"] = session["run_id"]
+    return session["messages"]
+
+
+class AgentBusy(Exception):
+    pass
+
+
+def stream_agent_reply(prompt, on_queued=None):
+    """Yield the reply deltas from the backend's server-sent event stream.
+
+    `on_queued(position)` is called while the reply waits for a free slot.
+    """
+    with get_http_client().post(
+        f"{AGENT_BACKEND_URL}/agent/chat",
+        json={
+            "user_id": st.session_state["user_id"],
+            "run_id": st.session_state["agent_run_id"],
+            "message": prompt,
+        },
+        headers=auth_headers(st.session_state["access_token"]),
+        stream=True,
+        timeout=(AGENT_CONNECT_TIMEOUT, AGENT_READ_TIMEOUT),
+    ) as response:
+        if response.status_code in (429, 503):
+            # Over the rate limit, or too many replies already waiting
+            raise AgentBusy(response.json().get("detail", "The server is busy, please retry"))
+        response.raise_for_status()
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:") :].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:") :])
+                if event == "delta":
+                    yield data["delta"]
+                elif event == "run":
+                    st.session_state["agent_run_id"] = data["run_id"]
+                elif event == "queued" and on_queued is not None:
+                    on_queued(data["position"])
+                elif event == "error":
+                    raise RuntimeError(data.get("detail", "The agent failed to respond"))
+
+
+def logout(message="You have been logged out."):
+    # Clear session state
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.success(message)
+    st.experimental_rerun()
 
 
 def login_page():
@@ -54,13 +154,18 @@ def login_page():
                 # Send a POST request to your FastAPI backend for authentication
                 login_data = {"email": email, "password": password}
                 try:
-                    response = requests.post(f"{BACKEND_URL}/login", json=login_data)
+                    response = get_http_client().post(
+                        f"{BACKEND_URL}/login", json=login_data, timeout=HTTP_TIMEOUT
+                    )
                     if response.status_code == 200:
                         user_data = response.json()
                         st.session_state["logged_in"] = True
                         st.session_state["name"] = user_data.get("name", "")
                         st.session_state["email"] = user_data.get("email", "")
                         st.session_state["user_id"] = user_data["id"]
+                        st.session_state["access_token"] = user_data.get("access_token")
+                        # Messages held while the previous token was expired go out now
+                        chat_sender().set_token(user_data["id"], user_data.get("access_token"))
                         st.success(user_data.get("msg", "Login successful"))
                         st.experimental_rerun()
                     else:
@@ -108,8 +213,8 @@ def register_page():
                 }
                 # Send a POST request to your FastAPI backend for registration
                 try:
-                    response = requests.post(
-                        f"{BACKEND_URL}/register", json=register_data
+                    response = get_http_client().post(
+                        f"{BACKEND_URL}/register", json=register_data, timeout=HTTP_TIMEOUT
                     )
                     if response.status_code == 200:
                         st.success("Registration successful. Please log in.")
@@ -262,27 +367,18 @@ def main():
     # st.sidebar.markdown("<br>", unsafe_allow_html=True)
     
 
-    # Set default LLM model to llama3
-    llm_id = "llama3"
-
-    # Get the agent
-    agent: Assistant
-    if "agent" not in st.session_state or st.session_state["agent"] is None:
-        logger.info(f"---*--- Creating Tour Planning Agent with {llm_id} ---*---")
-        agent = get_agent(llm_id=llm_id, user_id=st.session_state["user_id"])
-        st.session_state["agent"] = agent
-    else:
-        agent = st.session_state["agent"]
-
-    try:
-        st.session_state["agent_run_id"] = agent.create_run()
-    except Exception:
-        st.warning("Could not create Agent run, is the database running?")
-        return
-
-    # Load existing messages
+    # Create the Agent run and load existing messages
     if "messages" not in st.session_state or st.session_state["messages"] is None:
-        assistant_chat_history = agent.memory.get_chat_history()
+        try:
+            assistant_chat_history = open_agent_session()
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 401:
+                logout("Your session has expired, please log in again.")
+            st.warning("Could not create Agent run, is the backend running?")
+            return
+        except requests.exceptions.RequestException:
+            st.warning("Could not create Agent run, is the backend running?")
+            return
         if len(assistant_chat_history) > 0:
             logger.debug("Loading chat history")
             st.session_state["messages"] = assistant_chat_history
@@ -295,52 +391,81 @@ def main():
                 }
             ]
 
-    # Chat interface
-    for message in st.session_state["messages"]:
-        if message["role"] == "system":
-            continue
+    # Chat interface, showing only the most recent messages
+    hidden, visible = history_window(
+        st.session_state["messages"], st.session_state["history_window"]
+    )
+    if hidden and st.button(f"Load older messages ({hidden})"):
+        st.session_state["history_window"] += CHAT_HISTORY_WINDOW
+        st.experimental_rerun()
+    for message in visible:
         with st.chat_message(message["role"], avatar="🌎"):
             st.write(message["content"])
 
     # Chat input
     if prompt := st.chat_input("Type your message here..."):
         # Immediately show user message in chat
+        prompt_timestamp = datetime.utcnow().isoformat()
         st.session_state["messages"].append({"role": "user", "content": prompt})
         st.chat_message("user").write(prompt)
 
         with st.chat_message("assistant", avatar="🌎"):
-            response = ""
-            resp_container = st.empty()
+            queue_status = st.empty()
+            renderer = StreamingMarkdown(st.container().empty)
+
+            def show_queue_position(position):
+                queue_status.caption(f"⏳ Waiting for the planner, {position} ahead of you")
 
+            # Set when the reply did not come through; only its notice is shown
+            failed = False
             # Show a loader while generating the response
             with st.spinner("Exploring hidden gems for you... 🌟"):
-                for delta in agent.run(prompt):
-                    response += delta
-                    resp_container.markdown(response)
+                try:
+                    for delta in stream_agent_reply(prompt, on_queued=show_queue_position):
+                        if not renderer.text:
+                            queue_status.empty()
+                        renderer.push(delta)
+                except AgentBusy as e:
+                    failed = True
+                    renderer.push(str(e))
+                except (requests.exceptions.RequestException, RuntimeError) as e:
+                    if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 401:
+                        logout("Your session has expired, please log in again.")
+                    logger.warning(f"Agent reply failed: {e}")
+                    failed = True
+                    renderer.push("\n\nSorry, I couldn't finish that reply. Please try again.")
+                response = renderer.flush()
 
             # Add the assistant's response to session state
             st.session_state["messages"].append(
                 {"role": "assistant", "content": response}
             )
 
-            # Optionally, store chat messages in the backend
-            try:
-                chat_data = {
-                    "user_id": st.session_state["user_id"],
-                    "message": prompt,
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-                requests.post(f"{BACKEND_URL}/chat/", json=chat_data)
-            except:
-                logger.warning("Failed to store chat message in backend")
+            # Store both sides of the exchange in the backend, in the background;
+            # a failed turn is not part of the conversation history
+            if not failed:
+                chat_sender().enqueue(
+                    [
+                        {
+                            "user_id": st.session_state["user_id"],
+                            "role": "user",
+                            "message": prompt,
+                            "timestamp": prompt_timestamp,
+                        },
+                        {
+                            "user_id": st.session_state["user_id"],
+                            "role": "assistant",
+                            "message": response,
+                            "timestamp": datetime.utcnow().isoformat(),
+                        },
+                    ],
+                    token=st.session_state["access_token"],
+                )
+                report_chat_delivery()
 
     # Logout button
     if st.sidebar.button("Logout"):
-        # Clear session state
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-        st.success("You have been logged out.")
-        st.experimental_rerun()
+        logout()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,409 @@
+# chat_sender.py
+# Background delivery of chat messages to the backend. The chat loop only
+# enqueues; a worker thread sends the queue to POST /chat/batch over a pooled
+# session with timeouts, retrying with exponential backoff. Batches that
+# still fail are spilled to a local JSONL file and resent first once the
+# backend answers again, so a slow or stopped backend never blocks a reply.
+# Messages are sent with their user's latest access token, looked up at send
+# time and never written to disk, and only batched with messages going out
+# with the same token. When the backend rejects a token as expired, the
+# messages wait in the spill file until the user logs in again and a new
+# token is set.
+import os
+import json
+import random
+import atexit
+import logging
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from http_client import auth_headers, get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Chat sender settings
+CHAT_SENDER_BATCH_SIZE = int(os.getenv("CHAT_SENDER_BATCH_SIZE", 50))
+# Seconds the worker waits for a batch to fill before sending it
+CHAT_SENDER_FLUSH_INTERVAL = float(os.getenv("CHAT_SENDER_FLUSH_INTERVAL", 1.0))
+# Messages held in memory; older ones are spilled to disk beyond this
+CHAT_SENDER_MAX_QUEUE = int(os.getenv("CHAT_SENDER_MAX_QUEUE", 10000))
+CHAT_SENDER_CONNECT_TIMEOUT = float(os.getenv("CHAT_SENDER_CONNECT_TIMEOUT", 2))
+CHAT_SENDER_READ_TIMEOUT = float(os.getenv("CHAT_SENDER_READ_TIMEOUT", 5))
+CHAT_SENDER_MAX_RETRIES = int(os.getenv("CHAT_SENDER_MAX_RETRIES", 3))
+# Backoff between retries, doubling from BACKOFF up to BACKOFF_MAX seconds
+CHAT_SENDER_BACKOFF = float(os.getenv("CHAT_SENDER_BACKOFF", 0.5))
+CHAT_SENDER_BACKOFF_MAX = float(os.getenv("CHAT_SENDER_BACKOFF_MAX", 30))
+CHAT_SPILL_PATH = os.getenv(
+    "CHAT_SPILL_PATH", os.path.join(tempfile.gettempdir(), "wanderlust_chat_spill.jsonl")
+)
+# Messages kept on disk; further messages are dropped
+CHAT_SPILL_MAX_MESSAGES = int(os.getenv("CHAT_SPILL_MAX_MESSAGES", 100000))
+# Must match the backend's MAX_CHAT_BATCH
+MAX_CHAT_BATCH = 1000
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class SendFailed(Exception):
+    pass
+
+
+class TokenExpired(Exception):
+    pass
+
+
+def key_batches(messages: List[dict], batch_size: int, key):
+    """Consecutive runs of queued messages with the same key, at most batch_size long."""
+    batch: List[dict] = []
+    for message in messages:
+        if batch and (len(batch) >= batch_size or key(message) != key(batch[0])):
+            yield batch
+            batch = []
+        batch.append(message)
+    if batch:
+        yield batch
+
+
+def _open_private(path: str, mode: str):
+    # Chat messages are private: the spill file is readable by its owner only
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | (os.O_APPEND if mode == "a" else os.O_TRUNC), 0o600)
+    return os.fdopen(fd, mode, encoding="utf-8")
+
+
+class ChatSpill:
+    """Append-only JSONL file of queued messages waiting for the backend."""
+
+    def __init__(self, path: str = CHAT_SPILL_PATH, max_messages: int = CHAT_SPILL_MAX_MESSAGES):
+        self.path = path
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self.count = sum(1 for _ in self._read())
+        # Bumped on every append, so a sender can tell whether there is
+        # anything new to try since its last drain
+        self.version = 0
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def append(self, messages: List[dict]) -> int:
+        """Writes what fits; returns the number of messages that did not."""
+        with self._lock:
+            room = max(0, self.max_messages - self.count)
+            kept = messages[:room]
+            if kept:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with _open_private(self.path, "a") as f:
+                    f.writelines(json.dumps(message) + "\n" for message in kept)
+                self.count += len(kept)
+                self.version += 1
+            return len(messages) - len(kept)
+
+    def drain(self, send, batch_size: int, key=lambda message: message["user_id"]) -> int:
+        """Sends the spilled messages in batches; returns how many were sent.
+
+        Batches hold consecutive messages with the same `key`, and
+        `send(batch)` returns False for a batch that has to stay on disk.
+        Sending happens outside the lock so appends never wait on the network;
+        afterwards the file keeps the batches that were not sent, followed by
+        whatever was appended meanwhile.
+        """
+        with self._lock:
+            messages = list(self._read())
+        sent = done = 0
+        kept: List[dict] = []
+        try:
+            for batch in key_batches(messages, batch_size, key):
+                if send(batch):
+                    sent += len(batch)
+                else:
+                    kept.extend(batch)
+                done += len(batch)
+        finally:
+            if sent:
+                with self._lock:
+                    remaining = kept + list(self._read())[done:]
+                    tmp_path = self.path + ".tmp"
+                    with _open_private(tmp_path, "w") as f:
+                        f.writelines(json.dumps(message) + "\n" for message in remaining)
+                    os.replace(tmp_path, self.path)
+                    self.count = len(remaining)
+        return sent
+
+
+class ChatSender:
+    def __init__(
+        self,
+        backend_url: str,
+        session: Optional[requests.Session] = None,
+        spill: Optional[ChatSpill] = None,
+        batch_size: int = CHAT_SENDER_BATCH_SIZE,
+        flush_interval: float = CHAT_SENDER_FLUSH_INTERVAL,
+        max_queue: int = CHAT_SENDER_MAX_QUEUE,
+        max_retries: int = CHAT_SENDER_MAX_RETRIES,
+        backoff: float = CHAT_SENDER_BACKOFF,
+        backoff_max: float = CHAT_SENDER_BACKOFF_MAX,
+    ):
+        self.url = f"{backend_url}/chat/batch"
+        self.session = session or get_http_client()
+        self.spill = spill if spill is not None else ChatSpill()
+        self.batch_size = min(batch_size, MAX_CHAT_BATCH)
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self._flushing = False
+        # Backend unreachable until this time (monotonic); skip sending
+        self._down_until = 0.0
+        self._down_backoff = backoff
+        # user_id -> latest access token, and the tokens the backend rejected
+        self._tokens: Dict[str, Optional[str]] = {}
+        self._expired: Set[Optional[str]] = set()
+        # Bumped when a user's token changes. Held messages wait for a new
+        # token or new spilled messages, so the spill file is only re-read
+        # when (spill.version, _token_version) moved since the last drain.
+        self._token_version = 0
+        self._drained: Optional[tuple] = None
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "batches": 0,
+            "retries": 0,
+            "spilled": 0,
+            "dropped": 0,
+            "auth_expired": 0,
+        }
+
+    def _count(self, name: str, value: int = 1):
+        with self._cond:
+            self._stats[name] += value
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="chat-sender", daemon=True)
+            self._worker.start()
+
+    def _set_token(self, user_id: str, token: Optional[str]):
+        if self._tokens.get(user_id) != token:
+            self._token_version += 1
+        old = self._tokens.get(user_id, token)
+        self._tokens[user_id] = token
+        if old != token:
+            self._expired.discard(old)
+
+    def _token(self, message: dict) -> Optional[str]:
+        with self._cond:
+            return self._tokens.get(message["user_id"])
+
+    def set_token(self, user_id: str, token: Optional[str]):
+        """Use `token` for the user's messages from now on, including held ones."""
+        with self._cond:
+            self._set_token(user_id, token)
+
+    def enqueue(self, messages: List[dict], token: Optional[str] = None):
+        """Queue messages for delivery; never blocks on the network."""
+        overflow: List[dict] = []
+        with self._cond:
+            for user_id in {message["user_id"] for message in messages}:
+                self._set_token(user_id, token)
+            if self._stopped:
+                overflow = list(messages)
+            else:
+                self._queue.extend(messages)
+                self._stats["enqueued"] += len(messages)
+                while len(self._queue) > self.max_queue:
+                    overflow.append(self._queue.popleft())
+                self._ensure_worker()
+                self._cond.notify()
+        if overflow:
+            self._spill(overflow)
+
+    def _spill(self, messages: List[dict]):
+        try:
+            dropped = self.spill.append(messages)
+        except OSError as e:
+            logger.warning(f"Could not spill chat messages to {self.spill.path}: {e}")
+            dropped = len(messages)
+        self._count("spilled", len(messages) - dropped)
+        if dropped:
+            self._count("dropped", dropped)
+            logger.warning(f"Dropped {dropped} chat messages, the spill file is full")
+
+    def _post(self, batch: List[dict], token: Optional[str]):
+        try:
+            response = self.session.post(
+                self.url,
+                json=batch,
+                headers=auth_headers(token),
+                timeout=(CHAT_SENDER_CONNECT_TIMEOUT, CHAT_SENDER_READ_TIMEOUT),
+            )
+        except requests.exceptions.RequestException as e:
+            raise SendFailed(str(e))
+        if response.status_code in RETRYABLE_STATUS:
+            raise SendFailed(f"HTTP {response.status_code}")
+        if response.status_code == 401:
+            raise TokenExpired()
+        if response.status_code >= 400:
+            # The backend rejected the messages; resending won't help
+            self._count("dropped", len(batch))
+            logger.warning(f"Backend rejected {len(batch)} chat messages: HTTP {response.status_code}")
+            return
+        self._count("sent", len(batch))
+        self._count("batches")
+
+    def _send_with_retries(self, batch: List[dict], token: Optional[str]):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._post(batch, token)
+            except SendFailed as e:
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                logger.debug(f"Chat batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.backoff_max)
+
+    def _deliver(self, batch: List[dict]) -> bool:
+        """Sends a batch; False when it has to wait for a new token."""
+        with self._cond:
+            token = self._tokens.get(batch[0]["user_id"])
+            if token in self._expired:
+                return False
+        try:
+            self._send_with_retries(batch, token)
+        except TokenExpired:
+            with self._cond:
+                self._expired.add(token)
+                self._stats["auth_expired"] += 1
+            logger.warning(
+                f"Access token of user {batch[0]['user_id']} expired, holding "
+                f"{len(batch)} chat messages until they log in again"
+            )
+            return False
+        return True
+
+    def _next_batch(self) -> List[dict]:
+        with self._cond:
+            if not self._queue and not self._stopped:
+                # Idle: wake up now and then to resend spilled messages
+                self._cond.wait(timeout=self.flush_interval)
+            # Give the batch a moment to fill before sending it
+            deadline = time.monotonic() + self.flush_interval
+            while (
+                self._queue
+                and len(self._queue) < self.batch_size
+                and not (self._stopped or self._flushing)
+            ):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                if batch and self._tokens.get(self._queue[0]["user_id"]) != self._tokens.get(
+                    batch[0]["user_id"]
+                ):
+                    break
+                batch.append(self._queue.popleft())
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if self._stopped and not batch:
+                return
+            try:
+                if time.monotonic() < self._down_until:
+                    # Backend known to be down: keep the batch on disk, don't wait on it
+                    if batch:
+                        self._spill(batch)
+                    continue
+                if self.spill.count:
+                    with self._cond:
+                        state = (self.spill.version, self._token_version)
+                    if state != self._drained:
+                        self.spill.drain(self._deliver, self.batch_size, key=self._token)
+                        # Not reached when the backend is down; the next try re-reads
+                        self._drained = state
+                if batch and not self._deliver(batch):
+                    self._spill(batch)
+                self._down_backoff = self.backoff
+            except SendFailed as e:
+                logger.warning(f"Backend unavailable for chat messages ({e}), spilling to disk")
+                if batch:
+                    self._spill(batch)
+                self._down_until = time.monotonic() + self._down_backoff
+                self._down_backoff = min(self._down_backoff * 2, self.backoff_max)
+            except OSError as e:
+                logger.warning(f"Could not read spilled chat messages: {e}")
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    if not self._queue:
+                        self._flushing = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until the in-memory queue is delivered or spilled."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(timeout=min(remaining, 0.05))
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Stop the worker; whatever it could not send is spilled to disk."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+        with self._cond:
+            leftover = list(self._queue)
+            self._queue.clear()
+        if leftover:
+            self._spill(leftover)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._queue) + self._in_flight
+        stats["spill_depth"] = self.spill.count
+        return stats
+
+
+_chat_senders: Dict[str, ChatSender] = {}
+_chat_senders_lock = threading.Lock()
+
+
+def get_chat_sender(backend_url: str) -> ChatSender:
+    """One sender per backend for the whole process (shared by all sessions)."""
+    with _chat_senders_lock:
+        sender = _chat_senders.get(backend_url)
+        if sender is None:
+            sender = _chat_senders[backend_url] = ChatSender(backend_url)
+            atexit.register(sender.close)
+        return sender
@@ -0,0 +1,366 @@
+# context.py
+# Token-budgeted prompts for the Ollama LLMs of the tour planning agents.
+# Every chat request an agent sends (including the follow-up requests after
+# tool calls) goes through ContextBuilder, which:
+#   - replaces tool results repeated within the prompt by a short reference,
+#   - rolls the oldest chat history into a running summary when the prompt
+#     is over the agent's token ceiling,
+#   - shortens long tool results of the current turn if that is not enough.
+# BudgetedOllama records prompt tokens (estimated before and after, and as
+# counted by Ollama) and time to first token for every request, and reports
+# them with generation speed and tool call times to tracing.py. A request
+# that fails or times out before its first token is retried on the fallback
+# model when one is set (see models.py), and a reply that stalls part way is
+# finished there. Requests that can fall back are always streamed from
+# Ollama, so the client's read timeout bounds the wait for each token rather
+# than the whole reply.
+import os
+import re
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import httpx
+from ollama import ResponseError
+from phi.llm.message import Message
+from phi.llm.ollama import Ollama
+from phi.tools.function import FunctionCall
+from phi.utils.log import logger
+
+import tracing
+
+# Context budget settings; 0 disables the ceiling
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 3000))
+CONTEXT_MAX_TOKENS_MEMBER = int(os.getenv("CONTEXT_MAX_TOKENS_MEMBER", 2000))
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", 300))
+# Shortest a tool result is cut down to when the turn itself is over budget
+CONTEXT_MIN_TOOL_TOKENS = 200
+# Rough llama3 tokenizer ratio for English text
+CHARS_PER_TOKEN = 4
+SUMMARY_LINE_CHARS = 160
+
+# Errors from the primary model that send a request to the fallback model
+FALLBACK_ERRORS = (httpx.TimeoutException, httpx.ConnectError, ResponseError)
+
+# Sent after the partial reply when a stalled stream is finished on the
+# fallback model
+CONTINUE_PROMPT = (
+    "Your reply above was cut off. Continue it exactly where it stopped, "
+    "without repeating any of it."
+)
+# Ollama's counters kept from the last chunk when a stream is joined
+RESPONSE_STATS = (
+    "model",
+    "created_at",
+    "done",
+    "done_reason",
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+# Reminder phi adds after tool results; part of the current turn
+TOOL_REMINDER_PREFIX = "Using the results of the tools above"
+
+
+def estimate_tokens(text: Any) -> int:
+    if not text:
+        return 0
+    return -(-len(str(text)) // CHARS_PER_TOKEN)
+
+
+def message_tokens(message: Message) -> int:
+    # A few tokens of role/formatting overhead per message
+    return estimate_tokens(message.content) + estimate_tokens(message.tool_calls) + 4
+
+
+def prompt_tokens(messages: List[Message]) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+
+def chunk_text(chunk: Any) -> str:
+    message = chunk.get("message") or {}
+    return message.get("content") or ""
+
+
+def _is_turn_internal(message: Message) -> bool:
+    return bool(
+        message.tool_calls
+        or message.tool_call_name
+        or message.role == "tool"
+        or (message.role == "user" and str(message.content or "").startswith(TOOL_REMINDER_PREFIX))
+    )
+
+
+def _summary_line(message: Message) -> str:
+    text = re.sub(r"\s+", " ", str(message.content or "")).strip()
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(sentence) > SUMMARY_LINE_CHARS:
+        sentence = sentence[: SUMMARY_LINE_CHARS - 3] + "..."
+    return f"- {message.role}: {sentence}"
+
+
+class ContextBuilder:
+    def __init__(self, max_tokens: int, summary_max_tokens: int = CONTEXT_SUMMARY_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+
+    def dedupe_tool_results(self, messages: List[Message]) -> Tuple[List[Message], int]:
+        seen: Dict[str, str] = {}
+        deduped, removed = [], 0
+        for message in messages:
+            if message.tool_call_name and isinstance(message.content, str) and message.content:
+                earlier = seen.get(message.content)
+                if earlier is not None:
+                    message = message.model_copy(
+                        update={"content": f"(Same result as the earlier {earlier} call above.)"}
+                    )
+                    removed += 1
+                else:
+                    seen[message.content] = message.tool_call_name
+            deduped.append(message)
+        return deduped, removed
+
+    def summarize(self, messages: List[Message]) -> Message:
+        lines = [_summary_line(message) for message in messages if message.content]
+        # Keep the most recent lines that fit the summary budget
+        kept: List[str] = []
+        tokens = 0
+        for line in reversed(lines):
+            tokens += estimate_tokens(line) + 1
+            if tokens > self.summary_max_tokens:
+                break
+            kept.append(line)
+        content = "Summary of the earlier conversation:\n" + "\n".join(reversed(kept))
+        return Message(role="system", content=content)
+
+    def _shorten_tool_results(self, messages: List[Message], start: int) -> List[Message]:
+        over = prompt_tokens(messages) - self.max_tokens
+        tool_indexes = [
+            i for i in range(start, len(messages)) if messages[i].tool_call_name and messages[i].content
+        ]
+        for i in sorted(tool_indexes, key=lambda i: -message_tokens(messages[i])):
+            if over <= 0:
+                break
+            content = str(messages[i].content)
+            keep = max(CONTEXT_MIN_TOOL_TOKENS, estimate_tokens(content) - over)
+            if keep >= estimate_tokens(content):
+                continue
+            shortened = content[: keep * CHARS_PER_TOKEN] + " ...(truncated)"
+            over -= estimate_tokens(content) - estimate_tokens(shortened)
+            messages[i] = messages[i].model_copy(update={"content": shortened})
+        return messages
+
+    def build(self, messages: List[Message]) -> Tuple[List[Message], Dict[str, int]]:
+        report = {"tokens_in": prompt_tokens(messages), "duplicates": 0, "summarized": 0}
+        messages, report["duplicates"] = self.dedupe_tool_results(messages)
+        if not self.max_tokens or prompt_tokens(messages) <= self.max_tokens:
+            report["tokens_out"] = prompt_tokens(messages)
+            return messages, report
+
+        # [system...] [history...] [current user message, tool calls/results...]
+        head = 0
+        while head < len(messages) and messages[head].role == "system":
+            head += 1
+        turn_start = len(messages) - 1
+        while turn_start > head and _is_turn_internal(messages[turn_start]):
+            turn_start -= 1
+        system, history, turn = messages[:head], messages[head:turn_start], messages[turn_start:]
+
+        # Roll the oldest history into the summary until the prompt fits
+        dropped = 0
+        for dropped in range(1, len(history) + 1):
+            candidate = system + [self.summarize(history[:dropped])] + history[dropped:] + turn
+            if prompt_tokens(candidate) <= self.max_tokens:
+                break
+        if dropped:
+            # Never split an assistant reply from the user message it answers
+            if dropped < len(history) and history[dropped].role == "assistant":
+                dropped += 1
+            messages = system + [self.summarize(history[:dropped])] + history[dropped:] + turn
+            turn_start = len(messages) - len(turn)
+            report["summarized"] = dropped
+
+        if prompt_tokens(messages) > self.max_tokens:
+            messages = self._shorten_tool_results(list(messages), turn_start)
+        report["tokens_out"] = prompt_tokens(messages)
+        if report["tokens_out"] > self.max_tokens:
+            logger.warning(
+                f"Prompt still {report['tokens_out']} tokens, over the {self.max_tokens} ceiling"
+            )
+        return messages, report
+
+
+# Recent per-request context measurements, shared by all sessions
+class ContextMetrics:
+    def __init__(self, max_records: int = 1000):
+        self._records: deque = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, record: Dict[str, Any]):
+        with self._lock:
+            self._records.append(record)
+        logger.info(
+            f"{record['agent']}: prompt {record['tokens_in']} -> {record['tokens_out']} tokens"
+            f" (ollama {record.get('prompt_eval_count')}), ttft {record['ttft']:.2f}s"
+        )
+
+    def recent(self, count: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)[-count:]
+
+    def stats(self) -> Dict[str, Any]:
+        records = self.recent(len(self._records))
+        if not records:
+            return {"requests": 0}
+        ttfts = sorted(record["ttft"] for record in records)
+        return {
+            "requests": len(records),
+            "avg_tokens_in": sum(r["tokens_in"] for r in records) / len(records),
+            "avg_tokens_out": sum(r["tokens_out"] for r in records) / len(records),
+            "summarized_requests": sum(1 for r in records if r["summarized"]),
+            "duplicates_removed": sum(r["duplicates"] for r in records),
+            "ttft_p50": ttfts[len(ttfts) // 2],
+            "ttft_p95": ttfts[int(0.95 * (len(ttfts) - 1))],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+context_metrics = ContextMetrics()
+
+
+# Ollama LLM that budgets every prompt it sends and measures it
+class BudgetedOllama(Ollama):
+    agent_name: str = "agent"
+    max_prompt_tokens: int = CONTEXT_MAX_TOKENS
+    metrics_recorder: Optional[ContextMetrics] = None
+    # Retried on, through `fallback_client`, when `model` fails before its
+    # first token; finishes the reply when `model` stalls part way
+    fallback_model: Optional[str] = None
+    fallback_client: Optional[Any] = None
+
+    def _prepare(self, messages: List[Message]) -> Tuple[List[Message], Dict[str, Any]]:
+        messages, report = ContextBuilder(self.max_prompt_tokens).build(messages)
+        report["agent"] = self.agent_name
+        return messages, report
+
+    def _record(
+        self,
+        report: Dict[str, Any],
+        start: float,
+        first_token: Optional[float],
+        last: Any,
+        chunks: int = 0,
+    ):
+        end = time.perf_counter()
+        report["ttft"] = (first_token or end) - start
+        completion_tokens, generation_seconds = chunks, end - (first_token or end)
+        if isinstance(last, Mapping):
+            report["prompt_eval_count"] = last.get("prompt_eval_count")
+            if last.get("eval_count"):
+                completion_tokens = last["eval_count"]
+            if last.get("eval_duration"):
+                # Ollama reports nanoseconds
+                generation_seconds = last["eval_duration"] / 1e9
+        (self.metrics_recorder or context_metrics).record(report)
+        tracing.record_llm_request(
+            self.agent_name,
+            report["ttft"],
+            report.get("prompt_eval_count") or report["tokens_out"],
+            completion_tokens,
+            generation_seconds,
+        )
+
+    def _fall_back(self, error: Exception, report: Dict[str, Any], action: str = "retrying"):
+        if not self.fallback_model or "fallback" in report:
+            raise error
+        logger.warning(
+            f"{self.agent_name}: {self.model} failed ({type(error).__name__}), "
+            f"{action} on {self.fallback_model}"
+        )
+        report["fallback"] = self.fallback_model
+        tracing.record_model_fallback(self.agent_name, self.model)
+
+    def _fallback_chat(self, messages: List[Message], stream: bool):
+        return (self.fallback_client or self.client).chat(
+            model=self.fallback_model,
+            messages=[self.to_llm_message(m) for m in messages],
+            stream=stream,
+            **self.api_kwargs,
+        )
+
+    def _joined(self, stream: Iterator[Any]) -> Dict[str, Any]:
+        """A streamed reply in the shape of a non-streamed one."""
+        text, last = [], {}
+        for last in stream:
+            text.append(chunk_text(last))
+        response = {key: last.get(key) for key in RESPONSE_STATS if last.get(key) is not None}
+        response["message"] = {"role": "assistant", "content": "".join(text)}
+        return response
+
+    def _continuation(self, messages: List[Message], partial: str) -> List[Message]:
+        return messages + [
+            Message(role="assistant", content=partial),
+            Message(role="user", content=CONTINUE_PROMPT),
+        ]
+
+    def invoke(self, messages: List[Message]) -> Mapping[str, Any]:
+        messages, report = self._prepare(messages)
+        start = time.perf_counter()
+        try:
+            if self.fallback_model:
+                # Streamed and joined here, so a long reply isn't cut off by
+                # the timeout meant for a model that doesn't answer
+                response = self._joined(super().invoke_stream(messages))
+            else:
+                response = super().invoke(messages)
+        except FALLBACK_ERRORS as e:
+            self._fall_back(e, report)
+            response = self._fallback_chat(messages, stream=False)
+        self._record(report, start, None, response)
+        return response
+
+    def invoke_stream(self, messages: List[Message]) -> Iterator[Mapping[str, Any]]:
+        messages, report = self._prepare(messages)
+        start = time.perf_counter()
+        stream = super().invoke_stream(messages)
+        try:
+            chunk = next(stream, None)
+        except FALLBACK_ERRORS as e:
+            self._fall_back(e, report)
+            stream = self._fallback_chat(messages, stream=True)
+            chunk = next(stream, None)
+        first_token = time.perf_counter() if chunk is not None else None
+        chunks = 0
+        if chunk is not None:
+            chunks += 1
+            yield chunk
+            text = [chunk_text(chunk)]
+            try:
+                for chunk in stream:
+                    chunks += 1
+                    text.append(chunk_text(chunk))
+                    yield chunk
+            except FALLBACK_ERRORS as e:
+                # The first part of the reply has been shown already; the
+                # fallback model writes the rest
+                self._fall_back(e, report, action="continuing")
+                continuation = self._continuation(messages, "".join(text))
+                for chunk in self._fallback_chat(continuation, stream=True):
+                    chunks += 1
+                    yield chunk
+        self._record(report, start, first_token, chunk, chunks)
+
+    def run_function_calls(self, function_calls: List[FunctionCall], role: str = "tool") -> List[Message]:
+        results = super().run_function_calls(function_calls, role)
+        for result in results:
+            if result.tool_call_name and result.metrics:
+                tracing.record_function_call(result.tool_call_name, result.metrics.get("time", 0.0))
+        return results
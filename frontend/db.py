@@ -0,0 +1,124 @@
+# db.py
+import os
+import threading
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+from phi.utils.log import logger
+
+import tracing
+
+db_url = os.getenv("PG_DB_URL", "postgresql+psycopg://ai:ai@localhost:5532/ai")
+
+# Connection pool settings for the engine shared by agent storage and the
+# knowledge base across all sessions
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
+# Log a warning when this share of the pool is checked out
+DB_POOL_SATURATION_WARNING = float(os.getenv("DB_POOL_SATURATION_WARNING", 0.9))
+
+
+# Checkout counters for the shared pool, fed by SQLAlchemy pool events
+class PoolMetrics:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.saturation_warnings = 0
+        self._lock = threading.Lock()
+        self._saturated = False
+
+    def on_connect(self, *args):
+        with self._lock:
+            self.connections_opened += 1
+
+    def on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            saturated = self.checked_out >= self.capacity * DB_POOL_SATURATION_WARNING
+            if saturated and not self._saturated:
+                self.saturation_warnings += 1
+                logger.warning(
+                    f"Postgres pool near saturation: {self.checked_out}/{self.capacity} "
+                    "connections checked out"
+                )
+            self._saturated = saturated
+
+    def on_checkin(self, *args):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+            self._saturated = self.checked_out >= self.capacity * DB_POOL_SATURATION_WARNING
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "saturation": self.checked_out / self.capacity if self.capacity else 0.0,
+            "checkouts": self.checkouts,
+            "connections_opened": self.connections_opened,
+            "saturation_warnings": self.saturation_warnings,
+        }
+
+
+_db_engine: Optional[Engine] = None
+_maintenance_engine: Optional[Engine] = None
+_db_engine_lock = threading.Lock()
+pool_metrics = PoolMetrics(capacity=DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+
+def get_db_engine() -> Engine:
+    """Return the process-wide pooled engine, creating it on first use."""
+    global _db_engine
+    with _db_engine_lock:
+        if _db_engine is None:
+            _db_engine = create_engine(
+                db_url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=True,
+                connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+            )
+            event.listen(_db_engine.pool, "connect", pool_metrics.on_connect)
+            event.listen(_db_engine.pool, "checkout", pool_metrics.on_checkout)
+            event.listen(_db_engine.pool, "checkin", pool_metrics.on_checkin)
+        return _db_engine
+
+
+def get_maintenance_engine() -> Engine:
+    """Engine for index builds and other long-running DDL.
+
+    Its connections have no statement timeout and are not pooled, so session
+    settings made for a build (e.g. maintenance_work_mem) end with it.
+    """
+    global _maintenance_engine
+    with _db_engine_lock:
+        if _maintenance_engine is None:
+            _maintenance_engine = create_engine(
+                db_url,
+                poolclass=NullPool,
+                connect_args={"options": "-c statement_timeout=0"},
+            )
+        return _maintenance_engine
+
+
+def pool_stats() -> dict:
+    """Pool saturation metrics for the shared engine."""
+    stats = pool_metrics.stats()
+    if _db_engine is not None:
+        stats["status"] = _db_engine.pool.status()
+    return stats
+
+
+tracing.register_stats("postgres_pool", "Shared Postgres connection pool, from pool_stats()", pool_stats)
@@ -0,0 +1,227 @@
+# embeddings.py
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import PrivateAttr
+from sqlalchemy import Column, Float, MetaData, String, Table, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from phi.embedder.base import Embedder
+from phi.embedder.ollama import OllamaEmbedder
+from phi.utils.log import logger
+
+import tracing
+from db import get_db_engine
+
+# Embedding cache settings
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+# Store embeddings in Postgres as a second, shared cache tier
+EMBEDDING_CACHE_PG = os.getenv("EMBEDDING_CACHE_PG", "1") == "1"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+
+
+def content_hash(model: str, content: str) -> str:
+    return sha256(f"{model}\0{content}".encode()).hexdigest()
+
+
+# OllamaEmbedder that embeds lists of texts in one request via /api/embed
+class BatchOllamaEmbedder(OllamaEmbedder):
+    batch_size: int = EMBEDDING_BATCH_SIZE
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start : start + self.batch_size]
+            try:
+                kwargs = {"options": self.options} if self.options is not None else {}
+                response = self.client.embed(model=self.model, input=batch, **kwargs)
+                embeddings.extend(list(embedding) for embedding in response["embeddings"])
+            except Exception as e:
+                # Older Ollama servers have no batch endpoint
+                logger.warning(f"Batch embedding failed, embedding one by one: {e}")
+                embeddings.extend(self.get_embedding(text) for text in batch)
+        return embeddings
+
+
+# Second cache tier: embeddings keyed by content hash in a Postgres table
+class PgEmbeddingStore:
+    def __init__(self, db_engine: Engine, table_name: str = "embedding_cache", schema: str = "ai"):
+        self.db_engine = db_engine
+        self.schema = schema
+        self.table = Table(
+            table_name,
+            MetaData(schema=schema),
+            Column("content_hash", String, primary_key=True),
+            Column("embedding", postgresql.ARRAY(Float)),
+        )
+        self._created = False
+
+    def _create(self):
+        if not self._created:
+            with self.db_engine.begin() as connection:
+                connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema}"))
+            self.table.create(self.db_engine, checkfirst=True)
+            self._created = True
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        self._create()
+        with self.db_engine.connect() as connection:
+            rows = connection.execute(
+                select(self.table.c.content_hash, self.table.c.embedding).where(
+                    self.table.c.content_hash.in_(keys)
+                )
+            ).fetchall()
+        return {row.content_hash: list(row.embedding) for row in rows}
+
+    def put_many(self, embeddings: Dict[str, List[float]]):
+        if not embeddings:
+            return
+        self._create()
+        stmt = postgresql.insert(self.table).values(
+            [{"content_hash": key, "embedding": value} for key, value in embeddings.items()]
+        )
+        with self.db_engine.begin() as connection:
+            connection.execute(stmt.on_conflict_do_nothing(index_elements=["content_hash"]))
+
+
+# Wraps an embedder with a content-hash keyed LRU and an optional shared store
+class CachedEmbedder(Embedder):
+    embedder: Embedder
+    cache_size: int = EMBEDDING_CACHE_SIZE
+    store: Optional[PgEmbeddingStore] = None
+
+    _cache: "OrderedDict[str, List[float]]" = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"memory_hits": 0, "store_hits": 0, "misses": 0}
+    )
+
+    def model_post_init(self, __context) -> None:
+        self.dimensions = self.embedder.dimensions
+
+    @property
+    def model(self) -> str:
+        return getattr(self.embedder, "model", type(self.embedder).__name__)
+
+    def _remember(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _from_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+
+    def _from_store(self, keys: List[str]) -> Dict[str, List[float]]:
+        if self.store is None or not keys:
+            return {}
+        try:
+            return self.store.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Embedding store lookup failed: {e}")
+            return {}
+
+    def _to_store(self, embeddings: Dict[str, List[float]]):
+        if self.store is None:
+            return
+        try:
+            self.store.put_many(embeddings)
+        except Exception as e:
+            logger.warning(f"Embedding store write failed: {e}")
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys = [content_hash(self.model, text) for text in texts]
+        # Repeated texts are looked up and embedded once, and every counter
+        # below counts each distinct text of the batch once
+        unique = list(dict.fromkeys(keys))
+        found: Dict[str, List[float]] = {}
+        for key in unique:
+            embedding = self._from_memory(key)
+            if embedding is not None:
+                found[key] = embedding
+        memory_hits = len(found)
+
+        stored = self._from_store([key for key in unique if key not in found])
+        found.update(stored)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            if hasattr(self.embedder, "get_embeddings"):
+                computed = self.embedder.get_embeddings(list(missing.values()))
+            else:
+                computed = [self.embedder.get_embedding(text) for text in missing.values()]
+            # Failed embeddings come back empty and are not cached
+            new = {key: value for key, value in zip(missing, computed) if value}
+            found.update(new)
+            self._to_store(new)
+
+        for key, embedding in found.items():
+            self._remember(key, embedding)
+        with self._lock:
+            self._stats["memory_hits"] += memory_hits
+            self._stats["store_hits"] += len(stored)
+            self._stats["misses"] += len(missing)
+        return [found.get(key, []) for key in keys]
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._cache)
+        lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            (stats["memory_hits"] + stats["store_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+
+_embedders: List["weakref.ref[CachedEmbedder]"] = []
+_embedders_lock = threading.Lock()
+
+
+def embedding_stats() -> dict:
+    """Counters of every live embedder from get_embedder, added up."""
+    totals = {"memory_hits": 0, "store_hits": 0, "misses": 0, "size": 0}
+    with _embedders_lock:
+        _embedders[:] = [ref for ref in _embedders if ref() is not None]
+        embedders = [ref() for ref in _embedders]
+    for embedder in embedders:
+        if embedder is None:
+            continue
+        for name, value in embedder.stats().items():
+            if name in totals:
+                totals[name] += value
+    lookups = totals["memory_hits"] + totals["store_hits"] + totals["misses"]
+    totals["hit_ratio"] = (totals["memory_hits"] + totals["store_hits"]) / lookups if lookups else 0.0
+    return totals
+
+
+def get_embedder(ollama_client=None) -> CachedEmbedder:
+    """Cached, batching nomic-embed-text embedder used by the knowledge base."""
+    store = PgEmbeddingStore(get_db_engine()) if EMBEDDING_CACHE_PG else None
+    embedder = CachedEmbedder(
+        embedder=BatchOllamaEmbedder(
+            model="nomic-embed-text", dimensions=1536, ollama_client=ollama_client
+        ),
+        store=store,
+    )
+    with _embedders_lock:
+        _embedders.append(weakref.ref(embedder))
+    return embedder
+
+
+tracing.register_stats("embedding_cache", "Knowledge base embedding cache", embedding_stats)
@@ -0,0 +1,38 @@
+# http_client.py
+# One keep-alive requests.Session for every backend call of the Streamlit
+# process, shared by all browser sessions, so logins, chat storage and agent
+# requests reuse pooled connections instead of opening a new one each time.
+# Per-user data (the access token) goes in per-request headers, never on the
+# shared session.
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Pooled connections kept per backend host
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 20))
+# Seconds to connect, and to wait for a response, on non-streaming calls
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_client: Optional[requests.Session] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> requests.Session:
+    global _client
+    with _client_lock:
+        if _client is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _client = session
+        return _client
+
+
+def auth_headers(token: Optional[str]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"} if token else {}
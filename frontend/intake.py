@@ -0,0 +1,131 @@
+# intake.py
+# Collects the trip details for one chat run without LLM calls. Each user
+# message is run through the slot extractor and merged into the run's trip
+# state; while details are missing the user gets a templated question, and
+# once everything is known the agent team is called with the full request.
+import os
+import re
+from datetime import date
+from typing import List, Optional
+
+from slots import REQUIRED_SLOTS, TripSlots, extract_slots
+
+# Set to 0 to let the User Interaction Agent collect the details again
+SLOT_INTAKE_ENABLED = os.getenv("SLOT_INTAKE_ENABLED", "1") == "1"
+
+# How each missing detail is asked for
+SLOT_QUESTIONS = {
+    "city": "which city you'd like to visit",
+    "date": "the date of your visit",
+    "start_time": "what time you'd like to start",
+    "end_time": "what time you'd like to finish",
+    "budget": "your budget for the day (or say it's flexible)",
+    "interests": "what you're interested in (museums, food, nature, history... or 'surprise me')",
+    "starting_point": "where you'll be starting from (your hotel, a station, a landmark)",
+}
+# Replies shorter than this many words that match nothing are taken as the
+# answer to a single open question ("Barcelona", "the Hilton")
+BARE_ANSWER_WORDS = 5
+# Short replies that are never a place
+SMALL_TALK = {"hi", "hello", "hey", "thanks", "thank you", "ok", "okay", "yes", "no", "sure", "help"}
+# A reply starting with these asks something rather than answering
+QUESTION_WORDS = {"what", "how", "why", "who", "when", "where", "which", "can", "could", "do", "is", "are"}
+# Asking for another trip once an itinerary has been made
+NEW_TRIP_PATTERN = re.compile(
+    r"\b(?:new|another|different)\s+(?:trip|tour|city|destination|itinerary)\b"
+    r"|\bstart\s+(?:over|again)\b",
+    re.IGNORECASE,
+)
+
+
+class TripIntake:
+    def __init__(self, today: Optional[date] = None):
+        self.today = today
+        self.slots = TripSlots()
+        # Fields asked for in the last question
+        self.asked: List[str] = []
+        # The agent has produced an itinerary for the current slots; further
+        # messages are follow-ups for the agent unless they start a new trip
+        self.completed = False
+
+    def reset(self):
+        self.slots = TripSlots()
+        self.asked = []
+        self.completed = False
+
+    def _bare_answer(self, message: str) -> TripSlots:
+        text = message.strip().strip(".!?")
+        if not text or len(text.split()) >= BARE_ANSWER_WORDS or text.lower() in SMALL_TALK:
+            return TripSlots()
+        if message.strip().endswith("?") or text.split()[0].lower() in QUESTION_WORDS:
+            return TripSlots()
+        if self.slots.city is None and all(word.isalpha() for word in text.replace("-", " ").split()):
+            return TripSlots(city=text.title())
+        if self.asked == ["starting_point"]:
+            return TripSlots(starting_point=text)
+        return TripSlots()
+
+    def update(self, message: str) -> Optional[str]:
+        """Merge the message into the trip state.
+
+        Returns the question to send back while details are missing, or None
+        when the message should go to the agent.
+        """
+        found = extract_slots(message, self.today or date.today())
+        new_trip = False
+        if self.completed:
+            if not self._starts_new_trip(message, found):
+                return None
+            self.reset()
+            new_trip = True
+        if found.is_empty():
+            found = self._bare_answer(message)
+            if found.is_empty() and self.slots.is_empty() and not new_trip:
+                # Not about planning a trip (yet); let the agent answer
+                return None
+        self.slots = self.slots.merge(found)
+        missing = self.slots.missing()
+        if not missing:
+            self.asked = []
+            return None
+        self.asked = missing
+        return self.question(missing, new_city=found.city is not None)
+
+    def _starts_new_trip(self, message: str, found: TripSlots) -> bool:
+        # Follow-ups mention places too ("add a visit to the Louvre"), so a
+        # different city alone is not enough: it has to come with the other
+        # details of a trip, or the user asks for a new one
+        if NEW_TRIP_PATTERN.search(message):
+            return True
+        if found.city is None or found.city == self.slots.city:
+            return False
+        return any(
+            getattr(found, name) is not None
+            for name in ("date", "start_time", "end_time", "budget", "starting_point")
+        )
+
+    def question(self, missing: List[str], new_city: bool = False) -> str:
+        asks = [SLOT_QUESTIONS[name] for name in REQUIRED_SLOTS if name in missing]
+        # Start and end time read better as one question
+        if "start_time" in missing and "end_time" in missing:
+            asks.remove(SLOT_QUESTIONS["end_time"])
+            asks[asks.index(SLOT_QUESTIONS["start_time"])] = "your start and end time"
+        if self.slots.city and new_city:
+            intro = f"Great, {self.slots.city} it is! To plan your day I still need"
+        elif self.slots.city:
+            intro = "Thanks! I still need"
+        else:
+            intro = "Let's plan your perfect day tour! Please tell me"
+        if len(asks) == 1:
+            return f"{intro} {asks[0]}."
+        return f"{intro}:\n" + "\n".join(f"- {ask}" for ask in asks)
+
+    def agent_message(self, message: str) -> str:
+        """What to send the agent for a message update() let through.
+
+        The first message after the details are complete carries all of them.
+        """
+        if self.completed or self.slots.missing():
+            return message
+        self.completed = True
+        return f"{message}\n\nTrip details:\n{self.slots.describe()}"
@@ -0,0 +1,255 @@
+# knowledge.py
+# ANN index management and tuned retrieval for the tour_planner_knowledge
+# collection. Run as a script to create, rebuild or inspect the index:
+#
+#   cd frontend
+#   python knowledge.py info
+#   python knowledge.py create --type hnsw --m 16 --ef-construction 200
+#   python knowledge.py rebuild --type ivfflat --lists 1000
+import os
+import copy
+import argparse
+from math import sqrt
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.expression import select, text
+from phi.document import Document
+from phi.vectordb.distance import Distance
+from phi.vectordb.pgvector import PgVector2
+from phi.vectordb.pgvector.index import HNSW, Ivfflat
+from phi.utils.log import logger
+
+import tracing
+from db import get_db_engine, get_maintenance_engine
+from embeddings import EMBEDDING_BATCH_SIZE, get_embedder
+
+KNOWLEDGE_COLLECTION = "tour_planner_knowledge"
+
+# ANN index settings
+# type: "hnsw" or "ivfflat"
+KNOWLEDGE_INDEX_TYPE = os.getenv("KNOWLEDGE_INDEX_TYPE", "hnsw")
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 40))
+# 0 sizes the lists from the row count (rows / 1000, or sqrt(rows) above 1M)
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", 0))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", 10))
+INDEX_MAINTENANCE_WORK_MEM = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "2GB")
+
+
+def get_vector_index(
+    index_type: str = KNOWLEDGE_INDEX_TYPE,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    ef_search: int = HNSW_EF_SEARCH,
+    lists: int = IVFFLAT_LISTS,
+    probes: int = IVFFLAT_PROBES,
+) -> Union[HNSW, Ivfflat]:
+    configuration = {"maintenance_work_mem": INDEX_MAINTENANCE_WORK_MEM}
+    if index_type == "ivfflat":
+        return Ivfflat(
+            lists=lists or 100,
+            probes=probes,
+            dynamic_lists=lists == 0,
+            configuration=configuration,
+        )
+    if index_type == "hnsw":
+        return HNSW(
+            m=m,
+            ef_construction=ef_construction,
+            ef_search=ef_search,
+            configuration=configuration,
+        )
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+# PgVector2 with per-query ef_search/probes and search by a precomputed embedding
+class TunedPgVector(PgVector2):
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Document]:
+        with tracing.span("knowledge_search"):
+            query_embedding = self.embedder.get_embedding(query)
+            if not query_embedding:
+                logger.error(f"Error getting embedding for Query: {query}")
+                return []
+            return self.search_by_embedding(query_embedding, limit, filters, ef_search, probes)
+
+    def _distance(self, query_embedding: List[float]):
+        embedding = self.table.c.embedding
+        if self.distance == Distance.l2:
+            return embedding.l2_distance(query_embedding)
+        if self.distance == Distance.max_inner_product:
+            return embedding.max_inner_product(query_embedding)
+        return embedding.cosine_distance(query_embedding)
+
+    def _set_search_params(self, sess, ef_search: Optional[int], probes: Optional[int]):
+        # SET LOCAL only lasts for the current transaction
+        if isinstance(self.index, Ivfflat):
+            sess.execute(text(f"SET LOCAL ivfflat.probes = {int(probes or self.index.probes)}"))
+        elif isinstance(self.index, HNSW):
+            sess.execute(
+                text(f"SET LOCAL hnsw.ef_search = {int(ef_search or self.index.ef_search)}")
+            )
+
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        exact: bool = False,
+    ) -> List[Document]:
+        stmt = select(
+            self.table.c.name,
+            self.table.c.meta_data,
+            self.table.c.content,
+            self.table.c.embedding,
+            self.table.c.usage,
+        )
+        if filters is not None:
+            for key, value in filters.items():
+                if hasattr(self.table.c, key):
+                    stmt = stmt.where(getattr(self.table.c, key) == value)
+        stmt = stmt.order_by(self._distance(query_embedding)).limit(limit)
+
+        try:
+            with self.Session() as sess:
+                with sess.begin():
+                    if exact:
+                        # Ground truth for recall measurements
+                        sess.execute(text("SET LOCAL enable_indexscan = off"))
+                    else:
+                        self._set_search_params(sess, ef_search, probes)
+                    neighbors = sess.execute(stmt).fetchall() or []
+        except Exception as e:
+            logger.error(f"Error searching for documents: {e}")
+            logger.error("Table might not exist, creating for future use")
+            self.create()
+            return []
+
+        return [
+            Document(
+                name=neighbor.name,
+                meta_data=neighbor.meta_data,
+                content=neighbor.content,
+                embedder=self.embedder,
+                embedding=neighbor.embedding,
+                usage=neighbor.usage,
+            )
+            for neighbor in neighbors
+        ]
+
+    def _prefetch_embeddings(self, documents: List[Document]):
+        # Embed a chunk of documents in one batched call; the per-document
+        # embed() in PgVector2.insert/upsert is then served from the cache
+        if hasattr(self.embedder, "get_embeddings"):
+            self.embedder.get_embeddings([document.content for document in documents])
+
+    def insert(self, documents: List[Document], batch_size: int = 10) -> None:
+        for start in range(0, len(documents), EMBEDDING_BATCH_SIZE):
+            chunk = documents[start : start + EMBEDDING_BATCH_SIZE]
+            self._prefetch_embeddings(chunk)
+            super().insert(chunk, batch_size=batch_size)
+
+    def upsert(self, documents: List[Document], batch_size: int = 20) -> None:
+        for start in range(0, len(documents), EMBEDDING_BATCH_SIZE):
+            chunk = documents[start : start + EMBEDDING_BATCH_SIZE]
+            self._prefetch_embeddings(chunk)
+            super().upsert(chunk, batch_size=batch_size)
+
+    def list_indexes(self) -> List[Dict[str, str]]:
+        """ANN indexes (hnsw/ivfflat) currently defined on the collection."""
+        with self.Session() as sess:
+            rows = sess.execute(
+                text(
+                    "SELECT indexname, indexdef FROM pg_indexes "
+                    "WHERE schemaname = :schema AND tablename = :table "
+                    "AND (indexdef ILIKE '%USING hnsw%' OR indexdef ILIKE '%USING ivfflat%')"
+                ),
+                {"schema": self.schema, "table": self.collection},
+            ).fetchall()
+        return [{"name": row.indexname, "definition": row.indexdef} for row in rows]
+
+    def drop_indexes(self) -> List[str]:
+        dropped = []
+        with self.Session() as sess:
+            with sess.begin():
+                for index in self.list_indexes():
+                    sess.execute(text(f'DROP INDEX IF EXISTS "{self.schema}"."{index["name"]}"'))
+                    dropped.append(index["name"])
+        return dropped
+
+    def maintenance(self) -> "TunedPgVector":
+        """This collection on the maintenance engine, for DDL that outlasts the
+        shared pool's statement timeout."""
+        vector_db = copy.copy(self)
+        vector_db.db_engine = get_maintenance_engine()
+        vector_db.Session = sessionmaker(bind=vector_db.db_engine)
+        return vector_db
+
+    def build_index(self, rebuild: bool = False) -> List[Dict[str, str]]:
+        """Create the configured ANN index; drop existing ones first if rebuild.
+
+        Building an index over a large collection takes minutes, so it runs
+        on the maintenance engine.
+        """
+        vector_db = self.maintenance()
+        vector_db.create()
+        if rebuild:
+            for name in vector_db.drop_indexes():
+                logger.info(f"Dropped index {name}")
+        if isinstance(self.index, Ivfflat) and self.index.dynamic_lists:
+            # Same sizing rule as PgVector2.optimize, but never below one list
+            rows = vector_db.get_count()
+            lists = rows // 1000 if rows <= 1_000_000 else int(sqrt(rows))
+            self.index = vector_db.index = self.index.model_copy(
+                update={"lists": max(1, lists), "dynamic_lists": False}
+            )
+        vector_db.optimize()
+        return vector_db.list_indexes()
+
+
+def get_knowledge_vector_db(
+    collection: str = KNOWLEDGE_COLLECTION,
+    index: Optional[Union[HNSW, Ivfflat]] = None,
+    embedder=None,
+) -> TunedPgVector:
+    return TunedPgVector(
+        db_engine=get_db_engine(),
+        collection=collection,
+        embedder=embedder or get_embedder(),
+        index=index or get_vector_index(),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge base index maintenance")
+    parser.add_argument("command", choices=["create", "rebuild", "info"])
+    parser.add_argument("--collection", default=KNOWLEDGE_COLLECTION)
+    parser.add_argument("--type", default=KNOWLEDGE_INDEX_TYPE, choices=["hnsw", "ivfflat"])
+    parser.add_argument("--m", type=int, default=HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--lists", type=int, default=IVFFLAT_LISTS)
+    args = parser.parse_args()
+
+    vector_db = get_knowledge_vector_db(
+        collection=args.collection,
+        index=get_vector_index(
+            args.type, m=args.m, ef_construction=args.ef_construction, lists=args.lists
+        ),
+    )
+    if args.command == "info":
+        indexes = vector_db.list_indexes()
+    else:
+        indexes = vector_db.build_index(rebuild=args.command == "rebuild")
+    print(f"{args.collection}: {vector_db.get_count() if vector_db.exists() else 0} rows")
+    for index in indexes:
+        print(f"  {index['name']}: {index['definition']}")
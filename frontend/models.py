@@ -0,0 +1,61 @@
+# models.py
+# Which Ollama model each agent runs on. Collecting trip details and
+# summarizing weather and news searches need far less than writing the
+# itinerary, so with AGENT_SMALL_MODEL set (a small or quantized model, e.g.
+# llama3.2:3b or llama3:8b-instruct-q4_0) the User Interaction, Weather and
+# News agents run on it, while the Itinerary agent and the main agent, which
+# writes the final plan, stay on the factory's model. A request to a model
+# other than the factory's is retried on the factory's model when it fails
+# or gets no first token within MODEL_FALLBACK_TIMEOUT seconds, and finished
+# there when it stalls that long part way; a reply that keeps coming may take
+# as long as it needs.
+# AGENT_MODEL_<ROLE> pins one agent to a model, e.g. AGENT_MODEL_WEATHER=phi3.
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+AGENT_SMALL_MODEL = os.getenv("AGENT_SMALL_MODEL", "")
+MODEL_FALLBACK_TIMEOUT = float(os.getenv("MODEL_FALLBACK_TIMEOUT", 60))
+
+SMALL = "small"
+LARGE = "large"
+# Agent name -> (override setting, tier)
+ROLES = {
+    "User Interaction Agent": ("AGENT_MODEL_USER_INTERACTION", SMALL),
+    "Weather Agent": ("AGENT_MODEL_WEATHER", SMALL),
+    "News Agent": ("AGENT_MODEL_NEWS", SMALL),
+    "Itinerary Agent": ("AGENT_MODEL_ITINERARY", LARGE),
+    "Tour Planning Assistant": ("AGENT_MODEL_MAIN", LARGE),
+}
+
+
+def role_overrides() -> Dict[str, str]:
+    return {
+        name: os.environ[setting] for name, (setting, _) in ROLES.items() if os.getenv(setting)
+    }
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    model: str
+    # Model to retry on when `model` fails or times out
+    fallback: Optional[str] = None
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        large_model: str,
+        small_model: str = AGENT_SMALL_MODEL,
+        overrides: Optional[Dict[str, str]] = None,
+    ):
+        self.large_model = large_model
+        self.small_model = small_model
+        self.overrides = role_overrides() if overrides is None else overrides
+
+    def route(self, agent_name: str) -> ModelRoute:
+        model = self.overrides.get(agent_name)
+        if model is None:
+            tier = ROLES.get(agent_name, (None, LARGE))[1]
+            model = self.small_model if tier == SMALL and self.small_model else self.large_model
+        return ModelRoute(model, fallback=self.large_model if model != self.large_model else None)
@@ -0,0 +1,106 @@
+# orchestration.py
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Iterator, Union
+
+from phi.utils.log import logger
+
+# Threads shared by all sessions for the parallel weather/news lookups
+AGENT_FANOUT_WORKERS = int(os.getenv("AGENT_FANOUT_WORKERS", 8))
+fanout_executor = ThreadPoolExecutor(
+    max_workers=AGENT_FANOUT_WORKERS, thread_name_prefix="agent-fanout"
+)
+
+
+# Runs the Weather and News agents concurrently and feeds both results into
+# the Itinerary agent, instead of delegating to them one after another.
+# `timings` holds the duration of each stage of the last plan in seconds.
+class TourPlanOrchestrator:
+    def __init__(
+        self,
+        weather_agent,
+        news_agent,
+        itinerary_agent,
+        executor: Executor = fanout_executor,
+    ):
+        self.weather_agent = weather_agent
+        self.news_agent = news_agent
+        self.itinerary_agent = itinerary_agent
+        self.executor = executor
+        self.timings: Dict[str, float] = {}
+
+    def _timed_run(self, stage: str, agent, message: str) -> str:
+        start = time.perf_counter()
+        try:
+            return agent.run(message, stream=False)
+        except Exception as e:
+            logger.warning(f"{stage} lookup failed: {e}")
+            return f"{stage.capitalize()} information is currently unavailable."
+        finally:
+            self.timings[stage] = time.perf_counter() - start
+
+    def research(self, trip_details: str) -> Dict[str, str]:
+        """Weather and news lookups for the trip, run in parallel."""
+        start = time.perf_counter()
+        weather = self.executor.submit(
+            self._timed_run,
+            "weather",
+            self.weather_agent,
+            f"Provide the weather forecast and recommendations for this trip:\n{trip_details}",
+        )
+        news = self.executor.submit(
+            self._timed_run,
+            "news",
+            self.news_agent,
+            "Find local events, attraction status, transportation and safety updates "
+            f"for this trip:\n{trip_details}",
+        )
+        results = {"weather": weather.result(), "news": news.result()}
+        self.timings["research"] = time.perf_counter() - start
+        return results
+
+    def plan(self, trip_details: str, stream: bool = True) -> Union[str, Iterator[str]]:
+        """Research the trip, then build the itinerary from both reports."""
+        self.timings = {}
+        start = time.perf_counter()
+        research = self.research(trip_details)
+        message = (
+            f"Create an optimized one-day itinerary for this trip:\n{trip_details}\n\n"
+            f"Weather report:\n{research['weather']}\n\n"
+            f"Local news and events:\n{research['news']}"
+        )
+        if not stream:
+            itinerary_start = time.perf_counter()
+            itinerary = self.itinerary_agent.run(message, stream=False)
+            self.timings["itinerary"] = time.perf_counter() - itinerary_start
+            self.timings["total"] = time.perf_counter() - start
+            logger.info(f"Tour plan timings: {self.format_timings()}")
+            return itinerary
+        return self._stream_itinerary(message, start)
+
+    def _stream_itinerary(self, message: str, start: float) -> Iterator[str]:
+        itinerary_start = time.perf_counter()
+        first_token = True
+        for delta in self.itinerary_agent.run(message, stream=True):
+            if first_token:
+                self.timings["itinerary_first_token"] = time.perf_counter() - itinerary_start
+                first_token = False
+            yield delta
+        self.timings["itinerary"] = time.perf_counter() - itinerary_start
+        self.timings["total"] = time.perf_counter() - start
+        logger.info(f"Tour plan timings: {self.format_timings()}")
+
+    def plan_tour(self, trip_details: str) -> str:
+        """Use this function to build the itinerary once all trip details are collected.
+        It checks the weather and local events in parallel and returns the itinerary.
+
+        Args:
+            trip_details (str): City, date, start and end time, budget, interests and starting point.
+        Returns:
+            str: The itinerary with weather and local updates.
+        """
+        return self.plan(trip_details, stream=False)
+
+    def format_timings(self) -> str:
+        return ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in self.timings.items())
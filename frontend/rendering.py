@@ -0,0 +1,122 @@
+# rendering.py
+# Chat rendering helpers for the Streamlit app. Streamlit resends an element's
+# whole text on every update, so rendering each streamed delta into one
+# markdown element costs the square of the reply length in bytes and browser
+# re-parsing. StreamingMarkdown batches deltas by time and size, and moves
+# finished paragraphs into their own elements so only the paragraph being
+# written is re-sent. The history view renders only the most recent messages.
+import os
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# Seconds between updates of the streaming reply, and characters that force
+# an update before the interval is up
+STREAM_RENDER_INTERVAL = float(os.getenv("STREAM_RENDER_INTERVAL", 0.1))
+STREAM_RENDER_MIN_CHARS = int(os.getenv("STREAM_RENDER_MIN_CHARS", 400))
+# Messages shown per history page; "Load older messages" adds another page
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", 20))
+
+CODE_FENCE = "```"
+
+
+def _block_boundary(text: str, start: int) -> int:
+    """End of the last finished paragraph in text[start:], or start if none.
+
+    A paragraph is finished at a blank line that is outside a code fence and
+    followed by unindented text (an indented line may still belong to it).
+    """
+    boundary = start
+    fences = 0
+    position = start
+    while True:
+        blank = text.find("\n\n", position)
+        if blank < 0:
+            break
+        fences += text.count(CODE_FENCE, position, blank)
+        end = blank + 2
+        while end < len(text) and text[end] == "\n":
+            end += 1
+        if end < len(text) and fences % 2 == 0 and text[end] not in " \t":
+            boundary = end
+        position = end
+    return boundary
+
+
+class StreamingMarkdown:
+    """Renders a streamed reply with throttled, paragraph-sized updates.
+
+    `new_block` returns a fresh placeholder with a `markdown(text)` method,
+    e.g. `st.container().empty`.
+    """
+
+    def __init__(
+        self,
+        new_block: Callable[[], Any],
+        interval: float = STREAM_RENDER_INTERVAL,
+        min_chars: int = STREAM_RENDER_MIN_CHARS,
+        split_blocks: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.new_block = new_block
+        self.interval = interval
+        self.min_chars = min_chars
+        self.split_blocks = split_blocks
+        self.clock = clock
+        self.text = ""
+        self._block = None
+        self._block_start = 0
+        self._pending = 0
+        self._last_render = None
+        self.renders = 0
+        self.bytes_sent = 0
+
+    def _render(self, block, text: str):
+        block.markdown(text)
+        self.renders += 1
+        self.bytes_sent += len(text.encode("utf-8"))
+
+    def _update(self):
+        if self._block is None:
+            self._block = self.new_block()
+        if self.split_blocks:
+            boundary = _block_boundary(self.text, self._block_start)
+            if boundary > self._block_start:
+                # Final render of the finished paragraphs, then a new element
+                self._render(self._block, self.text[self._block_start : boundary].rstrip("\n"))
+                self._block = self.new_block()
+                self._block_start = boundary
+        tail = self.text[self._block_start :]
+        if tail:
+            self._render(self._block, tail)
+        self._pending = 0
+        self._last_render = self.clock()
+
+    def push(self, delta: str):
+        if not delta:
+            return
+        self.text += delta
+        self._pending += len(delta)
+        now = self.clock()
+        if (
+            self._last_render is None
+            or now - self._last_render >= self.interval
+            or self._pending >= self.min_chars
+        ):
+            self._update()
+
+    def flush(self) -> str:
+        """Render whatever is still pending; returns the full reply."""
+        if self._pending:
+            self._update()
+        return self.text
+
+    def stats(self) -> Dict[str, int]:
+        return {"chars": len(self.text), "renders": self.renders, "bytes_sent": self.bytes_sent}
+
+
+def history_window(messages: List[dict], window: int) -> Tuple[int, List[dict]]:
+    """(number of older messages hidden, messages to render) for the chat view."""
+    shown = [message for message in messages if message["role"] != "system"]
+    if window <= 0 or len(shown) <= window:
+        return 0, shown
+    return len(shown) - window, shown[-window:]
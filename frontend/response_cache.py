@@ -0,0 +1,284 @@
+# response_cache.py
+# Opt-in semantic cache of finished itineraries. A request is only cached or
+# looked up once it names a city and a date of visit; a cached itinerary is
+# reused when the extracted slots agree and the embedding of the normalized
+# request is close enough. Entries go stale sooner as the visit approaches
+# (weather and events change) and are dropped once the visit date has passed.
+import os
+import re
+import math
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from phi.llm.message import Message
+from phi.utils.log import logger
+
+import tracing
+from slots import TripSlots, extract_slots
+
+# Semantic cache settings
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 1000))
+# Seconds a cached itinerary stays fresh: visits today or tomorrow use the
+# short TTL, later visits the long one
+SEMANTIC_CACHE_TTL_NEAR = float(os.getenv("SEMANTIC_CACHE_TTL_NEAR", 3600))
+SEMANTIC_CACHE_TTL_FAR = float(os.getenv("SEMANTIC_CACHE_TTL_FAR", 86400))
+# Budgets within this fraction of each other count as the same request
+SEMANTIC_CACHE_BUDGET_TOLERANCE = float(os.getenv("SEMANTIC_CACHE_BUDGET_TOLERANCE", 0.1))
+# Characters per chunk when streaming a cached itinerary back
+REPLAY_CHUNK_SIZE = 40
+
+# Only replies in the itinerary format the main agent is instructed to use are
+# cached; clarifying questions never are
+ITINERARY_MARKERS = ("schedule overview",)
+
+
+def normalize_request(text: str) -> str:
+    text = re.sub(r"[^\w\s$€£.-]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def freshness_ttl(visit_date: date, today: date) -> float:
+    days_ahead = (visit_date - today).days
+    if days_ahead < 0:
+        return 0.0
+    return SEMANTIC_CACHE_TTL_NEAR if days_ahead <= 1 else SEMANTIC_CACHE_TTL_FAR
+
+
+def looks_like_itinerary(response: str) -> bool:
+    lowered = response.lower()
+    return any(marker in lowered for marker in ITINERARY_MARKERS)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _place(name: Optional[str]) -> Optional[str]:
+    return normalize_request(name) if name else None
+
+
+@dataclass
+class CachedResponse:
+    request: str
+    slots: TripSlots
+    embedding: List[float]
+    response: str
+    expires_at: float
+    generation_seconds: float = 0.0
+    hits: int = 0
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_size: int = SEMANTIC_CACHE_SIZE,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self._embedder = embedder
+        self.threshold = threshold
+        self.max_size = max_size
+        self.enabled = enabled
+        self._entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        # (city, date) -> entry ids, so a lookup only compares candidates for
+        # the same trip
+        self._buckets: Dict[Tuple[str, date], List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "stored": 0,
+            "saved_seconds": 0.0,
+        }
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from embeddings import get_embedder
+
+            self._embedder = get_embedder()
+        return self._embedder
+
+    @staticmethod
+    def cacheable(slots: TripSlots) -> bool:
+        return slots.city is not None and slots.date is not None
+
+    @staticmethod
+    def _bucket(slots: TripSlots) -> Tuple[str, date]:
+        return slots.city.lower(), slots.date
+
+    @staticmethod
+    def _same_trip(a: TripSlots, b: TripSlots) -> bool:
+        if a.interests != b.interests:
+            return False
+        if (a.start_time, a.end_time) != (b.start_time, b.end_time):
+            return False
+        if _place(a.starting_point) != _place(b.starting_point):
+            return False
+        if a.budget is None or b.budget is None:
+            return a.budget == b.budget
+        return abs(a.budget - b.budget) <= SEMANTIC_CACHE_BUDGET_TOLERANCE * max(a.budget, b.budget)
+
+    def _evict(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets.get(self._bucket(entry.slots), [])
+        if entry_id in bucket:
+            bucket.remove(entry_id)
+        if not bucket:
+            self._buckets.pop(self._bucket(entry.slots), None)
+
+    def lookup(
+        self, request: str, slots: Optional[TripSlots] = None, today: Optional[date] = None
+    ) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        today = today or date.today()
+        slots = slots or extract_slots(request, today)
+        if not self.cacheable(slots):
+            return None
+        with self._lock:
+            self._stats["lookups"] += 1
+            candidates = []
+            now = time.time()
+            for entry_id in list(self._buckets.get(self._bucket(slots), [])):
+                entry = self._entries[entry_id]
+                if now > entry.expires_at or entry.slots.date < today:
+                    self._stats["stale"] += 1
+                    self._evict(entry_id)
+                elif self._same_trip(entry.slots, slots):
+                    candidates.append((entry_id, entry))
+        if not candidates:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        embedding = self.embedder.get_embedding(normalize_request(request))
+        best_id, best, best_score = None, None, self.threshold
+        for entry_id, entry in candidates:
+            score = _cosine(embedding, entry.embedding)
+            if score >= best_score:
+                best_id, best, best_score = entry_id, entry, score
+        with self._lock:
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+            best.hits += 1
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += best.generation_seconds
+            if best_id in self._entries:
+                self._entries.move_to_end(best_id)
+        logger.debug(f"Semantic cache hit ({best_score:.3f}) for: {request}")
+        return best
+
+    def store(
+        self,
+        request: str,
+        response: str,
+        slots: Optional[TripSlots] = None,
+        today: Optional[date] = None,
+        generation_seconds: float = 0.0,
+    ) -> bool:
+        if not self.enabled or not looks_like_itinerary(response):
+            return False
+        today = today or date.today()
+        slots = slots or extract_slots(request, today)
+        if not self.cacheable(slots):
+            return False
+        ttl = freshness_ttl(slots.date, today)
+        if ttl <= 0:
+            return False
+        entry = CachedResponse(
+            request=request,
+            slots=slots,
+            embedding=self.embedder.get_embedding(normalize_request(request)),
+            response=response,
+            expires_at=time.time() + ttl,
+            generation_seconds=generation_seconds,
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(self._bucket(slots), []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+            self._stats["stored"] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["hit_ratio"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+
+response_cache = SemanticResponseCache()
+tracing.register_stats("response_cache", "Semantic itinerary response cache", response_cache.stats)
+
+
+def replay(response: str, chunk_size: int = REPLAY_CHUNK_SIZE) -> Iterator[str]:
+    for start in range(0, len(response), chunk_size):
+        yield response[start : start + chunk_size]
+
+
+def remember_exchange(agent, request: str, response: str):
+    """Record a cached answer in the agent's memory and storage, as a run would."""
+    messages = [Message(role="user", content=request), Message(role="assistant", content=response)]
+    agent.memory.add_chat_messages(messages=messages)
+    agent.memory.add_llm_messages(messages=messages)
+    try:
+        agent.write_to_storage()
+    except Exception as e:
+        logger.warning(f"Could not save cached response to storage: {e}")
+
+
+def cached_run(
+    agent,
+    request: str,
+    cache: Optional[SemanticResponseCache] = None,
+    slots: Optional[TripSlots] = None,
+) -> Iterator[str]:
+    """agent.run(request) streamed, served from the semantic cache when possible.
+
+    `slots` overrides the details extracted from the request, e.g. the trip
+    state collected over several messages.
+    """
+    cache = cache or response_cache
+    if not cache.enabled:
+        with tracing.span("agent_run", agent=agent.name or "agent"):
+            yield from agent.run(request)
+        return
+
+    today = date.today()
+    slots = slots or extract_slots(request, today)
+    hit = cache.lookup(request, slots, today)
+    if hit is not None:
+        remember_exchange(agent, request, hit.response)
+        yield from replay(hit.response)
+        return
+
+    start = time.perf_counter()
+    response = ""
+    with tracing.span("agent_run", agent=agent.name or "agent"):
+        for delta in agent.run(request):
+            response += delta
+            yield delta
+    cache.store(request, response, slots, today, time.perf_counter() - start)
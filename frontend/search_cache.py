@@ -0,0 +1,181 @@
+# search_cache.py
+# Process-wide cache for web search tool results. Every agent of every session
+# shares one SearchResultCache, so "weather in Rome tomorrow" asked by many
+# users within a few minutes only reaches SerpApi/DuckDuckGo once.
+import os
+import re
+import time
+import inspect
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from phi.tools import Toolkit
+from phi.utils.log import logger
+
+import tracing
+
+# Search cache settings
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") == "1"
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 5000))
+# Seconds a result stays fresh, per kind of lookup
+SEARCH_TTL_WEATHER = float(os.getenv("SEARCH_TTL_WEATHER", 600))
+SEARCH_TTL_NEWS = float(os.getenv("SEARCH_TTL_NEWS", 1800))
+SEARCH_TTL_DEFAULT = float(os.getenv("SEARCH_TTL_DEFAULT", 21600))
+
+# Tool replies that report a failure instead of results; never cached
+UNCACHEABLE_PREFIXES = ("Error", "Please provide")
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the results."""
+    return re.sub(r"\s+", " ", str(query)).strip().strip("?!.,;:").strip().lower()
+
+
+# Thread-safe LRU of search results. An entry is served to a caller only while
+# it is younger than the caller's TTL, so agents with different freshness needs
+# can share entries. Identical queries that arrive while a fetch is running
+# wait for that fetch instead of starting their own.
+class SearchResultCache:
+    def __init__(self, max_size: int = SEARCH_CACHE_SIZE, enabled: bool = SEARCH_CACHE_ENABLED):
+        self.max_size = max_size
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "fetch_seconds": 0.0,
+            "fetch_max_seconds": 0.0,
+        }
+
+    def _lookup(self, key: Tuple, ttl: float) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        fetched_at, value = entry
+        if time.monotonic() - fetched_at > ttl:
+            self._stats["expired"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Tuple, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_fetch(
+        self,
+        key: Tuple,
+        ttl: float,
+        fetch: Callable[[], Any],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        if not self.enabled or ttl <= 0:
+            return fetch()
+
+        owner = False
+        with self._lock:
+            hit, value = self._lookup(key, ttl)
+            if hit:
+                self._stats["hits"] += 1
+                return value
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                self._stats["coalesced"] += 1
+            else:
+                self._stats["misses"] += 1
+                pending = self._in_flight[key] = Future()
+                owner = True
+        if not owner:
+            return pending.result()
+
+        start = time.perf_counter()
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                del self._in_flight[key]
+            pending.set_exception(e)
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["fetch_seconds"] += elapsed
+            self._stats["fetch_max_seconds"] = max(self._stats["fetch_max_seconds"], elapsed)
+            if cacheable(value):
+                self._store(key, value)
+            else:
+                self._stats["errors"] += 1
+            del self._in_flight[key]
+        pending.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["in_flight"] = len(self._in_flight)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        stats["fetch_avg_ms"] = (
+            stats["fetch_seconds"] / stats["misses"] * 1000 if stats["misses"] else 0.0
+        )
+        return stats
+
+
+search_cache = SearchResultCache()
+tracing.register_stats("search_cache", "Shared web search result cache", search_cache.stats)
+
+
+def _cacheable(result: Any) -> bool:
+    return not (isinstance(result, str) and result.startswith(UNCACHEABLE_PREFIXES))
+
+
+# Toolkit exposing the same functions as the wrapped toolkit (SerpApiTools,
+# DuckDuckGo, ...) with their results served from the shared cache. The query
+# argument is normalized for the cache key; other arguments are kept as-is.
+class CachedSearchTools(Toolkit):
+    def __init__(
+        self,
+        toolkit: Toolkit,
+        ttl: float = SEARCH_TTL_DEFAULT,
+        cache: Optional[SearchResultCache] = None,
+    ):
+        super().__init__(name=f"cached_{toolkit.name}")
+        self.toolkit = toolkit
+        self.ttl = ttl
+        self.cache = cache or search_cache
+        for name in toolkit.functions:
+            self.register(self._cached(getattr(toolkit, name)))
+
+    def _cached(self, function: Callable) -> Callable:
+        signature = inspect.signature(function)
+        namespace = f"{self.toolkit.name}.{function.__name__}"
+
+        @wraps(function)
+        def cached_function(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (namespace,) + tuple(
+                (name, normalize_query(value) if name == "query" else value)
+                for name, value in sorted(bound.arguments.items())
+            )
+            logger.debug(f"Cached search {namespace}: {bound.arguments.get('query')}")
+            return self.cache.get_or_fetch(
+                key, self.ttl, lambda: function(*args, **kwargs), cacheable=_cacheable
+            )
+
+        return cached_function
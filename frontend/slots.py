@@ -0,0 +1,399 @@
+# slots.py
+# Rule-based extraction of trip details (city, date of visit, start and end
+# time, budget, interests, starting point) from a chat message, without
+# calling the LLM.
+import re
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, time, timedelta
+from typing import FrozenSet, List, Optional
+
+try:
+    from dateutil import parser as date_parser
+except ImportError:
+    date_parser = None
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+
+# Canonical interest -> words that express it
+INTEREST_KEYWORDS = {
+    "museums": ["museum", "museums", "gallery", "galleries", "art", "exhibition"],
+    "history": ["history", "historic", "historical", "monument", "monuments", "ruins", "castle"],
+    "food": ["food", "foodie", "cuisine", "culinary", "restaurant", "restaurants", "street food"],
+    "shopping": ["shopping", "shops", "market", "markets", "boutiques"],
+    "nature": ["nature", "park", "parks", "garden", "gardens", "hiking", "outdoors"],
+    "nightlife": ["nightlife", "bars", "clubs", "pubs"],
+    "architecture": ["architecture", "churches", "cathedral", "cathedrals", "landmarks"],
+    "beaches": ["beach", "beaches", "seaside"],
+}
+
+# Words that end a city name ("Paris on Saturday", "Rome for a day")
+CITY_STOP_WORDS = {
+    "on", "for", "with", "from", "at", "and", "by", "to", "in", "into", "of", "tomorrow",
+    "today", "tonight", "next", "this", "budget", "during", "starting", "between", "under",
+    "within", "around", "near", *WEEKDAYS, *MONTHS,
+}
+
+# Words that can sit between the preposition and the city ("to visit the
+# Hague", "explore the city of Rome", "to be in London")
+CITY_LEADING_WORDS = {
+    "the", "a", "an", "my", "our", "visit", "explore", "see", "go", "get", "be", "spend",
+    "plan", "travel", "fly", "head", "city", "town", "of",
+}
+ARTICLES = {"the", "a", "an", "my", "our"}
+
+# "to" after these starts an infinitive, not a destination ("I want to eat")
+INFINITIVE_VERBS = {
+    "want", "wants", "need", "needs", "have", "has", "like", "love", "plan",
+    "planning", "hope", "wish", "able", "try", "trying", "decided", "about", "how", "where",
+}
+
+# "to" after these is either ("going to Berlin", "going to eat"), so what
+# follows must be capitalized, unless the user writes everything in lowercase
+EITHER_TO_VERBS = {"going", "heading", "off"}
+
+# Places and things that follow "in"/"to" but are not a city ("to the
+# airport", "in the rain")
+NOT_A_CITY = {
+    "airport", "station", "hotel", "hostel", "centre", "center", "downtown", "city", "town",
+    "area", "morning", "afternoon", "evening", "night", "day", "rain", "snow", "sun", "heat",
+    "cold", "weather", "summer", "winter", "spring", "autumn", "advance", "case", "mind",
+    "total", "general", "time", "person", "english",
+}
+
+# Capitalized words that open a message without being a city ("Hi, ...")
+NOT_A_LEADING_CITY = {
+    "hi", "hello", "hey", "thanks", "ok", "okay", "yes", "no", "sure", "please", "i", "we",
+    "me", "us", "it", "lunch", "dinner", "breakfast", "something", "anything", "maybe",
+}
+
+CITY_PATTERN = re.compile(
+    r"(?<!interested )(?<!interest )\b(?:in|to|visit|visiting|explore|exploring)\s+"
+    r"(?=([a-z][a-z'.-]*(?:\s+[a-z][a-z'.-]*){0,5}))",
+    re.IGNORECASE,
+)
+# A city opening the message before its date or length ("Paris on 12/25",
+# "Lisbon for a day")
+LEADING_CITY_PATTERN = re.compile(
+    r"^\s*([A-Z][a-z'.-]*(?:\s+[A-Z][a-z'.-]*){0,2})\s*(?:,\s*|\s+(?:on|for|from|tomorrow|today|"
+    r"tonight|next|this)\b)"
+)
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+MONTH_DAY_PATTERN = re.compile(
+    r"\b(" + "|".join(MONTHS) + r"|" + "|".join(m[:3] for m in MONTHS) + r")\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b"
+    r"|\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(" + "|".join(MONTHS) + r"|" + "|".join(m[:3] for m in MONTHS) + r")\b",
+    re.IGNORECASE,
+)
+# Something dateutil could read as a date: 01/06, 1.6.2025, 2025/06/01
+DATE_HINT_PATTERN = re.compile(r"\b\d{1,4}[/.]\d{1,2}(?:[/.]\d{2,4})?\b")
+WEEKDAY_PATTERN = re.compile(r"\b(?:(next)\s+)?(" + "|".join(WEEKDAYS) + r")\b", re.IGNORECASE)
+TIME = r"(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)?"
+TIME_RANGE_PATTERN = re.compile(
+    r"(?<![-/.\d])\b" + TIME + r"\s*(?:-|–|to|until|till)\s*" + TIME
+    + r"(?![-/\d])(?!\s*(?:dollars|usd|euros?|eur|pounds|gbp|\$|€|£))",
+    re.IGNORECASE,
+)
+# After bare hours, says they are times of day ("from 9 to 5 o'clock")
+TIME_WORD_PATTERN = re.compile(r"\s*(?:o'?clock|in the (?:morning|afternoon|evening))\b", re.IGNORECASE)
+START_TIME_PATTERN = re.compile(r"\b(?:from|at|start(?:ing)? at|after)\s+" + TIME + r"\b", re.IGNORECASE)
+END_TIME_PATTERN = re.compile(r"\b(?:until|till|by|before|end(?:ing)? at)\s+" + TIME + r"\b", re.IGNORECASE)
+STARTING_POINT_PATTERN = re.compile(
+    r"\b(?:start(?:ing)?\s+(?:from|at)|leaving\s+from|staying\s+(?:at|in|near)|depart(?:ing)?\s+from)"
+    r"\s+(?!\d)([^,.;!?\n]+)",
+    re.IGNORECASE,
+)
+FULL_DAY_PATTERN = re.compile(r"\b(?:all|whole|full|entire)\s+day\b", re.IGNORECASE)
+FULL_DAY = (time(9, 0), time(18, 0))
+# Replies meaning "no constraint"
+FLEXIBLE_BUDGET_PATTERN = re.compile(
+    r"\b(?:no|any|flexible|unlimited|doesn't matter|not sure about(?: the)?)\s*budget\b|\bbudget\s+(?:is\s+)?flexible\b",
+    re.IGNORECASE,
+)
+ANY_INTERESTS_PATTERN = re.compile(
+    r"\b(?:anything|surprise me|no preference|popular|whatever|don't know|not sure)\b", re.IGNORECASE
+)
+
+# "1,000", "1.000", "1,000.50", "1.000,50", "12.5"
+AMOUNT = r"(\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?(?!\d)|\d+(?:[.,]\d{1,2})?(?!\d))"
+BUDGET_PATTERN = re.compile(
+    r"(?:[$€£]\s*" + AMOUNT + r")"
+    r"|(?:\b" + AMOUNT + r"\s*(?:\$|€|£|dollars|usd|euros?|eur|pounds|gbp)\b)"
+    r"|(?:\bbudget\s*(?:of|is|:|=)?\s*(?:about|around)?\s*" + AMOUNT + r")",
+    re.IGNORECASE,
+)
+DECIMAL_PATTERN = re.compile(r"[.,](\d{1,2})$")
+
+
+# Slots the agent team needs before it can build an itinerary, in the order
+# the User Interaction Agent asks for them
+REQUIRED_SLOTS = ["city", "date", "start_time", "end_time", "budget", "interests", "starting_point"]
+
+
+# budget 0 means "flexible"; the "popular" interest means "suggest something"
+@dataclass(frozen=True)
+class TripSlots:
+    city: Optional[str] = None
+    date: Optional[date] = None
+    budget: Optional[float] = None
+    interests: FrozenSet[str] = field(default_factory=frozenset)
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    starting_point: Optional[str] = None
+
+    def merge(self, other: "TripSlots") -> "TripSlots":
+        """Slots from `other` override these; interests accumulate."""
+        return replace(
+            self,
+            city=other.city or self.city,
+            date=other.date or self.date,
+            budget=other.budget if other.budget is not None else self.budget,
+            interests=self.interests | other.interests,
+            start_time=other.start_time or self.start_time,
+            end_time=other.end_time or self.end_time,
+            starting_point=other.starting_point or self.starting_point,
+        )
+
+    def missing(self) -> List[str]:
+        return [name for name in REQUIRED_SLOTS if not _filled(getattr(self, name))]
+
+    def is_empty(self) -> bool:
+        return len(self.missing()) == len(REQUIRED_SLOTS)
+
+    def describe(self) -> str:
+        """The collected details as one request for the agent team."""
+        interests = ", ".join(sorted(self.interests - {"popular"})) or "popular sights"
+        lines = [
+            f"City: {self.city}",
+            f"Date of visit: {self.date.isoformat() if self.date else 'not given'}",
+            f"Available timings: {_format_time(self.start_time)} - {_format_time(self.end_time)}",
+            f"Budget: {f'${self.budget:g}' if self.budget else 'flexible'}",
+            f"Interests: {interests}",
+            f"Starting point: {self.starting_point}",
+        ]
+        return "\n".join(lines)
+
+
+def _filled(value) -> bool:
+    if isinstance(value, frozenset):
+        return bool(value)
+    return value is not None
+
+
+def _format_time(value: Optional[time]) -> str:
+    return value.strftime("%H:%M") if value else "not given"
+
+
+def _city_words(words: List[str]) -> List[str]:
+    city = []
+    for word in words:
+        if word.lower() in CITY_STOP_WORDS:
+            break
+        city.append(word.strip(".'"))
+    return city
+
+
+def _is_city(city: List[str]) -> bool:
+    if not city or city[0].lower() in NOT_A_CITY:
+        return False
+    return not any(city[0].lower() in synonyms for synonyms in INTEREST_KEYWORDS.values())
+
+
+def extract_city(text: str) -> Optional[str]:
+    lowercase = text == text.lower()
+    for match in CITY_PATTERN.finditer(text):
+        preceding = text[: match.start()].split()
+        previous = preceding[-1].lower().strip(",'") if preceding else ""
+        after_to = match.group(0).lower().startswith("to")
+        if after_to and previous in INFINITIVE_VERBS:
+            continue
+        words = match.group(1).split()
+        # "the airport", "the rain", "going to eat": here a name is
+        # capitalized, unless the user writes everything in lowercase
+        capitalized = after_to and previous in EITHER_TO_VERBS
+        while words and words[0].lower() in CITY_LEADING_WORDS:
+            capitalized = capitalized or words[0].lower() in ARTICLES
+            words = words[1:]
+        city = _city_words(words)
+        if not _is_city(city):
+            continue
+        if capitalized and not lowercase and not city[0][0].isupper():
+            continue
+        return " ".join(city).title()
+    match = LEADING_CITY_PATTERN.match(text)
+    if match:
+        city = match.group(1).split()
+        if (
+            _is_city(city)
+            and city[0].lower() not in CITY_STOP_WORDS | CITY_LEADING_WORDS
+            and city[0].lower() not in NOT_A_LEADING_CITY
+        ):
+            return " ".join(city)
+    return None
+
+
+def _month_day(month: str, day: int, today: date) -> Optional[date]:
+    month_number = [m[:3] for m in MONTHS].index(month[:3].lower()) + 1
+    for year in (today.year, today.year + 1):
+        try:
+            candidate = date(year, month_number, day)
+        except ValueError:
+            return None
+        if candidate >= today:
+            return candidate
+    return None
+
+
+def extract_date(text: str, today: Optional[date] = None) -> Optional[date]:
+    today = today or date.today()
+    lowered = text.lower()
+    match = ISO_DATE_PATTERN.search(text)
+    if match:
+        try:
+            return date(*(int(part) for part in match.groups()))
+        except ValueError:
+            pass
+    match = MONTH_DAY_PATTERN.search(text)
+    if match:
+        if match.group(1):
+            return _month_day(match.group(1), int(match.group(2)), today)
+        return _month_day(match.group(4), int(match.group(3)), today)
+    if "day after tomorrow" in lowered:
+        return today + timedelta(days=2)
+    if "tomorrow" in lowered:
+        return today + timedelta(days=1)
+    if re.search(r"\b(today|tonight)\b", lowered):
+        return today
+    match = WEEKDAY_PATTERN.search(text)
+    if match:
+        days_ahead = (WEEKDAYS.index(match.group(2).lower()) - today.weekday()) % 7
+        if match.group(1) and days_ahead == 0:
+            days_ahead = 7
+        return today + timedelta(days=days_ahead)
+    return _parse_date(text, today)
+
+
+def _parse_date(text: str, today: date) -> Optional[date]:
+    # Other formats ("01/06/2025", "Dec. 3rd 2026") via dateutil. Parsing
+    # with two different defaults tells dates the text spells out from
+    # fields dateutil filled in.
+    if date_parser is None:
+        return None
+    for pattern in (TIME_RANGE_PATTERN, START_TIME_PATTERN, END_TIME_PATTERN, BUDGET_PATTERN):
+        text = pattern.sub(" ", text)
+    if not DATE_HINT_PATTERN.search(text):
+        return None
+    parsed = []
+    for default in (datetime(today.year, 1, 1), datetime(today.year, 2, 2)):
+        try:
+            parsed.append(date_parser.parse(text, fuzzy=True, default=default).date())
+        except (ValueError, OverflowError):
+            return None
+    if parsed[0] != parsed[1]:
+        return None
+    if parsed[0] < today and str(parsed[0].year) not in text:
+        try:
+            return parsed[0].replace(year=today.year + 1)
+        except ValueError:
+            return None
+    return parsed[0]
+
+
+def _to_time(hour: str, minute: Optional[str], meridiem: Optional[str]) -> Optional[time]:
+    hour_value, minute_value = int(hour), int(minute or 0)
+    meridiem = (meridiem or "").lower().replace(".", "")
+    if meridiem == "pm" and hour_value < 12:
+        hour_value += 12
+    elif meridiem == "am" and hour_value == 12:
+        hour_value = 0
+    if hour_value > 23 or minute_value > 59:
+        return None
+    return time(hour_value, minute_value)
+
+
+def _is_time_range(text: str, match) -> bool:
+    # Minutes or am/pm on either end, or a time word after the range; bare
+    # numbers ("from 2 to 3 people") are times only when they are the whole
+    # reply, answering the question about timings
+    if any(match.group(group) for group in (2, 3, 5, 6)):
+        return True
+    if TIME_WORD_PATTERN.match(text, match.end()):
+        return True
+    reply = re.sub(r"^(?:from|between)\s+", "", text.strip().strip(".!?"), flags=re.IGNORECASE)
+    return reply == match.group(0).strip()
+
+
+def extract_times(text: str):
+    """(start, end) of the day's available time; either may be None."""
+    if FULL_DAY_PATTERN.search(text):
+        return FULL_DAY
+    match = next((m for m in TIME_RANGE_PATTERN.finditer(text) if _is_time_range(text, m)), None)
+    if match:
+        start_meridiem, end_meridiem = match.group(3), match.group(6)
+        end = _to_time(match.group(4), match.group(5), end_meridiem)
+        start = _to_time(match.group(1), match.group(2), start_meridiem or end_meridiem)
+        # "1-5pm" is 13:00-17:00 but "9-5pm" is 09:00-17:00
+        if start and end and start >= end and not start_meridiem:
+            start = _to_time(match.group(1), match.group(2), None)
+        # "9 to 5" without am/pm: an end before the start is in the afternoon
+        if start and end and end <= start and not end_meridiem and end.hour < 12:
+            end = _to_time(match.group(4), match.group(5), "pm")
+        return start, end
+    start = end = None
+    match = START_TIME_PATTERN.search(text)
+    if match and (match.group(2) or match.group(3)):
+        start = _to_time(*match.groups())
+    match = END_TIME_PATTERN.search(text)
+    if match and (match.group(2) or match.group(3)):
+        end = _to_time(*match.groups())
+    return start, end
+
+
+def extract_starting_point(text: str) -> Optional[str]:
+    match = STARTING_POINT_PATTERN.search(text)
+    if not match:
+        return None
+    return match.group(1).strip() or None
+
+
+def extract_budget(text: str) -> Optional[float]:
+    if FLEXIBLE_BUDGET_PATTERN.search(text):
+        return 0.0
+    match = BUDGET_PATTERN.search(text)
+    if not match:
+        return None
+    amount = next(group for group in match.groups() if group)
+    # The last "," or "." before one or two digits marks the cents; every
+    # other one separates thousands
+    cents = DECIMAL_PATTERN.search(amount)
+    if cents:
+        amount = amount[: cents.start()]
+    whole = amount.replace(",", "").replace(".", "")
+    return float(f"{whole}.{cents.group(1)}" if cents else whole)
+
+
+def extract_interests(text: str) -> FrozenSet[str]:
+    lowered = text.lower()
+    interests = frozenset(
+        interest
+        for interest, synonyms in INTEREST_KEYWORDS.items()
+        if any(re.search(rf"\b{re.escape(word)}\b", lowered) for word in synonyms)
+    )
+    if not interests and ANY_INTERESTS_PATTERN.search(text):
+        return frozenset({"popular"})
+    return interests
+
+
+def extract_slots(text: str, today: Optional[date] = None) -> TripSlots:
+    start_time, end_time = extract_times(text)
+    return TripSlots(
+        city=extract_city(text),
+        date=extract_date(text, today),
+        budget=extract_budget(text),
+        interests=extract_interests(text),
+        start_time=start_time,
+        end_time=end_time,
+        starting_point=extract_starting_point(text),
+    )
@@ -0,0 +1,7 @@
+# conftest.py
+# The frontend modules import each other by plain name (run from frontend/),
+# so the tests put frontend/ on the path the same way.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
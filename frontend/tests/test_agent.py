@@ -0,0 +1,70 @@
+# test_agent.py
+from phi.llm.message import Message
+from phi.tools import Toolkit
+
+from agent import AgentFactory
+
+
+class NoSearch(Toolkit):
+    def __init__(self):
+        super().__init__(name="no_search")
+        self.register(self.search_google)
+
+    def search_google(self, query: str) -> str:
+        """Search Google for a query.
+
+        Args:
+            query(str): The query to search for.
+        """
+        return "[]"
+
+
+# Factory without external services: no storage, knowledge base or search
+class OfflineFactory(AgentFactory):
+    def _search_backend(self):
+        return NoSearch()
+
+    def _web_search_backend(self):
+        return NoSearch()
+
+    def _storage(self):
+        return None
+
+    def _knowledge_base(self):
+        return None
+
+
+def test_sessions_get_their_own_agents_around_shared_services():
+    factory = OfflineFactory()
+    alice = factory.get_agent(user_id="alice", mode="team")
+    bob = factory.get_agent(user_id="bob", mode="team")
+
+    assert alice is not bob and alice.llm is not bob.llm
+    assert alice.tools[0] is bob.tools[0] is factory.search_tools
+    for a, b, template in zip(alice.team, bob.team, factory.team_templates):
+        assert a.name == b.name == template.name
+        assert a is not b and a is not template
+        assert len({id(a.llm), id(b.llm), id(template.llm)}) == 3
+        assert len({id(a.memory), id(b.memory), id(template.memory)}) == 3
+        assert a.run_id != b.run_id
+        # Toolkits (and their search cache) are shared, not copied
+        assert a.tools == b.tools == template.tools
+
+
+def test_member_memory_does_not_leak_between_sessions():
+    factory = OfflineFactory()
+    alice = factory.get_agent(user_id="alice", mode="team")
+    alice.team[1].memory.add_chat_message(Message(role="user", content="Weather in Rome?"))
+
+    bob = factory.get_agent(user_id="bob", mode="team")
+    assert bob.team[1].memory.chat_history == []
+    assert factory.team_templates[1].memory.chat_history == []
+
+
+def test_parallel_mode_plans_with_the_sessions_own_members():
+    factory = OfflineFactory()
+    agent = factory.get_agent(user_id="alice", mode="parallel")
+    assert [member.name for member in agent.team] == ["User Interaction Agent"]
+    orchestrator = agent.tools[-1].__self__
+    assert all(orchestrator.weather_agent is not template for template in factory.team_templates)
+    assert orchestrator.weather_agent.tools == [factory.weather_search_tools]
@@ -0,0 +1,39 @@
+# test_app.py
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+FRONTEND = Path(__file__).resolve().parent.parent
+# Modules of the agent stack, which runs behind the backend's /agent endpoints
+AGENT_STACK = ["agent", "phi", "ollama", "sqlalchemy", "embeddings", "knowledge", "context"]
+
+
+def module_level_imports(path: Path):
+    tree = ast.parse(path.read_text())
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            yield node.module
+
+
+def loaded_modules(modules):
+    script = (
+        "import sys\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "print(__import__('json').dumps(sorted(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=FRONTEND, capture_output=True, text=True, check=True
+    ).stdout
+    return {name.split(".")[0] for name in json.loads(output)}
+
+
+def test_app_and_chat_sender_do_not_load_the_agent_stack():
+    # streamlit itself is left out: it is not needed to see what the app pulls in
+    imports = [module for module in module_level_imports(FRONTEND / "app.py") if module != "streamlit"]
+    assert "rendering" in imports and "http_client" in imports
+    loaded = loaded_modules(imports + ["chat_sender"])
+    assert loaded.isdisjoint(AGENT_STACK), loaded.intersection(AGENT_STACK)
@@ -0,0 +1,115 @@
+# test_chat_sender.py
+import json
+import os
+import stat
+import time
+
+import requests
+
+from chat_sender import ChatSender, ChatSpill
+
+
+# Session standing in for the backend: accepts only the tokens in `valid`
+class TokenBackend:
+    def __init__(self, valid):
+        self.valid = set(valid)
+        self.down = False
+        self.received = []
+        self.tokens = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        if self.down:
+            raise requests.exceptions.ConnectionError("backend down")
+        token = (headers or {}).get("Authorization", "").replace("Bearer ", "") or None
+        self.tokens.append(token)
+        response = requests.Response()
+        response.status_code = 200 if token in self.valid else 401
+        if response.status_code == 200:
+            self.received.extend(json)
+        return response
+
+
+def messages(user_id, *texts):
+    return [{"user_id": user_id, "role": "user", "message": text, "timestamp": text} for text in texts]
+
+
+def sender_for(backend, tmp_path, **kwargs):
+    return ChatSender(
+        "http://backend",
+        session=backend,
+        spill=ChatSpill(str(tmp_path / "spill.jsonl")),
+        flush_interval=0.01,
+        backoff=0.01,
+        backoff_max=0.02,
+        **kwargs,
+    )
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_expired_token_holds_messages_until_new_token(tmp_path):
+    backend = TokenBackend(valid={"fresh"})
+    sender = sender_for(backend, tmp_path)
+    sender.enqueue(messages("u1", "a", "b"), token="stale")
+    assert wait_for(lambda: sender.spill.count == 2)
+    assert sender.stats()["dropped"] == 0
+    assert sender.stats()["auth_expired"] == 1
+
+    sender.set_token("u1", "fresh")
+    assert wait_for(lambda: sender.spill.count == 0)
+    sender.close()
+    assert [message["message"] for message in backend.received] == ["a", "b"]
+    assert backend.tokens[-1] == "fresh"
+
+
+def test_spill_file_is_private_and_has_no_tokens(tmp_path):
+    backend = TokenBackend(valid={"token"})
+    backend.down = True
+    sender = sender_for(backend, tmp_path, max_retries=0)
+    sender.enqueue(messages("u1", "secret plans"), token="token")
+    assert wait_for(lambda: sender.spill.count == 1)
+    sender.close()
+
+    path = tmp_path / "spill.jsonl"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert "token" not in path.read_text()
+    assert [json.loads(line)["message"] for line in path.read_text().splitlines()] == ["secret plans"]
+
+
+def test_spilled_messages_use_the_current_token(tmp_path):
+    path = tmp_path / "spill.jsonl"
+    # Spilled by an earlier process, whose token has expired since
+    path.write_text(json.dumps(messages("u1", "a")[0]) + "\n")
+    backend = TokenBackend(valid={"new"})
+    sender = sender_for(backend, tmp_path)
+    sender.enqueue(messages("u1", "b"), token="new")
+    assert wait_for(lambda: len(backend.received) == 2)
+    sender.close()
+    assert [message["message"] for message in backend.received] == ["a", "b"]
+    assert set(backend.tokens) == {"new"}
+
+
+def test_held_messages_are_not_reread_until_something_changes(tmp_path):
+    backend = TokenBackend(valid={"fresh"})
+    sender = sender_for(backend, tmp_path)
+    reads = []
+    read = sender.spill._read
+    sender.spill._read = lambda: reads.append(1) or read()
+    sender.enqueue(messages("u1", "a"), token="stale")
+    assert wait_for(lambda: sender.spill.count == 1)
+    time.sleep(0.1)
+    held = len(reads)
+    # Ten flush intervals later, the worker has not read the file again
+    time.sleep(0.1)
+    assert len(reads) == held
+
+    sender.set_token("u1", "fresh")
+    assert wait_for(lambda: sender.spill.count == 0)
+    sender.close()
+    assert len(reads) > held
+    assert [message["message"] for message in backend.received] == ["a"]
@@ -0,0 +1,193 @@
+# test_context.py
+from typing import Dict, List
+
+import httpx
+import pytest
+from ollama import Client as OllamaClient
+from phi.llm.message import Message
+
+from context import (
+    CONTEXT_MIN_TOOL_TOKENS,
+    CONTINUE_PROMPT,
+    BudgetedOllama,
+    ContextBuilder,
+    ContextMetrics,
+    estimate_tokens,
+)
+
+SMALL = "small"
+LARGE = "large"
+SYSTEM = Message(role="system", content="You plan day trips.")
+
+
+def history(exchanges: int) -> List[Message]:
+    messages = []
+    for i in range(exchanges):
+        messages.append(Message(role="user", content=f"Question {i}. " + "Tell me more. " * 30))
+        messages.append(Message(role="assistant", content=f"Answer {i}. " + "Here is more. " * 30))
+    return messages
+
+
+def tool_turn(*results: str) -> List[Message]:
+    calls = [
+        {"id": str(i), "type": "function", "function": {"name": "search_google", "arguments": "{}"}}
+        for i in range(len(results))
+    ]
+    return [
+        Message(role="user", content="Plan a day in Rome"),
+        Message(role="assistant", tool_calls=calls),
+    ] + [
+        Message(role="tool", content=result, tool_call_id=str(i), tool_call_name="search_google")
+        for i, result in enumerate(results)
+    ]
+
+
+def test_prompt_under_the_ceiling_is_unchanged():
+    messages = [SYSTEM] + history(2) + tool_turn("results")
+    built, report = ContextBuilder(10000).build(messages)
+    assert built == messages
+    assert report["tokens_in"] == report["tokens_out"]
+    assert report["summarized"] == 0
+
+
+def test_repeated_tool_results_become_references():
+    built, report = ContextBuilder(10000).build([SYSTEM] + tool_turn("results", "results"))
+    assert report["duplicates"] == 1
+    assert built[-2].content == "results"
+    assert built[-1].content == "(Same result as the earlier search_google call above.)"
+
+
+def test_oldest_history_is_rolled_into_a_summary():
+    turn = tool_turn("Colosseum, Vatican Museums")
+    messages = [SYSTEM] + history(4) + turn
+    built, report = ContextBuilder(500).build(messages)
+    assert report["summarized"] > 0
+    assert report["tokens_out"] <= 500 < report["tokens_in"]
+    assert built[0] == SYSTEM
+    assert built[1].role == "system"
+    assert built[1].content.startswith("Summary of the earlier conversation:")
+    # The kept history starts with a question, not an answer cut off from it
+    assert built[2].role == "user"
+    assert built[-len(turn) :] == turn
+
+
+def test_summary_keeps_the_most_recent_lines_within_its_budget():
+    summary = ContextBuilder(500, summary_max_tokens=100).summarize(history(10))
+    # The header line is not counted against the budget
+    assert estimate_tokens(summary.content) <= 100 + 10
+    assert "Answer 9." in summary.content
+    assert "Question 0." not in summary.content
+
+
+def test_long_tool_results_of_the_turn_are_shortened():
+    messages = [SYSTEM] + tool_turn("short result", "x" * 8000)
+    built, report = ContextBuilder(1000).build(messages)
+    assert report["summarized"] == 0
+    assert built[-2].content == "short result"
+    assert built[-1].content.endswith(" ...(truncated)")
+    assert report["tokens_out"] < report["tokens_in"]
+
+
+def test_tool_results_are_not_shortened_below_the_minimum():
+    built, _ = ContextBuilder(100).build([SYSTEM] + tool_turn("x" * 8000))
+    assert estimate_tokens(built[-1].content) == CONTEXT_MIN_TOOL_TOKENS + estimate_tokens(
+        " ...(truncated)"
+    )
+
+
+# Ollama client replying with `replies[model]`: the pieces of the reply, where
+# an exception is raised in place of its chunk
+class ScriptedClient(OllamaClient):
+    def __init__(self, replies: Dict[str, List]):
+        self.replies = replies
+        self.calls: List[tuple] = []
+
+    def _chunks(self, model: str):
+        for piece in self.replies[model]:
+            if isinstance(piece, Exception):
+                raise piece
+            yield {"message": {"role": "assistant", "content": piece}, "done": False}
+        yield {"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 3}
+
+    def chat(self, model: str, messages, stream: bool = False, **kwargs):
+        self.calls.append((model, messages, stream))
+        chunks = self._chunks(model)
+        if stream:
+            return chunks
+        chunks = list(chunks)
+        content = "".join(chunk["message"]["content"] for chunk in chunks)
+        return dict(chunks[-1], message={"role": "assistant", "content": content})
+
+
+def llm(client: ScriptedClient, fallback: bool = True) -> BudgetedOllama:
+    return BudgetedOllama(
+        model=SMALL,
+        ollama_client=client,
+        fallback_model=LARGE if fallback else None,
+        fallback_client=client,
+        metrics_recorder=ContextMetrics(),
+    )
+
+
+def user_message() -> List[Message]:
+    return [Message(role="user", content="What is the weather in Paris?")]
+
+
+def streamed(llm: BudgetedOllama) -> str:
+    return "".join(chunk["message"]["content"] for chunk in llm.invoke_stream(user_message()))
+
+
+def test_member_call_is_streamed_and_joined():
+    client = ScriptedClient({SMALL: ["Sunny ", "and ", "warm"]})
+    response = llm(client).invoke(user_message())
+    assert response["message"] == {"role": "assistant", "content": "Sunny and warm"}
+    assert response["eval_count"] == 3
+    assert [(model, stream) for model, _, stream in client.calls] == [(SMALL, True)]
+
+
+def test_member_call_without_fallback_is_not_streamed():
+    client = ScriptedClient({SMALL: ["Sunny"]})
+    assert llm(client, fallback=False).invoke(user_message())["message"]["content"] == "Sunny"
+    assert client.calls[0][2] is False
+
+
+@pytest.mark.parametrize("stall_at", [0, 2])
+def test_member_call_falls_back_when_the_small_model_stalls(stall_at):
+    pieces = ["Sunny ", "and ", "warm"]
+    pieces.insert(stall_at, httpx.ReadTimeout("stalled"))
+    client = ScriptedClient({SMALL: pieces, LARGE: ["Rain ", "later"]})
+    member = llm(client)
+    assert member.invoke(user_message())["message"]["content"] == "Rain later"
+    assert [(model, stream) for model, _, stream in client.calls] == [(SMALL, True), (LARGE, False)]
+    assert member.metrics_recorder.recent(1)[0]["fallback"] == LARGE
+
+
+def test_stream_falls_back_before_the_first_token():
+    client = ScriptedClient({SMALL: [httpx.ReadTimeout("stalled")], LARGE: ["Rain ", "later"]})
+    assert streamed(llm(client)) == "Rain later"
+
+
+def test_stream_stalling_part_way_is_finished_on_the_fallback_model():
+    client = ScriptedClient(
+        {SMALL: ["Sunny ", "and ", httpx.ReadTimeout("stalled")], LARGE: ["warm"]}
+    )
+    assert streamed(llm(client)) == "Sunny and warm"
+    model, messages, stream = client.calls[-1]
+    assert (model, stream) == (LARGE, True)
+    assert messages[-2] == {"role": "assistant", "content": "Sunny and "}
+    assert messages[-1] == {"role": "user", "content": CONTINUE_PROMPT}
+
+
+def test_stream_stalling_part_way_without_fallback_raises():
+    client = ScriptedClient({SMALL: ["Sunny ", httpx.ReadTimeout("stalled")]})
+    with pytest.raises(httpx.ReadTimeout):
+        streamed(llm(client, fallback=False))
+
+
+def test_fallback_model_stalling_is_not_retried():
+    client = ScriptedClient(
+        {SMALL: [httpx.ReadTimeout("stalled")], LARGE: ["Rain ", httpx.ReadTimeout("stalled")]}
+    )
+    with pytest.raises(httpx.ReadTimeout):
+        streamed(llm(client))
+    assert [model for model, _, _ in client.calls] == [SMALL, LARGE]
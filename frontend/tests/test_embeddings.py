@@ -0,0 +1,28 @@
+# test_embeddings.py
+from typing import List
+
+from phi.embedder.base import Embedder
+
+from embeddings import CachedEmbedder
+
+
+class CountingEmbedder(Embedder):
+    dimensions: int = 2
+    embedded: List[str] = []
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.embedded = self.embedded + list(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_repeated_texts_are_embedded_and_counted_once():
+    embedder = CachedEmbedder(embedder=CountingEmbedder())
+    first = embedder.get_embeddings(["rome", "paris", "rome"])
+    assert first[0] == first[2] == [4.0, 1.0]
+    assert embedder.embedder.embedded == ["rome", "paris"]
+    assert embedder.stats()["misses"] == 2
+
+    embedder.get_embeddings(["rome", "rome", "lisbon"])
+    stats = embedder.stats()
+    assert (stats["memory_hits"], stats["misses"]) == (1, 3)
+    assert stats["hit_ratio"] == 0.25
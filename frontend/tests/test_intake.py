@@ -0,0 +1,79 @@
+# test_intake.py
+from datetime import date
+
+import pytest
+
+from intake import TripIntake
+
+TODAY = date(2026, 6, 1)
+TRIP = (
+    "Plan a day in Paris on 2026-11-20 from 9am to 6pm, budget 120 euros, "
+    "I love museums and food, starting from Gare du Nord"
+)
+
+
+def completed_intake() -> TripIntake:
+    intake = TripIntake(today=TODAY)
+    assert intake.update(TRIP) is None
+    assert "Trip details:" in intake.agent_message(TRIP)
+    return intake
+
+
+def test_asks_for_missing_details():
+    intake = TripIntake(today=TODAY)
+    question = intake.update("I want to go to Paris")
+    assert question.startswith("Great, Paris it is!")
+    assert "your start and end time" in question
+    assert intake.asked == ["date", "start_time", "end_time", "budget", "interests", "starting_point"]
+
+
+def test_collects_details_over_several_messages():
+    intake = TripIntake(today=TODAY)
+    intake.update("Hi")
+    assert intake.update("Barcelona") is not None
+    assert intake.update("on 2026-07-04 from 10am to 5pm, budget 1.000 euros") is not None
+    assert intake.update("food and beaches") is not None
+    assert intake.update("the Hotel Arts") is None
+    assert intake.slots.city == "Barcelona"
+    assert intake.slots.budget == 1000.0
+    assert intake.slots.starting_point == "the Hotel Arts"
+    assert intake.agent_message("the Hotel Arts").endswith("Starting point: the Hotel Arts")
+
+
+def test_unrelated_message_goes_to_agent():
+    intake = TripIntake(today=TODAY)
+    assert intake.update("What can you do?") is None
+    assert intake.agent_message("What can you do?") == "What can you do?"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Can you add a visit to the Louvre?",
+        "What should I wear in the rain?",
+        "I need to get to the airport by 5pm",
+        "Could we go to Versailles too?",
+        "Thanks!",
+    ],
+)
+def test_follow_ups_keep_the_trip(message):
+    intake = completed_intake()
+    assert intake.update(message) is None
+    assert intake.slots.city == "Paris"
+    assert intake.agent_message(message) == message
+
+
+def test_different_destination_with_details_starts_new_trip():
+    intake = completed_intake()
+    question = intake.update("Now plan a day in Rome on 2026-11-22")
+    assert question.startswith("Great, Rome it is!")
+    assert intake.slots.city == "Rome"
+    assert intake.slots.budget is None
+    assert not intake.completed
+
+
+def test_explicit_new_trip_request():
+    intake = completed_intake()
+    question = intake.update("Let's plan a new trip")
+    assert question.startswith("Let's plan your perfect day tour!")
+    assert intake.slots.city is None
@@ -0,0 +1,77 @@
+# test_orchestration.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from orchestration import TourPlanOrchestrator
+
+TRIP = "Rome, 2026-06-01, 09:00 to 18:00"
+
+
+# Agent replying with `reply`; with a barrier it waits for the other
+# researcher, which only arrives when both lookups run at the same time
+class ScriptedAgent:
+    def __init__(self, reply: str, barrier: threading.Barrier = None, error: Exception = None):
+        self.reply = reply
+        self.barrier = barrier
+        self.error = error
+        self.messages = []
+
+    def run(self, message: str, stream: bool = True):
+        self.messages.append(message)
+        if self.barrier is not None:
+            self.barrier.wait()
+        if self.error is not None:
+            raise self.error
+        return iter(self.reply.split(" ")) if stream else self.reply
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
+
+
+def orchestrator(executor, weather, news, itinerary=None):
+    return TourPlanOrchestrator(
+        weather_agent=weather,
+        news_agent=news,
+        itinerary_agent=itinerary or ScriptedAgent("Day plan"),
+        executor=executor,
+    )
+
+
+def test_weather_and_news_run_at_the_same_time(executor):
+    barrier = threading.Barrier(2, timeout=5)
+    itinerary = ScriptedAgent("Day plan")
+    planner = orchestrator(
+        executor, ScriptedAgent("Sunny", barrier), ScriptedAgent("Festival", barrier), itinerary
+    )
+    assert planner.plan_tour(TRIP) == "Day plan"
+    message = itinerary.messages[0]
+    assert TRIP in message
+    assert "Weather report:\nSunny" in message
+    assert "Local news and events:\nFestival" in message
+    assert {"weather", "news", "research", "itinerary", "total"} <= planner.timings.keys()
+
+
+def test_failed_lookup_does_not_stop_the_itinerary(executor):
+    itinerary = ScriptedAgent("Day plan")
+    planner = orchestrator(
+        executor, ScriptedAgent("", error=RuntimeError("search down")), ScriptedAgent("Festival"), itinerary
+    )
+    assert planner.plan_tour(TRIP) == "Day plan"
+    assert "Weather information is currently unavailable." in itinerary.messages[0]
+
+
+def test_itinerary_is_streamed_after_the_research(executor):
+    itinerary = ScriptedAgent("Day plan")
+    planner = orchestrator(executor, ScriptedAgent("Sunny"), ScriptedAgent("Festival"), itinerary)
+    deltas = planner.plan(TRIP)
+    # The research is done before the first delta is asked for
+    assert "research" in planner.timings and not itinerary.messages
+    assert list(deltas) == ["Day", "plan"]
+    assert "Weather report:\nSunny" in itinerary.messages[0]
+    assert {"itinerary_first_token", "itinerary", "total"} <= planner.timings.keys()
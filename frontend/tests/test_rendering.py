@@ -0,0 +1,94 @@
+# test_rendering.py
+import pytest
+
+from rendering import StreamingMarkdown, history_window
+
+
+def conversation(exchanges: int):
+    messages = [{"role": "system", "content": "You plan day trips."}]
+    for i in range(exchanges):
+        messages.append({"role": "user", "content": f"question {i}"})
+        messages.append({"role": "assistant", "content": f"answer {i}"})
+    return messages
+
+
+def test_history_window_shows_the_latest_page():
+    hidden, shown = history_window(conversation(15), 20)
+    assert hidden == 10
+    assert [message["content"] for message in shown[:2]] == ["question 5", "answer 5"]
+    assert shown[-1]["content"] == "answer 14"
+
+
+def test_loading_older_messages_grows_the_window_a_page_at_a_time():
+    messages = conversation(15)
+    assert history_window(messages, 40) == (0, messages[1:])
+    # A window past the start shows everything, without the system prompt
+    assert history_window(messages, 30) == (0, messages[1:])
+    assert history_window(messages, 0) == (0, messages[1:])
+
+
+# Placeholder recording the text of every render
+class Block:
+    def __init__(self, renders):
+        self.renders = renders
+
+    def markdown(self, text):
+        self.renders.append((id(self), text))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def markdown(clock, renders, **kwargs):
+    return StreamingMarkdown(lambda: Block(renders), interval=0.1, min_chars=50, clock=clock, **kwargs)
+
+
+def test_deltas_within_the_interval_are_rendered_together(clock):
+    renders = []
+    view = markdown(clock, renders)
+    view.push("Day ")
+    for word in ["one ", "in ", "Rome"]:
+        clock.now += 0.01
+        view.push(word)
+    assert [text for _, text in renders] == ["Day "]
+    assert view.flush() == "Day one in Rome"
+    assert [text for _, text in renders] == ["Day ", "Day one in Rome"]
+
+
+def test_a_burst_of_text_renders_before_the_interval(clock):
+    renders = []
+    view = markdown(clock, renders)
+    view.push("Day ")
+    view.push("x" * 60)
+    assert len(renders) == 2
+
+
+def test_finished_paragraphs_move_to_their_own_element(clock):
+    renders = []
+    view = markdown(clock, renders)
+    view.push("Morning: Colosseum")
+    clock.now += 1
+    view.push("\n\nAfternoon: Vatican")
+    view.flush()
+    first, *rest = renders
+    assert rest[0] == (first[0], "Morning: Colosseum")
+    assert rest[-1][1] == "Afternoon: Vatican" and rest[-1][0] != first[0]
+    assert view.stats()["chars"] == len("Morning: Colosseum\n\nAfternoon: Vatican")
+
+
+def test_paragraphs_inside_a_code_fence_are_not_split(clock):
+    renders = []
+    view = markdown(clock, renders)
+    view.push("```\nline one\n\nline two\n```")
+    view.flush()
+    assert {block for block, _ in renders} == {renders[0][0]}
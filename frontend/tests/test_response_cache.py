@@ -0,0 +1,67 @@
+# test_response_cache.py
+import re
+from datetime import date, time
+
+from response_cache import SemanticResponseCache
+from slots import TripSlots
+
+TODAY = date(2026, 6, 1)
+ITINERARY = "Schedule overview\n09:00 Louvre\n12:00 Lunch"
+SLOTS = TripSlots(
+    city="Paris",
+    date=date(2026, 6, 10),
+    budget=100.0,
+    interests=frozenset({"museums"}),
+    start_time=time(9),
+    end_time=time(18),
+    starting_point="Gare du Nord",
+)
+
+
+# Bag-of-words vectors: the same words give the same embedding
+class WordEmbedder:
+    def get_embedding(self, text):
+        vector = [0.0] * 64
+        for word in re.findall(r"\w+", text):
+            vector[sum(map(ord, word)) % 64] += 1.0
+        return vector
+
+
+def cache_with_entry() -> SemanticResponseCache:
+    cache = SemanticResponseCache(embedder=WordEmbedder(), threshold=0.9, enabled=True)
+    assert cache.store("Paris museums day", ITINERARY, SLOTS, TODAY)
+    return cache
+
+
+def test_hit_for_same_trip():
+    cache = cache_with_entry()
+    hit = cache.lookup("Paris museums day", SLOTS.merge(TripSlots(budget=105.0)), TODAY)
+    assert hit is not None and hit.response == ITINERARY
+    assert cache.stats()["hits"] == 1
+
+
+def test_miss_when_details_differ():
+    cache = cache_with_entry()
+    for changed in (
+        TripSlots(start_time=time(13)),
+        TripSlots(end_time=time(21)),
+        TripSlots(starting_point="Orly airport"),
+        TripSlots(budget=300.0),
+        TripSlots(interests=frozenset({"food"})),
+    ):
+        slots = SLOTS.merge(changed)
+        assert cache.lookup("Paris museums day", slots, TODAY) is None, changed
+    assert cache.stats()["misses"] == 5
+
+
+def test_starting_point_ignores_case_and_spacing():
+    cache = cache_with_entry()
+    slots = SLOTS.merge(TripSlots(starting_point="gare  du nord"))
+    assert cache.lookup("Paris museums day", slots, TODAY) is not None
+
+
+def test_only_itineraries_with_city_and_date_are_stored():
+    cache = SemanticResponseCache(embedder=WordEmbedder(), enabled=True)
+    assert not cache.store("hi", "Which city would you like to visit?", SLOTS, TODAY)
+    assert not cache.store("Paris", ITINERARY, TripSlots(city="Paris"), TODAY)
+    assert not cache.store("Paris", ITINERARY, SLOTS.merge(TripSlots(date=date(2026, 5, 1))), TODAY)
@@ -0,0 +1,122 @@
+# test_search_cache.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from phi.tools import Toolkit
+
+import search_cache
+from search_cache import CachedSearchTools, SearchResultCache, normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingSearch(Toolkit):
+    def __init__(self, reply: str = "results"):
+        super().__init__(name="counting_search")
+        self.reply = reply
+        self.queries = []
+        self.register(self.search_google)
+
+    def search_google(self, query: str, num_results: int = 5) -> str:
+        self.queries.append((query, num_results))
+        return self.reply
+
+
+def test_normalize_query():
+    assert normalize_query("  Weather in  ROME tomorrow?! ") == "weather in rome tomorrow"
+
+
+def test_entries_are_fresh_for_the_callers_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache.time, "monotonic", clock)
+    cache = SearchResultCache()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return f"result {len(fetches)}"
+
+    assert cache.get_or_fetch(("q",), 600, fetch) == "result 1"
+    clock.now += 300
+    assert cache.get_or_fetch(("q",), 600, fetch) == "result 1"
+    # A caller that needs fresher results refetches
+    assert cache.get_or_fetch(("q",), 60, fetch) == "result 2"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (1, 2, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchResultCache(max_size=2)
+    for key in "abc":
+        cache.get_or_fetch((key,), 600, lambda: key)
+    assert cache.stats()["size"] == 2
+    assert cache.get_or_fetch(("a",), 600, lambda: "refetched") == "refetched"
+
+
+def test_identical_queries_wait_for_the_running_fetch():
+    cache = SearchResultCache()
+    started, release = threading.Event(), threading.Event()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        started.set()
+        release.wait(5)
+        return "results"
+
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(cache.get_or_fetch, ("q",), 600, fetch)
+        started.wait(5)
+        others = [pool.submit(cache.get_or_fetch, ("q",), 600, fetch) for _ in range(3)]
+        while cache.stats()["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result() for f in [first] + others] == ["results"] * 4
+    assert len(fetches) == 1
+
+
+def test_failed_fetch_is_not_cached():
+    cache = SearchResultCache()
+
+    def fail():
+        raise ConnectionError("search down")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_fetch(("q",), 600, fail)
+    assert cache.get_or_fetch(("q",), 600, lambda: "results") == "results"
+    assert cache.stats()["errors"] == 1
+
+
+def test_disabled_cache_always_fetches():
+    cache = SearchResultCache(enabled=False)
+    fetches = []
+    for _ in range(2):
+        cache.get_or_fetch(("q",), 600, lambda: fetches.append(1))
+    assert len(fetches) == 2
+
+
+def test_cached_tools_share_results_for_equivalent_queries():
+    search = CountingSearch()
+    tools = CachedSearchTools(search, ttl=600, cache=SearchResultCache())
+    search_google = tools.functions["search_google"].entrypoint
+    assert search_google("Museums in Paris") == "results"
+    assert search_google(query="museums in paris?") == "results"
+    search_google("museums in paris", num_results=10)
+    assert search.queries == [("Museums in Paris", 5), ("museums in paris", 10)]
+
+
+def test_cached_tools_do_not_cache_error_replies():
+    search = CountingSearch(reply="Error: quota exceeded")
+    tools = CachedSearchTools(search, ttl=600, cache=SearchResultCache())
+    search_google = tools.functions["search_google"].entrypoint
+    for _ in range(2):
+        search_google("museums in paris")
+    assert len(search.queries) == 2
@@ -0,0 +1,117 @@
+# test_slots.py
+from datetime import date, time
+
+import pytest
+
+from slots import extract_budget, extract_city, extract_slots, extract_times
+
+TODAY = date(2026, 6, 1)
+
+
+@pytest.mark.parametrize(
+    "text, city",
+    [
+        ("I'd like to visit Paris", "Paris"),
+        ("Planning a day in New York", "New York"),
+        ("Planning a day in paris", "Paris"),
+        ("Rome", None),
+        ("I want to go to Paris", "Paris"),
+        ("i want to go to paris", "Paris"),
+        ("I am going to be in London", "London"),
+        ("explore the city of Rome", "Rome"),
+        ("explore the city of New York", "New York"),
+        ("visit the Hague on Monday", "Hague"),
+        ("Lisbon for a day, starting from Rossio", "Lisbon"),
+        ("Paris on 12/25", "Paris"),
+        ("New York on Saturday", "New York"),
+        ("going to Berlin", "Berlin"),
+        ("I'm going to Berlin tomorrow", "Berlin"),
+        ("i'm going to berlin", "Berlin"),
+        ("I'm going to eat in Rome", "Rome"),
+        ("a day in Lisbon on Saturday", "Lisbon"),
+    ],
+)
+def test_extract_city(text, city):
+    assert extract_city(text) == city
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "I need to get to the airport by 5pm",
+        "i need to get to the airport by 5pm",
+        "What should I wear in the rain?",
+        "what should i wear in the rain",
+        "I'd like to eat pizza",
+        "I'm interested in museums",
+        "from 9am to 6pm",
+        "I need to be back at my hotel",
+        "I'm going to eat pizza",
+        "Hi, can you help me plan a trip?",
+        "Dinner on Friday",
+    ],
+)
+def test_extract_city_ignores_non_destinations(text):
+    assert extract_city(text) is None
+
+
+@pytest.mark.parametrize(
+    "text, budget",
+    [
+        ("budget $120", 120.0),
+        ("I have 80 dollars", 80.0),
+        ("budget 12.5", 12.5),
+        ("budget 1.000 euros", 1000.0),
+        ("budget 1,000 euros", 1000.0),
+        ("$1,000.50", 1000.5),
+        ("1.000,50 euros", 1000.5),
+        ("€ 2.500", 2500.0),
+        ("100,50 eur", 100.5),
+        ("$1,250,000", 1250000.0),
+        ("no budget", 0.0),
+        ("budget is flexible", 0.0),
+        ("I love museums", None),
+    ],
+)
+def test_extract_budget(text, budget):
+    assert extract_budget(text) == budget
+
+
+@pytest.mark.parametrize(
+    "text, start, end",
+    [
+        ("from 9am to 6pm", time(9), time(18)),
+        ("9-5pm", time(9), time(17)),
+        ("1-5pm", time(13), time(17)),
+        ("9 to 5", time(9), time(17)),
+        ("from 9 to 5", time(9), time(17)),
+        ("from 9 to 5 o'clock", time(9), time(17)),
+        ("from 9:30 to 5", time(9, 30), time(17)),
+        ("a tour for 2 to 3 people", None, None),
+        ("from 2 to 3 people", None, None),
+        ("the whole day", time(9), time(18)),
+        ("starting at 10:30", time(10, 30), None),
+    ],
+)
+def test_extract_times(text, start, end):
+    assert extract_times(text) == (start, end)
+
+
+def test_extract_slots_city_before_the_date():
+    slots = extract_slots("Paris on 12/25", TODAY)
+    assert (slots.city, slots.date) == ("Paris", date(2026, 12, 25))
+
+
+def test_extract_slots_full_request():
+    slots = extract_slots(
+        "Plan a day in Paris on 2026-11-20 from 9am to 6pm, budget 1.200 euros, "
+        "I love museums and food, starting from Gare du Nord",
+        TODAY,
+    )
+    assert slots.city == "Paris"
+    assert slots.date == date(2026, 11, 20)
+    assert (slots.start_time, slots.end_time) == (time(9), time(18))
+    assert slots.budget == 1200.0
+    assert slots.interests == {"museums", "food"}
+    assert slots.starting_point == "Gare du Nord"
+    assert slots.missing() == []
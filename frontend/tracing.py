@@ -0,0 +1,99 @@
+# tracing.py
+# Timing hooks for the agent stack: LLM time to first token and tokens/sec,
+# model fallbacks, agent runs, team delegation, tool calls and knowledge
+# search, plus the stats() of the caches and pools it uses. When the agent
+# runs in the backend's generation tier they record into the backend's
+# telemetry registry, exported on GET /metrics. Anywhere else (benchmarks,
+# scripts) that module is not importable and every hook is a no-op.
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+try:
+    from telemetry import TOKEN_RATE_BUCKETS, telemetry
+except ImportError:
+    telemetry = None
+
+DELEGATION_PREFIX = "delegate_task_to_"
+
+_histograms: Dict[str, object] = {}
+if telemetry is not None:
+    _histograms = {
+        "llm_ttft": telemetry.histogram(
+            "llm_time_to_first_token_seconds", "LLM request to first streamed token", ["agent"]
+        ),
+        "llm_tokens_per_second": telemetry.histogram(
+            "llm_tokens_per_second",
+            "Generated tokens per second, after the first token",
+            ["agent"],
+            buckets=TOKEN_RATE_BUCKETS,
+        ),
+        "agent_run": telemetry.histogram(
+            "agent_run_duration_seconds", "agent.run from message to full reply", ["agent"]
+        ),
+        "tool_call": telemetry.histogram(
+            "tool_call_duration_seconds", "Tool calls made by the agents", ["tool"]
+        ),
+        "delegation": telemetry.histogram(
+            "delegation_duration_seconds", "Tasks delegated to team members", ["member"]
+        ),
+        "knowledge_search": telemetry.histogram(
+            "knowledge_search_duration_seconds", "Knowledge base vector searches"
+        ),
+    }
+    _llm_tokens = telemetry.counter("llm_tokens_total", "LLM tokens", ["agent", "kind"])
+    _llm_fallbacks = telemetry.counter(
+        "llm_fallbacks_total", "Requests retried on the fallback model", ["agent", "model"]
+    )
+
+
+def enabled() -> bool:
+    return telemetry is not None and telemetry.enabled
+
+
+def span(name: str, **labels):
+    """Context manager timing a block into the named histogram."""
+    if not enabled():
+        return nullcontext()
+    return telemetry.span(_histograms[name], **labels)
+
+
+def record_llm_request(
+    agent: str,
+    ttft: float,
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    generation_seconds: Optional[float],
+):
+    if not enabled():
+        return
+    _histograms["llm_ttft"].observe(ttft, agent=agent)
+    if prompt_tokens:
+        _llm_tokens.inc(prompt_tokens, agent=agent, kind="prompt")
+    if completion_tokens:
+        _llm_tokens.inc(completion_tokens, agent=agent, kind="completion")
+        if generation_seconds:
+            _histograms["llm_tokens_per_second"].observe(
+                completion_tokens / generation_seconds, agent=agent
+            )
+
+
+def register_stats(name: str, documentation: str, read):
+    """Export the dict returned by `read()` as gauges named `name`."""
+    if telemetry is not None:
+        telemetry.stats(name, documentation, read)
+
+
+def record_model_fallback(agent: str, model: str):
+    if not enabled():
+        return
+    _llm_fallbacks.inc(agent=agent, model=model)
+
+
+def record_function_call(name: str, seconds: float):
+    """A tool call or, for phi's delegate_task_to_* functions, a delegation."""
+    if not enabled():
+        return
+    if name.startswith(DELEGATION_PREFIX):
+        _histograms["delegation"].observe(seconds, member=name[len(DELEGATION_PREFIX) :])
+    else:
+        _histograms["tool_call"].observe(seconds, tool=name)